@@ -140,20 +140,20 @@ def register_view(request):
     return render(request, 'authentication/register.html')
 
 @csrf_exempt
-def check_username(request):
+async def check_username(request):
     """AJAX endpoint to check username availability"""
     if request.method == 'POST':
         username = json.loads(request.body).get('username', '')
-        exists = User.objects.filter(username=username).exists()
+        exists = await User.objects.filter(username=username).aexists()
         return JsonResponse({'available': not exists})
     return JsonResponse({'available': False})
 
 @csrf_exempt  
-def check_email(request):
+async def check_email(request):
     """AJAX endpoint to check email availability"""
     if request.method == 'POST':
         email = json.loads(request.body).get('email', '')
-        exists = User.objects.filter(email=email).exists()
+        exists = await User.objects.filter(email=email).aexists()
         return JsonResponse({'available': not exists})
     return JsonResponse({'available': False})
 
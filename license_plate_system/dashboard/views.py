@@ -9,6 +9,7 @@ from vehicle_control.models import (
     RegisteredLicensePlate, VideoDetection,
     KnownLicensePlate, UnknownLicensePlate
 )
+from vehicle_control.counters import get_statistics
 
 @login_required
 def home_dashboard(request):
@@ -27,11 +28,12 @@ def home_dashboard(request):
     }
     
     if user.is_staff:
+        global_stats = get_statistics()
         stats.update({
-            'total_registered_plates': RegisteredLicensePlate.objects.count(),
-            'total_videos': VideoDetection.objects.count(),
-            'total_known_detections': KnownLicensePlate.objects.count(),
-            'total_unknown_detections': UnknownLicensePlate.objects.count(),
+            'total_registered_plates': global_stats['total_registered_plates'],
+            'total_videos': global_stats['total_videos'],
+            'total_known_detections': global_stats['total_known_detections'],
+            'total_unknown_detections': global_stats['total_unknown_detections'],
         })
     
     context = {
@@ -46,21 +48,10 @@ def home_dashboard(request):
 def admin_dashboard(request):
     """Admin-only dashboard with comprehensive statistics"""
     
-    # Time ranges for statistics
-    today = timezone.now().date()
-    week_ago = today - timedelta(days=7)
-    month_ago = today - timedelta(days=30)
+    today = timezone.localdate()
     
-    # Basic statistics
-    stats = {
-        'total_registered_plates': RegisteredLicensePlate.objects.count(),
-        'total_videos': VideoDetection.objects.count(),
-        'total_known_detections': KnownLicensePlate.objects.count(),
-        'total_unknown_detections': UnknownLicensePlate.objects.count(),
-        'today_videos': VideoDetection.objects.filter(upload_timestamp__date=today).count(),
-        'week_videos': VideoDetection.objects.filter(upload_timestamp__date__gte=week_ago).count(),
-        'month_videos': VideoDetection.objects.filter(upload_timestamp__date__gte=month_ago).count(),
-    }
+    # Basic statistics (precomputed counters, see vehicle_control.counters)
+    stats = get_statistics()
     
     # Recent activity
     recent_videos = VideoDetection.objects.select_related('uploaded_by').order_by('-upload_timestamp')[:15]
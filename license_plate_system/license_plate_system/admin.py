@@ -1,10 +1,7 @@
 from django.contrib import admin
 from django.template.response import TemplateResponse
 from django.urls import path
-from vehicle_control.models import (
-    RegisteredLicensePlate, VideoDetection,
-    KnownLicensePlate, UnknownLicensePlate
-)
+from vehicle_control.counters import get_statistics
 
 # Customize admin site
 admin.site.site_header = "License Plate Detection System"
@@ -19,14 +16,7 @@ def custom_index(request, extra_context=None):
     extra_context = extra_context or {}
     
     # Get statistics
-    stats = {
-        'total_registered_plates': RegisteredLicensePlate.objects.count(),
-        'total_videos': VideoDetection.objects.count(),
-        'total_known_detections': KnownLicensePlate.objects.count(),
-        'total_unknown_detections': UnknownLicensePlate.objects.count(),
-    }
-    
-    extra_context['stats'] = stats
+    extra_context['stats'] = get_statistics()
     return original_index(request, extra_context)
 
 # Replace the index view
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -58,7 +59,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Static files serving
+    'license_plate_system.middleware.AsyncWhiteNoiseMiddleware',  # Static files serving, async-capable
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -175,14 +176,158 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Thumbnails generated next to plate/detection images (max width, max height)
+THUMBNAIL_SIZES = {
+    'small': (160, 120),
+    'medium': (400, 300),
+}
+
+# Image serving offload: None (Django streams the file), 'nginx' (X-Accel-Redirect)
+# or 'apache' (X-Sendfile; also lighttpd). Django still checks permissions first.
+IMAGE_SENDFILE_BACKEND = os.environ.get('IMAGE_SENDFILE_BACKEND') or None
+IMAGE_SENDFILE_URL_PREFIX = os.environ.get('IMAGE_SENDFILE_URL_PREFIX', '/protected-media/')
+
+# Dashboard statistics are read from precomputed counters and cached briefly
+STATISTICS_CACHE_TIMEOUT = 30  # seconds
+
+# Listing totals come from planner statistics (pg_class.reltuples) instead of
+# COUNT(*) for large unfiltered tables on PostgreSQL
+PAGINATION_ESTIMATED_COUNTS = os.environ.get('PAGINATION_ESTIMATED_COUNTS', 'True') == 'True'
+
 # Custom settings
 LOGIN_URL = '/auth/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/auth/login/'
 
 # File upload settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 200 * 1024 * 1024  # 200MB
-DATA_UPLOAD_MAX_MEMORY_SIZE = 200 * 1024 * 1024  # 200MB
+# Keep request bodies out of worker memory: larger multipart files spool to a
+# temp file, and big videos go through the chunked upload API instead.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB (Django default)
+DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+
+# Chunked (resumable) video uploads
+CHUNKED_UPLOAD_TEMP_DIR = MEDIA_ROOT / 'uploads' / 'partial'
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = 16 * 1024 * 1024  # 16MB per PUT
+CHUNKED_UPLOAD_MAX_SIZE = int(os.environ.get('CHUNKED_UPLOAD_MAX_SIZE', 20 * 1024 * 1024 * 1024))  # 20GB
+CHUNKED_UPLOAD_EXPIRY_HOURS = int(os.environ.get('CHUNKED_UPLOAD_EXPIRY_HOURS', 24))  # unfinished uploads idle this long are deleted
+
+# Single-image detection API: concurrent requests are coalesced into micro-batches
+DETECTION_BATCH_WINDOW = float(os.environ.get('DETECTION_BATCH_WINDOW', 0.015))  # seconds
+DETECTION_BATCH_MAX_SIZE = 8
+DETECTION_QUEUE_SIZE = int(os.environ.get('DETECTION_QUEUE_SIZE', 32))  # beyond this -> 503
+# Seconds a request waits for its result; one that would wait longer by the measured per-image time gets a 503 at once
+DETECTION_TIMEOUT = float(os.environ.get('DETECTION_TIMEOUT', 10))
+DETECTION_MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10MB
+
+# Cameras and gate controllers call the detection/gate APIs without a login,
+# sending "Authorization: Bearer <token>" with one of these (comma-separated)
+DEVICE_API_TOKENS = [token.strip() for token in os.environ.get('DEVICE_API_TOKENS', '').split(',') if token.strip()]
+
+# Tiled detection: frames (or ROI crops) whose longer side is at least
+# DETECTION_TILE_MIN_SIZE are split into overlapping tiles processed in a thread
+# pool. The overlap must exceed the largest plate so every plate fits whole in
+# some tile. 0 disables tiling.
+DETECTION_TILE_MIN_SIZE = int(os.environ.get('DETECTION_TILE_MIN_SIZE', 2560))
+DETECTION_TILE_SIZE = int(os.environ.get('DETECTION_TILE_SIZE', 1280))
+DETECTION_TILE_OVERLAP = int(os.environ.get('DETECTION_TILE_OVERLAP', 320))
+DETECTION_TILE_WORKERS = int(os.environ.get('DETECTION_TILE_WORKERS', 0))  # 0 = the job's CPU governor share, 1 library thread each
+DETECTION_TILE_NMS_THRESHOLD = 0.5  # intersection over the smaller box that marks a duplicate
+
+# CPU budget for concurrent detection jobs: each process's OpenCV/torch thread
+# pools get its share of the host's cores (see vehicle_control/governor.py)
+CPU_GOVERNOR_ENABLED = os.environ.get('CPU_GOVERNOR_ENABLED', 'True') == 'True'
+CPU_GOVERNOR_CORES = int(os.environ.get('CPU_GOVERNOR_CORES', 0)) or None  # None = detect
+CPU_GOVERNOR_DIR = os.environ.get('CPU_GOVERNOR_DIR', os.path.join(tempfile.gettempdir(), 'license_plate_jobs'))
+CPU_GOVERNOR_INTERVAL = 2.0  # seconds between registry checks while a job runs
+CPU_GOVERNOR_TF_THREADS = int(os.environ.get('CPU_GOVERNOR_TF_THREADS', 1))  # fixed at TF start-up
+
+# Model weights (EasyOCR detector/recognizer, Keras vehicle model + labels) are
+# only loaded from this directory, never downloaded. Populate it with
+# `manage.py model_store populate --source <dir>`; see vehicle_control/model_store.py
+MODEL_STORE_DIR = os.environ.get('MODEL_STORE_DIR', str(BASE_DIR / 'models'))
+
+# Detector components (OCR reader, vehicle model) load on first use. With an
+# idle timeout (seconds), ones unused for that long are unloaded to free memory
+DETECTOR_IDLE_TIMEOUT = int(os.environ.get('DETECTOR_IDLE_TIMEOUT', 0))  # 0 = keep loaded
+
+# Keep every raw OCR result of processed videos (vehicle_control/ocr_store.py)
+# so `manage.py reevaluate_video` can re-apply cleaning, validation and
+# thresholds without running OCR again
+OCR_RESULT_STORE = os.environ.get('OCR_RESULT_STORE', 'False') == 'True'
+OCR_RESULT_DIR = os.environ.get('OCR_RESULT_DIR', str(BASE_DIR / 'ocr_results'))
+
+# Frame cache: with it on, sampled frames are analysed at FRAME_CACHE_MAX_SIDE
+# (longer side, px) and kept in memmapped files so later passes over the same
+# video skip decoding; least recently used videos are evicted past the budget
+FRAME_CACHE_ENABLED = os.environ.get('FRAME_CACHE_ENABLED', 'False') == 'True'
+FRAME_CACHE_DIR = os.environ.get('FRAME_CACHE_DIR', str(BASE_DIR / 'frame_cache'))
+FRAME_CACHE_MAX_BYTES = int(os.environ.get('FRAME_CACHE_MAX_BYTES', 10 * 1024 ** 3))
+FRAME_CACHE_MAX_SIDE = int(os.environ.get('FRAME_CACHE_MAX_SIDE', 1280))  # 0 = full resolution
+
+# Model loads (with cold-start timing) and model store errors go to stderr,
+# which gunicorn and Render collect
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '{asctime} {levelname} {name}: {message}', 'style': '{'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+    },
+    'loggers': {
+        'vehicle_control': {
+            'handlers': ['console'],
+            'level': os.environ.get('VEHICLE_CONTROL_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
+# Video job scheduling: 'inline' processes an upload in a thread of the web process
+# (WSGI only; under ASGI uploads are always queued),
+# 'queue' leaves it to `manage.py process_video_queue` workers, which run jobs
+# by priority and remaining work (see vehicle_control/scheduling.py)
+VIDEO_PROCESSING_MODE = os.environ.get('VIDEO_PROCESSING_MODE', 'inline')
+SCHEDULER_MAX_CONCURRENT_JOBS = int(os.environ.get('SCHEDULER_MAX_CONCURRENT_JOBS', 2))  # per host
+SCHEDULER_MAX_JOBS_PER_UPLOADER = int(os.environ.get('SCHEDULER_MAX_JOBS_PER_UPLOADER', 1))  # 0 = no cap
+SCHEDULER_CHECKPOINT_INTERVAL = 30.0  # seconds between saved resume points
+SCHEDULER_TIME_SLICE = int(os.environ.get('SCHEDULER_TIME_SLICE', 300))  # seconds before yielding to a shorter job
+SCHEDULER_AGING_SECONDS = int(os.environ.get('SCHEDULER_AGING_SECONDS', 1800))  # wait that adds one priority level
+SCHEDULER_POLL_INTERVAL = 2.0  # seconds an idle worker waits before looking again
+SCHEDULER_LEASE_SECONDS = int(os.environ.get('SCHEDULER_LEASE_SECONDS', 300))  # no checkpoint for this long -> requeued
+SCHEDULER_LOCK_FILE = os.path.join(tempfile.gettempdir(), 'license_plate_scheduler.lock')
+
+# Gate decisions: in-memory allow-list with fuzzy OCR tolerance, logged in batches
+GATE_ALLOWLIST_REFRESH = 1.0  # seconds between incremental refreshes
+GATE_ALLOWLIST_FULL_REFRESH = 60.0  # seconds between full reloads (picks up deletions)
+GATE_FUZZY_MAX_DISTANCE = int(os.environ.get('GATE_FUZZY_MAX_DISTANCE', 1))  # 0 = exact only
+GATE_FUZZY_ALLOW = os.environ.get('GATE_FUZZY_ALLOW', 'False') == 'True'  # open on a unique fuzzy match, else "review"
+GATE_LOG_BATCH_SIZE = 200
+GATE_LOG_FLUSH_INTERVAL = 0.5  # seconds
+GATE_LOG_QUEUE_SIZE = 10000
+
+# Live detection feed (Server-Sent Events). Backend None picks 'postgres'
+# (LISTEN/NOTIFY across processes) on PostgreSQL and 'local' (in-process) otherwise.
+LIVE_FEED_BACKEND = os.environ.get('LIVE_FEED_BACKEND') or None
+LIVE_FEED_MAX_CLIENTS = 500  # per process
+LIVE_FEED_CLIENT_BUFFER = 100  # events buffered per client before the oldest are dropped
+LIVE_FEED_HEARTBEAT = 15  # seconds
+LIVE_FEED_RETRY_MS = 3000
+
+# Retention of detection rows and images (see `apply_retention`). days=None keeps
+# rows forever; archive=True appends them to gzip NDJSON in RETENTION_ARCHIVE_DIR first.
+RETENTION_POLICIES = {
+    'known': {
+        'days': int(os.environ['RETENTION_KNOWN_DAYS']) if os.environ.get('RETENTION_KNOWN_DAYS') else None,
+        'archive': True,
+    },
+    'unknown': {
+        'days': int(os.environ['RETENTION_UNKNOWN_DAYS']) if os.environ.get('RETENTION_UNKNOWN_DAYS') else None,
+        'archive': True,
+    },
+}
+RETENTION_ARCHIVE_DIR = Path(os.environ.get('RETENTION_ARCHIVE_DIR', BASE_DIR / 'archive'))
+RETENTION_BATCH_SIZE = 1000
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -1,9 +1,12 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
+from .search import PlateSearchAdminMixin
+from .thumbnails import thumbnail_url
 from .models import (
     UserProfile, RegisteredLicensePlate, 
-    VideoDetection, KnownLicensePlate, UnknownLicensePlate
+    VideoDetection, KnownLicensePlate, UnknownLicensePlate, ChunkedUpload,
+    StatisticCounter, DailyStatistic, GateDecision, CameraProfile
 )
 
 @admin.register(UserProfile)
@@ -13,7 +16,7 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_filter = ['user__is_staff', 'user__is_active']
 
 @admin.register(RegisteredLicensePlate)
-class RegisteredLicensePlateAdmin(admin.ModelAdmin):
+class RegisteredLicensePlateAdmin(PlateSearchAdminMixin, admin.ModelAdmin):
     list_display = ['plate_image_preview', 'plate_number', 'owner_name', 'vehicle_type', 'user', 'registered_date']
     search_fields = ['plate_number', 'owner_name', 'owner_contact', 'user__username']
     list_filter = ['vehicle_type', 'registered_date']
@@ -37,21 +40,51 @@ class RegisteredLicensePlateAdmin(admin.ModelAdmin):
         if obj.plate_image:
             return format_html(
                 '<img src="{}" width="100" height="auto" style="border-radius: 8px;" />',
-                obj.plate_image.url
+                thumbnail_url(obj.plate_image)
             )
         return "No image"
     plate_image_preview.short_description = 'Image Preview'
 
+@admin.register(CameraProfile)
+class CameraProfileAdmin(admin.ModelAdmin):
+    list_display = ['name', 'frame_skip', 'min_area', 'aspect_ratio_min', 'aspect_ratio_max', 'min_confidence', 'updated_at']
+    search_fields = ['name', 'description']
+    readonly_fields = ['created_at', 'updated_at']
+    fieldsets = (
+        ('Camera', {
+            'fields': ('name', 'description')
+        }),
+        ('Region of Interest', {
+            'fields': ('roi_polygons', 'mask_outside_roi')
+        }),
+        ('Detection', {
+            'fields': ('frame_skip', 'min_area', 'aspect_ratio_min', 'aspect_ratio_max',
+                       'ocr_confidence_threshold', 'min_confidence')
+        }),
+        ('Timestamps', {
+            'fields': ('created_at', 'updated_at')
+        }),
+    )
+
 @admin.register(VideoDetection)
 class VideoDetectionAdmin(admin.ModelAdmin):
-    list_display = ['id', 'uploaded_by', 'status', 'upload_timestamp', 'processed_at']
+    list_display = ['id', 'uploaded_by', 'source', 'status', 'priority', 'camera_profile', 'upload_timestamp', 'processed_at']
+    list_editable = ['priority']
     search_fields = ['uploaded_by__username']
-    list_filter = ['status', 'upload_timestamp']
-    readonly_fields = ['upload_timestamp', 'processed_at']
+    list_filter = ['source', 'status', 'priority', 'camera_profile', 'upload_timestamp']
+    readonly_fields = ['source', 'upload_timestamp', 'processed_at', 'processing_stats', 'total_frames', 'resume_frame',
+                       'remaining_frames', 'queued_at', 'worker', 'heartbeat_at', 'preemptions']
     date_hierarchy = 'upload_timestamp'
 
+@admin.register(ChunkedUpload)
+class ChunkedUploadAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'uploaded_by', 'status', 'offset', 'total_size', 'video_detection', 'updated_at']
+    search_fields = ['filename', 'uploaded_by__username']
+    list_filter = ['status', 'created_at']
+    readonly_fields = ['upload_id', 'offset', 'checksum', 'created_at', 'updated_at']
+
 @admin.register(KnownLicensePlate)
-class KnownLicensePlateAdmin(admin.ModelAdmin):
+class KnownLicensePlateAdmin(PlateSearchAdminMixin, admin.ModelAdmin):
     list_display = ['detection_image_preview', 'detected_plate_number', 'registered_plate', 'confidence_score', 'video_detection', 'detected_at']
     search_fields = ['detected_plate_number', 'registered_plate__plate_number', 'registered_plate__owner_name']
     list_filter = ['detected_at', 'confidence_score']
@@ -62,13 +95,13 @@ class KnownLicensePlateAdmin(admin.ModelAdmin):
         if obj.detection_image:
             return format_html(
                 '<img src="{}" width="100" height="auto" style="border-radius: 8px;" />',
-                obj.detection_image.url
+                thumbnail_url(obj.detection_image)
             )
         return "No image"
     detection_image_preview.short_description = 'Detection Image'
 
 @admin.register(UnknownLicensePlate)
-class UnknownLicensePlateAdmin(admin.ModelAdmin):
+class UnknownLicensePlateAdmin(PlateSearchAdminMixin, admin.ModelAdmin):
     list_display = ['detection_image_preview', 'detected_plate_number', 'vehicle_type', 'confidence_score', 'video_detection', 'detected_at']
     search_fields = ['detected_plate_number', 'vehicle_type']
     list_filter = ['detected_at', 'confidence_score', 'vehicle_type']
@@ -79,7 +112,27 @@ class UnknownLicensePlateAdmin(admin.ModelAdmin):
         if obj.detection_image:
             return format_html(
                 '<img src="{}" width="100" height="auto" style="border-radius: 8px;" />',
-                obj.detection_image.url
+                thumbnail_url(obj.detection_image)
             )
         return "No image"
     detection_image_preview.short_description = 'Detection Image'
+
+@admin.register(StatisticCounter)
+class StatisticCounterAdmin(admin.ModelAdmin):
+    list_display = ['name', 'value']
+    readonly_fields = ['name', 'value']
+
+@admin.register(DailyStatistic)
+class DailyStatisticAdmin(admin.ModelAdmin):
+    list_display = ['day', 'name', 'value']
+    list_filter = ['name']
+    readonly_fields = ['day', 'name', 'value']
+    date_hierarchy = 'day'
+
+@admin.register(GateDecision)
+class GateDecisionAdmin(admin.ModelAdmin):
+    list_display = ['plate_text', 'allowed', 'match_type', 'registered_plate', 'gate', 'latency_ms', 'decided_at']
+    search_fields = ['plate_text', 'normalized_plate', 'gate']
+    list_filter = ['allowed', 'match_type', 'gate', 'decided_at']
+    readonly_fields = ['plate_text', 'normalized_plate', 'allowed', 'match_type', 'registered_plate', 'gate', 'latency_ms', 'decided_at']
+    date_hierarchy = 'decided_at'
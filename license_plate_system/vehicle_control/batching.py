@@ -0,0 +1,130 @@
+"""
+Cross-request micro-batching for single-image detection.
+
+Requests hand their decoded image to a bounded queue and wait on a future.
+One worker thread owns the shared detector: it takes the first waiting
+image, keeps collecting for up to ``DETECTION_BATCH_WINDOW`` seconds (or
+until ``DETECTION_BATCH_MAX_SIZE`` images), then runs the batch: the OCR
+of all its images batched by size (see ``detect_license_plates``) and one
+vehicle classifier call for all of them.
+
+The batcher measures how long an image takes (median of recent batches). A
+request that would wait longer than ``DETECTION_TIMEOUT`` behind the images
+already queued is turned away at once, as is any request beyond
+``DETECTION_QUEUE_SIZE``, instead of queueing only to time out.
+"""
+import queue
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from django.conf import settings
+
+from .vision import get_detector
+
+
+class BatcherOverloaded(Exception):
+    """The detection queue is full; the caller should retry later"""
+
+
+class MicroBatcher:
+    """Coalesces concurrent ``submit`` calls into batches for ``handler(items) -> results``"""
+
+    def __init__(self, handler, window, max_batch_size, max_queue_size, max_wait=None, name='micro-batcher'):
+        self.handler = handler
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        # Seconds per item of recent batches; the median ignores one-off model loads
+        self._item_seconds = deque(maxlen=20)
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def item_seconds(self):
+        """Measured seconds per item, or None before the first batch"""
+        samples = list(self._item_seconds)
+        return statistics.median(samples) if samples else None
+
+    def expected_wait(self):
+        """Seconds a new item would wait for the items queued ahead of it, by the measured rate"""
+        per_item = self.item_seconds()
+        if per_item is None:
+            return 0.0
+        return (self._queue.qsize() + 1) * per_item
+
+    def submit(self, item):
+        """Queue ``item``; returns a Future, or raises BatcherOverloaded if it can't be done in ``max_wait``"""
+        if self.max_wait is not None and self.expected_wait() > self.max_wait:
+            raise BatcherOverloaded()
+        future = Future()
+        try:
+            self._queue.put_nowait((item, future))
+        except queue.Full:
+            raise BatcherOverloaded()
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Callers that already gave up don't need the work done
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.monotonic()
+            try:
+                results = self.handler([item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self._item_seconds.append((time.monotonic() - started) / len(batch))
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+def detect_batch(images):
+    """Plate text, confidence, region and vehicle type for each image"""
+    detector = get_detector()
+    plates = detector.detect_license_plates(images)
+    vehicle_types = detector.predict_vehicle_types(images)
+    return [
+        {'plate_text': text, 'confidence': confidence, 'region': region, 'vehicle_type': vehicle_type}
+        for (text, confidence, region), vehicle_type in zip(plates, vehicle_types)
+    ]
+
+
+_batcher_instance = None
+_lock = threading.Lock()
+
+
+def get_detection_batcher():
+    """Get or create the process-wide detection batcher"""
+    global _batcher_instance
+    if _batcher_instance is None:
+        with _lock:
+            if _batcher_instance is None:
+                _batcher_instance = MicroBatcher(
+                    detect_batch,
+                    window=settings.DETECTION_BATCH_WINDOW,
+                    max_batch_size=settings.DETECTION_BATCH_MAX_SIZE,
+                    max_queue_size=settings.DETECTION_QUEUE_SIZE,
+                    max_wait=settings.DETECTION_TIMEOUT,
+                    name='detection-batcher'
+                )
+    return _batcher_instance
@@ -0,0 +1,72 @@
+"""
+Reusable scratch arrays for the detection loop.
+
+Every sampled frame goes through the same chain of OpenCV steps (grayscale,
+bilateral filter, CLAHE, morphology, crops and resizes), and each step used
+to allocate a fresh frame-sized array. For a stream of fixed resolution those
+arrays have the same shapes every time, so they are kept here and passed to
+OpenCV as ``dst``, which writes into them instead of allocating.
+
+Buffers are per thread (tiles are detected in parallel) and per name: a
+buffer's contents are only valid until the next request for the same name
+in the same thread. Each name keeps one flat backing array that grows to the
+largest size asked for; smaller requests get a reshaped view of its start,
+so variable-sized plate crops reuse it too.
+
+The arrays are dropped, in every thread, when an idle detector component is
+evicted (``DETECTOR_IDLE_TIMEOUT``, see components.py), so one 4K frame
+doesn't keep its buffers allocated for the life of the process.
+"""
+import threading
+import weakref
+
+import numpy as np
+
+_local = threading.local()
+_pools = weakref.WeakSet()
+_pools_lock = threading.Lock()
+
+
+class BufferPool:
+    def __init__(self):
+        self._arrays = {}
+
+    def get(self, name, shape, dtype=np.uint8):
+        """A C-contiguous ``shape`` array of ``dtype`` (uninitialised) backed by the buffer ``name``"""
+        dtype = np.dtype(dtype)
+        size = 1
+        for dim in shape:
+            size *= dim
+        backing = self._arrays.get(name)
+        if backing is None or backing.dtype != dtype or backing.size < size:
+            backing = np.empty(size, dtype=dtype)
+            self._arrays[name] = backing
+        return backing[:size].reshape(shape)
+
+    def like(self, name, array):
+        return self.get(name, array.shape, array.dtype)
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self._arrays.values())
+
+    def clear(self):
+        self._arrays.clear()
+
+
+def frame_buffers():
+    """This thread's BufferPool"""
+    pool = getattr(_local, 'pool', None)
+    if pool is None:
+        pool = _local.pool = BufferPool()
+        with _pools_lock:
+            _pools.add(pool)
+    return pool
+
+
+def release_buffers():
+    """Drop every thread's buffers; arrays still in use stay valid until their users let go"""
+    with _pools_lock:
+        pools = list(_pools)
+    for pool in pools:
+        pool.clear()
@@ -0,0 +1,222 @@
+"""
+Bulk registration of license plates from a CSV file plus a zip of images.
+
+The CSV is read row by row and validated in batches: owners are resolved and
+existing ``(user, plate_number)`` pairs are found with one set-based query per
+batch, images are read straight out of the archive (never extracted to
+disk), and valid rows are inserted with ``bulk_create``. Every rejected row is
+reported with its line number instead of aborting the whole import.
+
+``bulk_create`` skips post_save, so the registered plate counter is bumped
+here; thumbnails are produced lazily the first time they are shown.
+"""
+import csv
+import io
+import os
+import zipfile
+import zlib
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from . import counters
+from .models import RegisteredLicensePlate
+
+BATCH_SIZE = 500
+MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10MB per image
+REQUIRED_COLUMNS = {'plate_number', 'owner_name', 'image'}
+TEXT_COLUMNS = ['owner_contact', 'vehicle_brand', 'vehicle_model', 'vehicle_color', 'notes']
+VEHICLE_TYPES = {value for value, label in RegisteredLicensePlate.VEHICLE_TYPES}
+
+
+class BulkImportError(ValueError):
+    """The CSV or archive as a whole cannot be imported"""
+
+
+class _ImageArchive:
+    """Lazy access to the images of a zip, looked up by file name"""
+
+    def __init__(self, archive):
+        try:
+            self.zip = zipfile.ZipFile(archive)
+        except zipfile.BadZipFile:
+            raise BulkImportError('Image archive is not a valid zip file')
+        # The central directory only - members are decompressed one at a time on demand
+        self.members = {
+            os.path.basename(info.filename): info
+            for info in self.zip.infolist()
+            if not info.is_dir() and not os.path.basename(info.filename).startswith('.')
+        }
+
+    def read(self, name):
+        info = self.members.get(os.path.basename(name))
+        if info is None:
+            raise ValueError(f'Image {name} not found in archive')
+        if info.file_size > MAX_IMAGE_SIZE:
+            raise ValueError(f'Image {name} is larger than {MAX_IMAGE_SIZE // (1024 * 1024)}MB')
+        try:
+            data = self.zip.read(info)
+        except (zipfile.BadZipFile, zlib.error, EOFError):
+            raise ValueError(f'Image {name} is corrupt in the archive')
+        from PIL import Image, UnidentifiedImageError
+        try:
+            Image.open(io.BytesIO(data)).verify()
+        except Image.DecompressionBombError:
+            raise ValueError(f'Image {name} has too many pixels')
+        except (UnidentifiedImageError, OSError, SyntaxError):
+            raise ValueError(f'{name} is not a valid image')
+        return data
+
+    def close(self):
+        self.zip.close()
+
+
+def _field_max_length(name):
+    return RegisteredLicensePlate._meta.get_field(name).max_length
+
+
+def _clean_row(row):
+    """Normalise one CSV row the way register_plate does; raises ValueError"""
+    keys = ['plate_number', 'owner_name', 'image', 'vehicle_type', 'username'] + TEXT_COLUMNS
+    values = {key: (row.get(key) or '').strip() for key in keys}
+    values['plate_number'] = values['plate_number'].upper()
+    values['vehicle_type'] = values['vehicle_type'].lower() or 'car'
+
+    if not values['plate_number']:
+        raise ValueError('Missing plate_number')
+    if not values['owner_name']:
+        raise ValueError('Missing owner_name')
+    if not values['image']:
+        raise ValueError('Missing image')
+    if values['vehicle_type'] not in VEHICLE_TYPES:
+        raise ValueError(f"Unknown vehicle_type {values['vehicle_type']}")
+    for name in ['plate_number', 'owner_name'] + TEXT_COLUMNS:
+        max_length = _field_max_length(name)
+        if max_length and len(values[name]) > max_length:
+            raise ValueError(f'{name} is longer than {max_length} characters')
+    return values
+
+
+def import_plates(csv_file, images=None, default_user=None, batch_size=BATCH_SIZE):
+    """
+    Register every valid row of ``csv_file`` (binary file object).
+
+    ``images`` is an optional zip file object holding the files named in the
+    ``image`` column. Rows name their owner in an optional ``username``
+    column, falling back to ``default_user``. Returns
+    ``{'created', 'skipped', 'errors': [{'row', 'plate_number', 'error'}]}``
+    where ``skipped`` counts the duplicates among the reported rows.
+    """
+    reader = csv.DictReader(io.TextIOWrapper(csv_file, encoding='utf-8-sig', newline=''))
+    try:
+        columns = set(reader.fieldnames or [])
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise BulkImportError(f'Cannot read CSV: {e}')
+    missing = REQUIRED_COLUMNS - columns
+    if missing:
+        raise BulkImportError(f"CSV is missing columns: {', '.join(sorted(missing))}")
+
+    archive = _ImageArchive(images) if images else None
+    report = {'created': 0, 'skipped': 0, 'errors': []}
+    seen = set()
+    batch = []
+
+    try:
+        try:
+            # Line 1 is the header
+            for line_number, row in enumerate(reader, start=2):
+                batch.append((line_number, row))
+                if len(batch) >= batch_size:
+                    _import_batch(batch, archive, default_user, seen, report)
+                    batch = []
+        except (UnicodeDecodeError, csv.Error) as e:
+            report['errors'].append({'row': reader.line_num, 'plate_number': '', 'error': f'Cannot read CSV: {e}'})
+        if batch:
+            _import_batch(batch, archive, default_user, seen, report)
+    finally:
+        if archive:
+            archive.close()
+
+    report['errors'].sort(key=lambda error: error['row'])
+    return report
+
+
+def _import_batch(batch, archive, default_user, seen, report):
+    def reject(line_number, plate_number, error, skipped=False):
+        if skipped:
+            report['skipped'] += 1
+        report['errors'].append({'row': line_number, 'plate_number': plate_number, 'error': error})
+
+    cleaned = []
+    for line_number, row in batch:
+        try:
+            cleaned.append((line_number, _clean_row(row)))
+        except ValueError as e:
+            reject(line_number, (row.get('plate_number') or '').strip(), str(e))
+
+    # Owners for the whole batch in one query
+    usernames = {values['username'] for _, values in cleaned if values['username']}
+    users = {user.username: user for user in User.objects.filter(username__in=usernames)}
+
+    rows = []
+    for line_number, values in cleaned:
+        user = users.get(values['username']) if values['username'] else default_user
+        if user is None:
+            reject(line_number, values['plate_number'], f"Unknown user {values['username'] or '(none given)'}")
+            continue
+        key = (user.pk, values['plate_number'])
+        if key in seen:
+            reject(line_number, values['plate_number'], 'Duplicate of an earlier row', skipped=True)
+            continue
+        seen.add(key)
+        rows.append((line_number, user, values))
+
+    # Existing registrations for the whole batch in one query
+    existing = set(
+        RegisteredLicensePlate.objects.filter(
+            user__in={user.pk for _, user, _ in rows},
+            plate_number__in={values['plate_number'] for _, _, values in rows}
+        ).values_list('user_id', 'plate_number')
+    )
+
+    plates = []
+    saved_images = []
+    for line_number, user, values in rows:
+        if (user.pk, values['plate_number']) in existing:
+            reject(line_number, values['plate_number'], 'Already registered for this user', skipped=True)
+            continue
+        if archive is None:
+            reject(line_number, values['plate_number'], 'No image archive uploaded')
+            continue
+        try:
+            data = archive.read(values['image'])
+        except ValueError as e:
+            reject(line_number, values['plate_number'], str(e))
+            continue
+
+        image_name = default_storage.save(
+            f"registered_plates/{os.path.basename(values['image'])}", ContentFile(data)
+        )
+        saved_images.append(image_name)
+        plates.append(RegisteredLicensePlate(
+            user=user,
+            plate_number=values['plate_number'],
+            plate_image=image_name,
+            owner_name=values['owner_name'],
+            vehicle_type=values['vehicle_type'],
+            **{name: values[name] for name in TEXT_COLUMNS}
+        ))
+
+    if not plates:
+        return
+    try:
+        with transaction.atomic():
+            RegisteredLicensePlate.objects.bulk_create(plates, batch_size=BATCH_SIZE)
+            counters.increment('registered_plates', len(plates))
+    except Exception:
+        for name in saved_images:
+            default_storage.delete(name)
+        raise
+    report['created'] += len(plates)
@@ -0,0 +1,168 @@
+"""
+Lazily loaded, evictable detector components.
+
+The OCR reader and the vehicle classifier each take seconds and hundreds of
+megabytes to load, and many jobs never need one of them (a video where every
+plate is registered never classifies a vehicle). A LazyComponent loads its
+value on first use, once, however many threads ask at the same time.
+
+With ``DETECTOR_IDLE_TIMEOUT`` set, a background thread drops components
+nobody has used for that long and hands the memory back to the OS; the next
+use loads them again. Load time and the resident memory a load added are
+kept per component for ``stats()``. The memory figure is the process RSS
+before and after loading, so it is approximate when other threads allocate
+at the same time.
+"""
+import contextlib
+import ctypes
+import gc
+import logging
+import os
+import threading
+import time
+import weakref
+
+from django.conf import settings
+
+from .buffers import release_buffers
+
+logger = logging.getLogger(__name__)
+
+_UNLOADED = object()
+_registry = weakref.WeakSet()
+_reaper = None
+_reaper_lock = threading.Lock()
+
+
+def resident_bytes():
+    """Current resident set size of this process, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _release_memory():
+    release_buffers()
+    gc.collect()
+    try:
+        # glibc keeps freed arenas mapped; ask it to return them
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class LazyComponent:
+    """A value built by ``loader()`` on first use; ``unloader(value)`` runs when it is evicted"""
+
+    def __init__(self, name, loader, unloader=None, idle_timeout=None):
+        self.name = name
+        self.loader = loader
+        self.unloader = unloader
+        self.idle_timeout = settings.DETECTOR_IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+        self._lock = threading.Lock()
+        self._value = _UNLOADED
+        self._active = 0
+        self.last_used = None
+        self.loads = 0
+        self.evictions = 0
+        self.load_seconds = None
+        self.resident_bytes = None
+        _registry.add(self)
+
+    @property
+    def loaded(self):
+        return self._value is not _UNLOADED
+
+    def get(self):
+        """The loaded value, loading it first if needed"""
+        # One read of _value, so a concurrent eviction can't hand back a half-state
+        value = self._value
+        if value is _UNLOADED:
+            with self._lock:
+                if self._value is _UNLOADED:
+                    self._load()
+                value = self._value
+        self.last_used = time.monotonic()
+        return value
+
+    @contextlib.contextmanager
+    def in_use(self):
+        """Keep the component from being evicted while a call that uses it runs"""
+        with self._lock:
+            self._active += 1
+        try:
+            yield self.get()
+        finally:
+            with self._lock:
+                self._active -= 1
+                self.last_used = time.monotonic()
+
+    def _load(self):
+        rss_before = resident_bytes()
+        started = time.perf_counter()
+        try:
+            value = self.loader()
+        except Exception as e:
+            logger.error('Loading %s failed after %.1fs: %s', self.name, time.perf_counter() - started, e)
+            raise
+        self.load_seconds = round(time.perf_counter() - started, 3)
+        rss_after = resident_bytes()
+        if rss_before is not None and rss_after is not None:
+            self.resident_bytes = max(0, rss_after - rss_before)
+        logger.info('Loaded %s in %.2fs (+%s MB resident)', self.name, self.load_seconds,
+                    round(self.resident_bytes / 1048576) if self.resident_bytes is not None else '?')
+        self.loads += 1
+        self._value = value
+        if self.idle_timeout:
+            _ensure_reaper()
+
+    def evict(self):
+        """Drop the value (callers still holding it keep it alive until they finish)"""
+        with self._lock:
+            if self._value is _UNLOADED or self._active:
+                return False
+            value, self._value = self._value, _UNLOADED
+            self.evictions += 1
+        if self.unloader is not None and value is not None:
+            self.unloader(value)
+        del value
+        _release_memory()
+        logger.info('Unloaded idle %s', self.name)
+        return True
+
+    def evict_if_idle(self, now=None):
+        if not self.idle_timeout or not self.loaded or self._active or self.last_used is None:
+            return False
+        if (now or time.monotonic()) - self.last_used < self.idle_timeout:
+            return False
+        return self.evict()
+
+    def stats(self):
+        return {
+            'loaded': self.loaded,
+            'load_seconds': self.load_seconds,
+            'resident_bytes': self.resident_bytes,
+            'loads': self.loads,
+            'evictions': self.evictions,
+            'idle_seconds': round(time.monotonic() - self.last_used, 1) if self.last_used is not None else None,
+        }
+
+
+def _reap():
+    while True:
+        components = list(_registry)
+        timeouts = [component.idle_timeout for component in components if component.idle_timeout]
+        time.sleep(max(1.0, min(timeouts, default=60) / 4))
+        for component in components:
+            component.evict_if_idle()
+
+
+def _ensure_reaper():
+    global _reaper
+    if _reaper is None:
+        with _reaper_lock:
+            if _reaper is None:
+                _reaper = threading.Thread(target=_reap, name='detector-component-reaper', daemon=True)
+                _reaper.start()
@@ -0,0 +1,127 @@
+"""
+Precomputed dashboard statistics.
+
+Totals and per-day rollups are bumped in the same transaction as the row
+being created or deleted (see signals.py), and read through a short-lived
+cache, so every dashboard load costs a couple of indexed lookups instead of
+a series of full-table COUNT(*) queries. ``reconcile_counters`` rebuilds
+them from the source tables if they ever drift.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    RegisteredLicensePlate, VideoDetection, KnownLicensePlate, UnknownLicensePlate,
+    StatisticCounter, DailyStatistic
+)
+
+CACHE_KEY = 'vehicle_control:statistics'
+
+# counter name -> (model, timestamp field used for the daily rollup)
+COUNTERS = {
+    'registered_plates': (RegisteredLicensePlate, 'registered_date'),
+    'videos': (VideoDetection, 'upload_timestamp'),
+    'known_detections': (KnownLicensePlate, 'detected_at'),
+    'unknown_detections': (UnknownLicensePlate, 'detected_at'),
+}
+
+
+def counter_for_model(model):
+    """Counter name tracking ``model``, or None"""
+    for name, (counter_model, field) in COUNTERS.items():
+        if counter_model is model:
+            return name, field
+    return None, None
+
+
+def _bump(model, delta, **lookup):
+    updated = model.objects.filter(**lookup).update(value=F('value') + delta)
+    if not updated:
+        try:
+            with transaction.atomic():
+                model.objects.create(value=delta, **lookup)
+        except IntegrityError:
+            # Another writer created the row first
+            model.objects.filter(**lookup).update(value=F('value') + delta)
+
+
+def increment(name, delta=1, when=None):
+    """Add ``delta`` to counter ``name`` and to the rollup for the local date of ``when``"""
+    if not delta:
+        return
+    day = timezone.localdate(when) if when else timezone.localdate()
+    with transaction.atomic():
+        _bump(StatisticCounter, delta, name=name)
+        _bump(DailyStatistic, delta, name=name, day=day)
+    transaction.on_commit(invalidate_cache)
+
+
+def invalidate_cache():
+    cache.delete(CACHE_KEY)
+
+
+def _compute_statistics():
+    totals = dict(StatisticCounter.objects.values_list('name', 'value'))
+
+    today = timezone.localdate()
+    week_ago = today - timedelta(days=7)
+    month_ago = today - timedelta(days=30)
+    daily_videos = dict(
+        DailyStatistic.objects.filter(name='videos', day__gte=month_ago).values_list('day', 'value')
+    )
+
+    return {
+        'total_registered_plates': totals.get('registered_plates', 0),
+        'total_videos': totals.get('videos', 0),
+        'total_known_detections': totals.get('known_detections', 0),
+        'total_unknown_detections': totals.get('unknown_detections', 0),
+        'today_videos': daily_videos.get(today, 0),
+        'week_videos': sum(value for day, value in daily_videos.items() if day >= week_ago),
+        'month_videos': sum(daily_videos.values()),
+    }
+
+
+def get_statistics():
+    """Dashboard statistics dict (cached for STATISTICS_CACHE_TIMEOUT seconds)"""
+    stats = cache.get(CACHE_KEY)
+    if stats is None:
+        stats = _compute_statistics()
+        cache.set(CACHE_KEY, stats, settings.STATISTICS_CACHE_TIMEOUT)
+    return stats
+
+
+def reconcile(counter_model=StatisticCounter, daily_model=DailyStatistic, counters=None):
+    """
+    Recompute every counter from the source tables.
+
+    Returns {name: (old_total, new_total)}. The model arguments let the data
+    migration pass its historical models.
+    """
+    counters = counters or COUNTERS
+    changes = {}
+    with transaction.atomic():
+        for name, (model, field) in counters.items():
+            total = model.objects.count()
+            old = counter_model.objects.filter(name=name).values_list('value', flat=True).first()
+            counter_model.objects.update_or_create(name=name, defaults={'value': total})
+            changes[name] = (old or 0, total)
+
+            daily_model.objects.filter(name=name).delete()
+            rollup = (
+                model.objects.annotate(day=TruncDate(field))
+                .values('day')
+                .annotate(value=Count('pk'))
+                .order_by()
+            )
+            daily_model.objects.bulk_create(
+                [daily_model(name=name, day=row['day'], value=row['value']) for row in rollup],
+                batch_size=1000
+            )
+    transaction.on_commit(invalidate_cache)
+    return changes
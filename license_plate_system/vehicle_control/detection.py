@@ -9,20 +9,42 @@ from datetime import datetime
 from typing import List, Tuple, Optional, Dict
 from difflib import SequenceMatcher
 import json
+import logging
 import os
 from django.conf import settings
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 import io
 
+from .buffers import frame_buffers
+from .components import LazyComponent
+from .governor import configure_tensorflow, tile_workers
+from . import model_store
+from .ocr_store import ORIGINAL
+from .tiling import map_tiles, merge_detections, should_tile, tile_grid
+
+logger = logging.getLogger(__name__)
+
+_thread_state = threading.local()
+
+def _clahe():
+    """This thread's CLAHE object (it keeps internal buffers, so threads don't share one)"""
+    clahe = getattr(_thread_state, 'clahe', None)
+    if clahe is None:
+        clahe = _thread_state.clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
+    return clahe
+
 class AdvancedLicensePlateDetector:
     def __init__(self):
-        # Lazy import easyocr only when needed
-        import easyocr
-        self.reader = easyocr.Reader(['th', 'en'])
+        # Heavy models load on first use (and may be evicted when idle), see components.py
+        self._reader = LazyComponent('ocr_reader', self.load_reader)
+        self._vehicle_classifier = LazyComponent('vehicle_model', self.load_vehicle_model,
+                                                 unloader=self.unload_vehicle_model)
         self.confidence_threshold = 0.6
         self.min_area = 1000
+        self.min_plate_size = (100, 20)  # a contour region must be wider and taller than this
         self.aspect_ratio_range = (2, 8)
+        self.morph_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
         
         # Thai license plate patterns
         self.thai_patterns = [
@@ -38,50 +60,103 @@ class AdvancedLicensePlateDetector:
             r'^[A-Z0-9]{5,8}$',  # General alphanumeric
         ]
         
-        # Vehicle type model (optional - if available)
-        self.vehicle_model = None
-        self.class_names = []
-        self.load_vehicle_model()
+    @property
+    def reader(self):
+        """EasyOCR reader, loaded on first use"""
+        return self._reader.get()
+
+    @property
+    def vehicle_model(self):
+        """Vehicle classification model, loaded on first use; None if unavailable"""
+        classifier = self._vehicle_classifier.get()
+        return classifier[0] if classifier else None
+
+    @property
+    def class_names(self):
+        classifier = self._vehicle_classifier.get()
+        return classifier[1] if classifier else []
+
+    def load_reader(self):
+        """EasyOCR reader built from the verified local model store, never downloading"""
+        detector_path, recognizer_path = model_store.require('ocr_detector', 'ocr_recognizer')
+        # Lazy import easyocr only when needed
+        import easyocr
+        ocr_dir = str(detector_path.parent)
+        try:
+            return easyocr.Reader(
+                model_store.EASYOCR_LANGUAGES,
+                model_storage_directory=ocr_dir,
+                user_network_directory=os.path.join(ocr_dir, 'user_network'),
+                download_enabled=False,
+                verbose=False,
+            )
+        except FileNotFoundError as e:
+            # EasyOCR's own MD5 check failed although the manifest matched
+            raise model_store.ModelStoreError(f'EasyOCR rejected the model store: {e}') from e
 
     def load_vehicle_model(self):
-        """Load vehicle classification model if available"""
+        """Load vehicle classification model from the model store if available; returns (model, class_names) or None"""
+        if not model_store.available('vehicle_model', 'vehicle_labels'):
+            logger.info('No vehicle model in %s, vehicle type detection disabled', model_store.store_dir())
+            return None
+        try:
+            model_path, labels_path = model_store.require('vehicle_model', 'vehicle_labels')
+        except model_store.ModelStoreError as e:
+            logger.error('%s; vehicle type detection disabled', e)
+            return None
         try:
+            # TensorFlow's thread pools can only be sized before it starts
+            configure_tensorflow()
             from keras.models import load_model
-            model_path = os.path.join(settings.BASE_DIR, "keras_Model.h5")
-            labels_path = os.path.join(settings.BASE_DIR, "labels.txt")
-            
-            if os.path.exists(model_path) and os.path.exists(labels_path):
-                self.vehicle_model = load_model(model_path, compile=False)
-                with open(labels_path, "r") as f:
-                    self.class_names = f.readlines()
+            vehicle_model = load_model(str(model_path), compile=False)
+            with open(labels_path, "r") as f:
+                class_names = f.readlines()
+            return vehicle_model, class_names
         except ImportError:
             print("Keras not installed, vehicle type detection disabled")
-            self.vehicle_model = None
+        return None
+
+    def unload_vehicle_model(self, classifier):
+        """Free the graph Keras keeps for an evicted model"""
+        from keras import backend
+        backend.clear_session()
 
-    def preprocess_image(self, image: np.ndarray) -> np.ndarray:
-        """Advanced image preprocessing for better OCR accuracy"""
+    def component_stats(self):
+        """Load time, resident size and eviction counts per heavy component"""
+        return {component.name: component.stats() for component in (self._reader, self._vehicle_classifier)}
+
+    def preprocess_image(self, image: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Advanced image preprocessing for better OCR accuracy; the result is written into ``out`` if given"""
+        # Intermediate steps write into this thread's scratch buffers
+        buffers = frame_buffers()
+        shape = image.shape[:2]
+        
         # Convert to grayscale
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=buffers.get('gray', shape))
         
         # Apply bilateral filter to reduce noise while keeping edges sharp
-        filtered = cv2.bilateralFilter(gray, 11, 17, 17)
+        filtered = cv2.bilateralFilter(gray, 11, 17, 17, dst=buffers.get('filtered', shape))
         
         # Apply CLAHE (Contrast Limited Adaptive Histogram Equalization)
-        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
-        enhanced = clahe.apply(filtered)
+        enhanced = _clahe().apply(filtered, buffers.get('enhanced', shape))
         
         # Apply morphological operations
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-        morph = cv2.morphologyEx(enhanced, cv2.MORPH_CLOSE, kernel)
+        morph = cv2.morphologyEx(enhanced, cv2.MORPH_CLOSE, self.morph_kernel, dst=out)
         
         return morph
 
-    def detect_license_plate_contours(self, image: np.ndarray) -> List[Tuple[int, int, int, int]]:
-        """Detect license plate regions using contour detection"""
-        gray = self.preprocess_image(image)
+    def detect_license_plate_contours(self, image: np.ndarray, min_area: Optional[int] = None,
+                                      aspect_ratio_range: Optional[Tuple[float, float]] = None,
+                                      preprocessed: Optional[np.ndarray] = None,
+                                      min_size: Optional[Tuple[float, float]] = None) -> List[Tuple[int, int, int, int]]:
+        """Detect license plate regions using contour detection (``preprocessed``: image already through preprocess_image)"""
+        min_area = self.min_area if min_area is None else min_area
+        min_width, min_height = min_size or self.min_plate_size
+        aspect_ratio_range = aspect_ratio_range or self.aspect_ratio_range
+        gray = preprocessed if preprocessed is not None else self.preprocess_image(image)
         
         # Edge detection
-        edges = cv2.Canny(gray, 50, 150, apertureSize=3)
+        edges = cv2.Canny(gray, 50, 150, edges=frame_buffers().like('edges', gray), apertureSize=3)
         
         # Find contours
         contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -91,21 +166,25 @@ class AdvancedLicensePlateDetector:
         for contour in contours:
             # Calculate area and bounding rectangle
             area = cv2.contourArea(contour)
-            if area < self.min_area:
+            if area < min_area:
                 continue
                 
             x, y, w, h = cv2.boundingRect(contour)
             aspect_ratio = w / h
             
             # Check if it matches license plate dimensions
-            if (self.aspect_ratio_range[0] <= aspect_ratio <= self.aspect_ratio_range[1] and
-                w > 100 and h > 20):
+            if (aspect_ratio_range[0] <= aspect_ratio <= aspect_ratio_range[1] and
+                w > min_width and h > min_height):
                 plate_candidates.append((x, y, w, h))
         
         return plate_candidates
 
-    def extract_text_from_region(self, image: np.ndarray, region: Tuple[int, int, int, int]) -> Tuple[str, float]:
-        """Extract text from a specific region using multiple methods"""
+    def plate_variants(self, image: np.ndarray, region: Tuple[int, int, int, int], copy: bool = False):
+        """
+        The padded plate crop as OCR sees it - original, enhanced and Otsu -
+        with the crop's (x, y) and scale; None if the crop is empty. The
+        variants live in this thread's buffers unless ``copy`` is set.
+        """
         x, y, w, h = region
         
         # Add padding
@@ -118,39 +197,88 @@ class AdvancedLicensePlateDetector:
         roi = image[y:y+h, x:x+w]
         
         if roi.size == 0:
-            return "", 0.0
+            return None
+        
+        buffers = frame_buffers()
         
         # Resize for better OCR
+        scale_factor = 1.0
         if w < 200:
             scale_factor = 200 / w
             new_w = int(w * scale_factor)
             new_h = int(h * scale_factor)
-            roi = cv2.resize(roi, (new_w, new_h), interpolation=cv2.INTER_CUBIC)
+            roi = cv2.resize(roi, (new_w, new_h), dst=buffers.get('plate', (new_h, new_w) + roi.shape[2:]),
+                             interpolation=cv2.INTER_CUBIC)
+        
+        plate_shape = roi.shape[:2]
+        plate_gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY, dst=buffers.get('plate_gray', plate_shape))
         
         # Try multiple preprocessing methods
         methods = [
             roi,  # Original
-            self.preprocess_image(roi),  # Enhanced
-            cv2.threshold(cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY), 0, 255, 
-                         cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]  # Otsu threshold
+            self.preprocess_image(roi, out=buffers.get('plate_enhanced', plate_shape)),  # Enhanced
+            cv2.threshold(plate_gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU,
+                          dst=buffers.get('plate_otsu', plate_shape))[1]  # Otsu threshold
         ]
-        
+        if copy:
+            methods = [method.copy() for method in methods]
+        return methods, (x, y), scale_factor
+
+    def best_plate_text(self, variant_results) -> Tuple[str, float]:
+        """Most confident valid plate text over the OCR results of a crop's variants"""
         best_text = ""
         best_confidence = 0.0
+        for results in variant_results:
+            for (bbox, text, conf) in results:
+                if conf > best_confidence and len(text.strip()) >= 4:
+                    candidate_text = self.clean_text(text)
+                    if self.validate_license_plate(candidate_text):
+                        best_text = candidate_text
+                        best_confidence = conf
+        return best_text, best_confidence
+
+    def extract_text_from_region(self, image: np.ndarray, region: Tuple[int, int, int, int],
+                                 ocr_log=None) -> Tuple[str, float]:
+        """Extract text from a specific region using multiple methods; raw results go to ``ocr_log`` if given"""
+        plate = self.plate_variants(image, region)
+        if plate is None:
+            return "", 0.0
+        methods, origin, scale_factor = plate
         
-        for processed_roi in methods:
+        variant_results = []
+        for variant, processed_roi in enumerate(methods, start=ORIGINAL):
             try:
                 results = self.reader.readtext(processed_roi)
-                for (bbox, text, conf) in results:
-                    if conf > best_confidence and len(text.strip()) >= 4:
-                        candidate_text = self.clean_text(text)
-                        if self.validate_license_plate(candidate_text):
-                            best_text = candidate_text
-                            best_confidence = conf
+                if ocr_log is not None:
+                    ocr_log.region(variant, region, origin, scale_factor, results)
+                variant_results.append(results)
             except Exception as e:
                 continue
         
-        return best_text, best_confidence
+        return self.best_plate_text(variant_results)
+
+    def readtext_many(self, images: List[np.ndarray]) -> List[list]:
+        """
+        EasyOCR results for each image. Images of the same size share one
+        ``readtext_batched`` call, so the text detector runs once per size
+        rather than once per image; a failed call leaves its images with [].
+        """
+        groups = {}
+        for index, image in enumerate(images):
+            groups.setdefault(image.shape[:2], []).append(index)
+        results = [[] for _ in images]
+        for indexes in groups.values():
+            try:
+                if len(indexes) == 1:
+                    found = [self.reader.readtext(images[indexes[0]])]
+                else:
+                    found = self.reader.readtext_batched([images[i] for i in indexes], batch_size=len(indexes))
+            except Exception as e:
+                logger.warning('OCR failed for %d image(s): %s', len(indexes), e)
+                continue
+            for index, image_results in zip(indexes, found):
+                results[index] = image_results
+        return results
 
     def clean_text(self, text: str) -> str:
         """Clean and standardize extracted text"""
@@ -187,63 +315,168 @@ class AdvancedLicensePlateDetector:
         
         return has_letter and has_number
 
-    def detect_license_plate(self, image: np.ndarray) -> Tuple[str, float, Tuple[int, int, int, int]]:
-        """Main detection method combining multiple approaches"""
-        best_text = ""
-        best_confidence = 0.0
-        best_region = None
+    def full_image_plates(self, results, confidence_threshold: float) -> List[Tuple[str, float, Tuple[int, int, int, int]]]:
+        """Valid plates (text, confidence, region) in the OCR results of a whole image"""
+        plates = []
+        for (bbox, text, conf) in results:
+            if conf > confidence_threshold:
+                candidate_text = self.clean_text(text)
+                if self.validate_license_plate(candidate_text):
+                    # Calculate bounding box
+                    points = np.array(bbox, dtype=np.int32)
+                    plates.append((candidate_text, conf, tuple(cv2.boundingRect(points))))
+        return plates
+
+    def detect_plate_candidates(self, image: np.ndarray, min_area: Optional[int] = None,
+                                aspect_ratio_range: Optional[Tuple[float, float]] = None,
+                                confidence_threshold: Optional[float] = None,
+                                ocr_log=None, min_size=None) -> List[Tuple[str, float, Tuple[int, int, int, int]]]:
+        """Every plate (text, confidence, region) found by full-image OCR and by contour regions"""
+        confidence_threshold = self.confidence_threshold if confidence_threshold is None else confidence_threshold
+        candidates = []
         
         # Method 1: Direct EasyOCR on preprocessed image
-        preprocessed = self.preprocess_image(image)
+        preprocessed = self.preprocess_image(image, out=frame_buffers().get('preprocessed', image.shape[:2]))
         try:
             results = self.reader.readtext(preprocessed)
-            for (bbox, text, conf) in results:
-                if conf > self.confidence_threshold:
-                    candidate_text = self.clean_text(text)
-                    if self.validate_license_plate(candidate_text) and conf > best_confidence:
-                        best_text = candidate_text
-                        best_confidence = conf
-                        # Calculate bounding box
-                        points = np.array(bbox, dtype=np.int32)
-                        x, y, w, h = cv2.boundingRect(points)
-                        best_region = (x, y, w, h)
+            if ocr_log is not None:
+                ocr_log.full(results)
+            candidates.extend(self.full_image_plates(results, confidence_threshold))
         except Exception as e:
             pass
         
         # Method 2: Contour-based detection
-        plate_candidates = self.detect_license_plate_contours(image)
+        # Same preprocessing as above, so it is reused rather than recomputed
+        plate_candidates = self.detect_license_plate_contours(image, min_area, aspect_ratio_range, preprocessed, min_size)
         
         for region in plate_candidates:
-            text, conf = self.extract_text_from_region(image, region)
-            if conf > best_confidence and conf > self.confidence_threshold:
-                best_text = text
-                best_confidence = conf
-                best_region = region
+            text, conf = self.extract_text_from_region(image, region, ocr_log)
+            if conf > confidence_threshold:
+                candidates.append((text, conf, region))
+        
+        return candidates
+
+    def detect_license_plates_tiled(self, image: np.ndarray, min_area: Optional[int] = None,
+                                    aspect_ratio_range: Optional[Tuple[float, float]] = None,
+                                    confidence_threshold: Optional[float] = None,
+                                    ocr_log=None, min_size=None) -> List[Tuple[str, float, Tuple[int, int, int, int]]]:
+        """All plates in a large image: overlapping tiles detected in parallel, merged across seams"""
+        height, width = image.shape[:2]
+        tiles = tile_grid(height, width, settings.DETECTION_TILE_SIZE, settings.DETECTION_TILE_OVERLAP)
+        
+        def detect_tile(tile):
+            x, y, w, h = tile
+            tile_log = ocr_log.shifted(x, y) if ocr_log is not None else None
+            found = self.detect_plate_candidates(image[y:y+h, x:x+w], min_area, aspect_ratio_range, confidence_threshold,
+                                                 tile_log, min_size)
+            return [(text, conf, (rx + x, ry + y, rw, rh)) for text, conf, (rx, ry, rw, rh) in found]
+        
+        # The job's CPU budget already split its share between tiles and library threads
+        detections = map_tiles(detect_tile, tiles, tile_workers())
+        return merge_detections(detections, settings.DETECTION_TILE_NMS_THRESHOLD)
+
+    def detect_license_plate(self, image: np.ndarray, min_area: Optional[int] = None,
+                             aspect_ratio_range: Optional[Tuple[float, float]] = None,
+                             confidence_threshold: Optional[float] = None,
+                             ocr_log=None, min_size=None) -> Tuple[str, float, Tuple[int, int, int, int]]:
+        """
+        Main detection method combining multiple approaches; keyword arguments override the defaults per call.
+        ``ocr_log`` (an ocr_store.FrameOCRLog) receives every raw OCR result, before any filtering.
+        """
+        with self._reader.in_use():
+            if should_tile(image):
+                candidates = self.detect_license_plates_tiled(image, min_area, aspect_ratio_range, confidence_threshold,
+                                                              ocr_log, min_size)
+            else:
+                candidates = self.detect_plate_candidates(image, min_area, aspect_ratio_range, confidence_threshold,
+                                                          ocr_log, min_size)
+        
+        if not candidates:
+            return "", 0.0, None
+        # max() keeps the first of equally confident candidates
+        return max(candidates, key=lambda candidate: candidate[1])
+
+    def detect_license_plates(self, images: List[np.ndarray]) -> List[Tuple[str, float, Tuple[int, int, int, int]]]:
+        """
+        detect_license_plate for several images, with the OCR of all of them
+        batched: one pass over the whole images, then one over every plate
+        crop. Large images that would be tiled are detected one by one.
+        """
+        results = [None] * len(images)
+        batched = []
+        for index, image in enumerate(images):
+            if should_tile(image):
+                results[index] = self.detect_license_plate(image)
+            else:
+                batched.append(index)
+        if not batched:
+            return results
+        
+        with self._reader.in_use():
+            # Copies: this thread's buffers are reused for the next image
+            preprocessed = [self.preprocess_image(images[i]) for i in batched]
+            full_results = self.readtext_many(preprocessed)
+            candidates = {i: self.full_image_plates(found, self.confidence_threshold)
+                          for i, found in zip(batched, full_results)}
+            
+            crops = []  # (image index, region, first variant, variant count)
+            variants = []
+            for i, gray in zip(batched, preprocessed):
+                for region in self.detect_license_plate_contours(images[i], preprocessed=gray):
+                    plate = self.plate_variants(images[i], region, copy=True)
+                    if plate is not None:
+                        crops.append((i, region, len(variants), len(plate[0])))
+                        variants.extend(plate[0])
+            variant_results = self.readtext_many(variants)
+            for i, region, first, count in crops:
+                text, conf = self.best_plate_text(variant_results[first:first + count])
+                if conf > self.confidence_threshold:
+                    candidates[i].append((text, conf, region))
         
-        return best_text, best_confidence, best_region
+        for i in batched:
+            # max() keeps the first of equally confident candidates
+            results[i] = max(candidates[i], key=lambda candidate: candidate[1]) if candidates[i] else ("", 0.0, None)
+        return results
 
     def predict_vehicle_type(self, image):
         """Predict vehicle type using the trained model"""
-        if self.vehicle_model is None:
-            return "Unknown"
-        
+        return self.predict_vehicle_types([image])[0]
+
+    def predict_vehicle_types(self, images):
+        """Predict vehicle types for several images with one model call"""
+        if not images:
+            return []
+        with self._vehicle_classifier.in_use() as classifier:
+            if classifier is None:
+                return ["Unknown"] * len(images)
+            return self._classify_vehicles(classifier, images)
+
+    def _classify_vehicles(self, classifier, images):
+        vehicle_model, class_names = classifier
         try:
-            resized = cv2.resize(image, (224, 224))
-            image_np = np.asarray(resized, dtype=np.float32).reshape(1, 224, 224, 3)
-            image_np = (image_np / 127.5) - 1
+            buffers = frame_buffers()
+            batch = buffers.get('vehicle_batch', (len(images), 224, 224, 3), np.float32)
+            resized = buffers.get('vehicle_resized', (224, 224, 3))
+            for i, image in enumerate(images):
+                batch[i] = cv2.resize(image, (224, 224), dst=resized)
+            # Scale to [-1, 1] in place
+            np.divide(batch, 127.5, out=batch)
+            np.subtract(batch, 1, out=batch)
             
-            prediction = self.vehicle_model.predict(image_np, verbose=0)
-            index = np.argmax(prediction)
-            
-            if index < len(self.class_names):
-                vehicle_type = self.class_names[index].strip().split()[-1]
-                confidence = float(prediction[0][index])
-                return vehicle_type if confidence > 0.5 else "Unknown"
+            predictions = vehicle_model.predict(batch, verbose=0)
+            vehicle_types = []
+            for prediction in predictions:
+                index = np.argmax(prediction)
+                vehicle_type = "Unknown"
+                if index < len(class_names) and float(prediction[index]) > 0.5:
+                    vehicle_type = class_names[index].strip().split()[-1]
+                vehicle_types.append(vehicle_type)
+            return vehicle_types
             
         except Exception as e:
             print(f"Error in vehicle type prediction: {e}")
         
-        return "Unknown"
+        return ["Unknown"] * len(images)
 
     def save_detection_image(self, image: np.ndarray, filename: str) -> str:
         """Save detection image to Django media storage"""
@@ -274,4 +507,10 @@ def get_detector():
             # Double-check pattern to avoid race conditions
             if _detector_instance is None:
                 _detector_instance = AdvancedLicensePlateDetector()
-    return _detector_instance
\ No newline at end of file
+    return _detector_instance
+
+def detector_stats():
+    """Per-component metrics of this process's detector, without creating it"""
+    if _detector_instance is None:
+        return {}
+    return _detector_instance.component_stats()
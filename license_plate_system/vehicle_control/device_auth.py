@@ -0,0 +1,46 @@
+"""
+Who may call the detection and gate APIs.
+
+Staff use them through their login session, with Django's usual CSRF check.
+Devices such as cameras and gate controllers have no session. They send
+``Authorization: Bearer <token>`` with one of ``DEVICE_API_TOKENS`` instead,
+and skip the CSRF check because a browser never adds that header itself.
+"""
+import functools
+import hmac
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.views.decorators.csrf import csrf_exempt
+
+
+def has_device_token(request):
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        return False
+    token = token.strip().encode()
+    # Compare against every token so the time taken doesn't reveal which one matched
+    matches = [hmac.compare_digest(token, allowed.encode()) for allowed in settings.DEVICE_API_TOKENS]
+    return any(matches)
+
+
+def _csrf_failure(request):
+    """The CSRF middleware's rejection of this request, or None if it passes"""
+    return CsrfViewMiddleware(lambda request: None).process_view(request, None, (), {})
+
+
+def staff_or_device_required(view):
+    """Let an async view through for a staff session (CSRF-checked) or a valid device token"""
+    @csrf_exempt
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if not has_device_token(request):
+            user = await request.auser()
+            if not (user.is_active and user.is_staff):
+                return JsonResponse({'error': 'Staff login or a device token is required'}, status=403)
+            failure = _csrf_failure(request)
+            if failure is not None:
+                return failure
+        return await view(request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,176 @@
+"""
+Streaming CSV / NDJSON export of plates and detections.
+
+Rows are read with ``.values_list(...).iterator(chunk_size=...)`` - a named
+server-side cursor on PostgreSQL - and encoded into ~64KB pieces as they
+arrive, so memory stays flat however many rows match and the first bytes go
+out before the query has finished.
+
+Under ASGI, Django would turn a plain generator into a list before sending
+it. ``aiter_export`` wraps the generator in an async iterator instead, and
+steps it on a thread of its own.
+"""
+import asyncio
+import csv
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import RegisteredLicensePlate, KnownLicensePlate, UnknownLicensePlate
+from .search import plate_search_q
+
+CHUNK_SIZE = 2000
+FLUSH_SIZE = 64 * 1024
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+# kind -> (model, date field, exported columns)
+EXPORTS = {
+    'registered': (RegisteredLicensePlate, 'registered_date', [
+        'id', 'plate_number', 'owner_name', 'owner_contact', 'vehicle_type',
+        'vehicle_brand', 'vehicle_model', 'vehicle_color', 'registered_date',
+        'user_id', 'plate_image',
+    ]),
+    'known': (KnownLicensePlate, 'detected_at', [
+        'id', 'detected_at', 'detected_plate_number', 'registered_plate__plate_number',
+        'registered_plate__owner_name', 'confidence_score', 'video_detection_id',
+        'frame_number', 'timestamp_seconds', 'detection_image',
+    ]),
+    'unknown': (UnknownLicensePlate, 'detected_at', [
+        'id', 'detected_at', 'detected_plate_number', 'vehicle_type', 'confidence_score',
+        'video_detection_id', 'frame_number', 'timestamp_seconds', 'detection_image',
+    ]),
+}
+
+
+class ExportError(ValueError):
+    """Invalid export kind, format or filter"""
+
+
+def parse_bound(value, end=False):
+    """
+    Parse a ``YYYY-MM-DD`` or ISO datetime filter bound.
+
+    A bare end date covers that whole day; naive values use the current time zone.
+    """
+    if not value:
+        return None
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError
+            moment = datetime.combine(day + timedelta(days=1) if end else day, time.min)
+    except ValueError:
+        raise ExportError(f'Invalid date: {value}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def export_queryset(kind, start=None, end=None, video_id=None, plate=None):
+    """Ordered ``values_list`` queryset and column names for one export"""
+    if kind not in EXPORTS:
+        raise ExportError(f'Unknown export: {kind}')
+    model, date_field, columns = EXPORTS[kind]
+
+    queryset = model.objects.all()
+    start, end = parse_bound(start), parse_bound(end, end=True)
+    if start:
+        queryset = queryset.filter(**{f'{date_field}__gte': start})
+    if end:
+        queryset = queryset.filter(**{f'{date_field}__lt': end})
+    if video_id:
+        if kind == 'registered':
+            raise ExportError('Registered plates cannot be filtered by video')
+        try:
+            queryset = queryset.filter(video_detection_id=int(video_id))
+        except (TypeError, ValueError):
+            raise ExportError(f'Invalid video id: {video_id}')
+    if plate:
+        queryset = queryset.filter(plate_search_q(model, plate))
+
+    return queryset.order_by('pk').values_list(*columns), columns
+
+
+class _Echo:
+    """csv.writer target that hands back each encoded row"""
+
+    def write(self, value):
+        return value
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _buffered(lines):
+    buffer, size = [], 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= FLUSH_SIZE:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def iter_export(kind, fmt='csv', chunk_size=CHUNK_SIZE, **filters):
+    """Validate the request, then return a generator of encoded text pieces"""
+    if fmt not in FORMATS:
+        raise ExportError(f'Unknown format: {fmt}')
+    queryset, columns = export_queryset(kind, **filters)
+    rows = queryset.iterator(chunk_size=chunk_size)
+
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        lines = (writer.writerow([_encode_value(v) for v in row]) for row in rows)
+        header = writer.writerow(columns)
+    else:
+        encoder = DjangoJSONEncoder(ensure_ascii=False)
+        lines = (encoder.encode({c: _encode_value(v) for c, v in zip(columns, row)}) + '\n' for row in rows)
+        header = None
+
+    def generate():
+        if header:
+            yield header
+        yield from _buffered(lines)
+
+    return generate()
+
+
+def _close_export(pieces):
+    pieces.close()
+    # The export thread's own connection (and server-side cursor) ends with it
+    connection.close()
+
+
+async def aiter_export(pieces):
+    """
+    Async iterator over ``pieces`` (from ``iter_export``) for ASGI responses.
+
+    Each export gets a single thread of its own, so its cursor stays on one
+    connection and a slow client never holds the thread that serves
+    Django's sync views.
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='export')
+    try:
+        while True:
+            piece = await loop.run_in_executor(executor, next, pieces, None)
+            if piece is None:
+                break
+            yield piece
+    finally:
+        await loop.run_in_executor(executor, _close_export, pieces)
+        executor.shutdown(wait=False)
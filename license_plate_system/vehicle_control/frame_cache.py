@@ -0,0 +1,318 @@
+"""
+On-disk cache of a video's sampled frames at analysis resolution.
+
+With ``FRAME_CACHE_ENABLED`` on, sampled frames are downscaled so that their
+longer side is at most ``FRAME_CACHE_MAX_SIDE``, and detection runs on these
+proxies, with its size limits (contour area and plate width/height) scaled
+down to match. Proxies are below the tiling threshold, so large frames are
+not tiled. The first pass over a video also writes them into a NumPy memmap
+under ``FRAME_CACHE_DIR``, one entry per video and sampling config (frame
+skip, analysis size, and the video file's size and mtime, so a replaced
+upload is never served stale). Later passes, and frame lookups such as
+``reevaluate_video``, read the mapped frames instead of decoding the
+original file.
+
+Entries are evicted least recently used first once together they would pass
+``FRAME_CACHE_MAX_BYTES``; an entry still being written by a live process is
+kept. Entries of a deleted video are removed with it.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+
+import cv2
+import numpy as np
+from django.conf import settings
+
+from .governor import _pid_alive
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent writers may then briefly overshoot the budget
+    fcntl = None
+
+FRAMES = 'frames.npy'
+PRESENT = 'present.npy'
+META = 'meta.json'
+
+
+def analysis_size(width, height, max_side=None):
+    """(width, height) of a frame's proxy: the longer side capped at ``max_side``, aspect ratio kept"""
+    max_side = settings.FRAME_CACHE_MAX_SIDE if max_side is None else max_side
+    longer = max(width, height)
+    if not max_side or longer <= max_side:
+        return width, height
+    scale = max_side / longer
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def to_analysis(frame, max_side=None, out=None):
+    """``frame`` at analysis resolution, written into ``out`` if given"""
+    height, width = frame.shape[:2]
+    size = analysis_size(width, height, max_side)
+    if size == (width, height):
+        if out is None:
+            return frame
+        np.copyto(out, frame)
+        return out
+    return cv2.resize(frame, size, dst=out, interpolation=cv2.INTER_AREA)
+
+
+def _entry_path(video_id, video_path, frame_skip, max_side):
+    stat = os.stat(video_path)
+    key = hashlib.sha1(f'{frame_skip}:{max_side}:{stat.st_size}:{stat.st_mtime_ns}'.encode()).hexdigest()[:12]
+    return os.path.join(settings.FRAME_CACHE_DIR, f'video_{video_id}_{key}')
+
+
+def _read_meta(path):
+    try:
+        with open(os.path.join(path, META)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(path, meta):
+    tmp = os.path.join(path, f'.{META}.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(path, META))
+
+
+def _remove(path):
+    shutil.rmtree(path, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def _cache_lock():
+    """Serialise eviction and entry creation between the processes of this host"""
+    os.makedirs(settings.FRAME_CACHE_DIR, exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(settings.FRAME_CACHE_DIR, '.lock'), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def entries():
+    """Every cache entry: dicts with path, video_id, bytes, last_used, complete and writer"""
+    try:
+        names = os.listdir(settings.FRAME_CACHE_DIR)
+    except FileNotFoundError:
+        return []
+    found = []
+    for name in names:
+        path = os.path.join(settings.FRAME_CACHE_DIR, name)
+        if not name.startswith('video_') or not os.path.isdir(path):
+            continue
+        meta = _read_meta(path) or {}
+        size = 0
+        for filename in (FRAMES, PRESENT, META):
+            with contextlib.suppress(OSError):
+                size += os.path.getsize(os.path.join(path, filename))
+        try:
+            last_used = os.path.getmtime(os.path.join(path, META))
+        except OSError:
+            last_used = 0.0
+        found.append({
+            'path': path,
+            'video_id': meta.get('video_id'),
+            'bytes': size,
+            'last_used': last_used,
+            'complete': meta.get('complete', False),
+            'writer': meta.get('writer'),
+        })
+    return found
+
+
+def usage():
+    """Bytes used by the cache and its number of entries"""
+    found = entries()
+    return {'bytes': sum(entry['bytes'] for entry in found), 'entries': len(found)}
+
+
+def _make_room(needed, video_id, keep):
+    """Evict entries until ``needed`` more bytes fit the budget; False if they can't"""
+    if needed > settings.FRAME_CACHE_MAX_BYTES:
+        return False
+    found = [entry for entry in entries() if entry['path'] != keep]
+    # Entries of this video under another config are superseded by the new one
+    for entry in [entry for entry in found if entry['video_id'] == video_id]:
+        _remove(entry['path'])
+        found.remove(entry)
+
+    used = sum(entry['bytes'] for entry in found)
+    for entry in sorted(found, key=lambda entry: entry['last_used']):
+        if used + needed <= settings.FRAME_CACHE_MAX_BYTES:
+            break
+        if not entry['complete'] and entry['writer'] and _pid_alive(entry['writer']):
+            continue
+        _remove(entry['path'])
+        used -= entry['bytes']
+    return used + needed <= settings.FRAME_CACHE_MAX_BYTES
+
+
+def delete_video(video_id):
+    for entry in entries():
+        if os.path.basename(entry['path']).startswith(f'video_{video_id}_'):
+            _remove(entry['path'])
+
+
+class CachedFrames:
+    """A complete entry, read through the memmap: the same interface as a decoding pass"""
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.frame_skip = meta['frame_skip']
+        self.fps = meta['fps']
+        self.total_frames = meta['total_frames']
+        self.frames_read = meta['frames_read']
+        self.count = meta['sampled']
+        # Proxy width over source width
+        self.scale = meta['shape'][2] / meta['source_shape'][1]
+        self._frames = np.load(os.path.join(path, FRAMES), mmap_mode='r')
+
+    def sampled(self, start=0):
+        """(frame_number, frame) for every sampled frame from ``start`` on; frames are read-only views"""
+        for index in range(-(-start // self.frame_skip), self.count):
+            yield index * self.frame_skip, self._frames[index]
+
+    def frame(self, frame_number):
+        """The cached proxy of ``frame_number``, or None if it isn't a sampled frame"""
+        index, offset = divmod(frame_number, self.frame_skip)
+        if offset or index >= self.count:
+            return None
+        return self._frames[index]
+
+    def close(self, finished=True):
+        self._frames = None
+
+
+def open_cached(video_id, video_path, frame_skip, max_side=None):
+    """CachedFrames of a complete entry for this video and config, or None"""
+    max_side = settings.FRAME_CACHE_MAX_SIDE if max_side is None else max_side
+    try:
+        path = _entry_path(video_id, video_path, frame_skip, max_side)
+    except OSError:
+        return None
+    meta = _read_meta(path)
+    if not meta or not meta.get('complete'):
+        return None
+    try:
+        cached = CachedFrames(path, meta)
+    except (OSError, ValueError):
+        _remove(path)
+        return None
+    # The meta file's mtime is the entry's last use for eviction
+    with contextlib.suppress(OSError):
+        os.utime(os.path.join(path, META))
+    return cached
+
+
+class FrameCacheWriter:
+    """Fills an entry during a decoding pass; ``put`` returns the frame to analyse"""
+
+    def __init__(self, path, meta, frames, present):
+        self.path = path
+        self.meta = meta
+        self.frame_skip = meta['frame_skip']
+        self.source_shape = tuple(meta['source_shape'])
+        self._frames = frames
+        self._present = present
+
+    @classmethod
+    def create(cls, video_id, video_path, frame_skip, fps, total_frames, frame_shape, start=0, max_side=None):
+        """
+        A writer for this video and config, or None when it can't be cached
+        (unknown frame count, over the budget or out of disk space). A partly
+        written entry (a preempted job) is continued rather than started over;
+        a pass starting at ``start`` > 0 without one writes nothing.
+        """
+        max_side = settings.FRAME_CACHE_MAX_SIDE if max_side is None else max_side
+        height, width = frame_shape[:2]
+        if total_frames <= 0 or not width or not height:
+            return None
+        proxy_width, proxy_height = analysis_size(width, height, max_side)
+        shape = (-(-total_frames // frame_skip), proxy_height, proxy_width, 3)
+        nbytes = int(np.prod(shape))
+
+        with _cache_lock():
+            path = _entry_path(video_id, video_path, frame_skip, max_side)
+            meta = _read_meta(path)
+            if meta and not meta.get('complete') and tuple(meta.get('shape', ())) == shape:
+                try:
+                    frames = np.load(os.path.join(path, FRAMES), mmap_mode='r+')
+                    present = np.load(os.path.join(path, PRESENT), mmap_mode='r+')
+                except (OSError, ValueError):
+                    meta = None
+                else:
+                    meta['writer'] = os.getpid()
+                    _write_meta(path, meta)
+                    return cls(path, meta, frames, present)
+            elif meta and meta.get('complete'):
+                return None
+            if start:
+                return None
+            _remove(path)
+
+            if not _make_room(nbytes, video_id, keep=path):
+                return None
+            if shutil.disk_usage(settings.FRAME_CACHE_DIR).free < nbytes:
+                return None
+            os.makedirs(path)
+            meta = {
+                'video_id': video_id, 'frame_skip': frame_skip, 'max_side': max_side,
+                'fps': fps, 'total_frames': total_frames, 'source_shape': [height, width],
+                'shape': list(shape), 'complete': False, 'writer': os.getpid(),
+            }
+            try:
+                frames = np.lib.format.open_memmap(os.path.join(path, FRAMES), mode='w+', dtype=np.uint8, shape=shape)
+                present = np.lib.format.open_memmap(os.path.join(path, PRESENT), mode='w+', dtype=np.bool_,
+                                                    shape=shape[:1])
+                # Allocate the blocks now: a memmap write into a sparse file on a full disk is SIGBUS
+                if hasattr(os, 'posix_fallocate'):
+                    with open(os.path.join(path, FRAMES), 'r+b') as f:
+                        os.posix_fallocate(f.fileno(), 0, os.fstat(f.fileno()).st_size)
+                _write_meta(path, meta)
+            except OSError:
+                _remove(path)
+                return None
+        return cls(path, meta, frames, present)
+
+    def put(self, frame_number, frame):
+        """Store a sampled frame's proxy and return it; frames that don't fit the entry end the caching"""
+        index = frame_number // self.frame_skip
+        if self._frames is None or index >= len(self._frames) or frame.shape[:2] != self.source_shape:
+            self.abandon()
+            return None
+        slot = self._frames[index]
+        to_analysis(frame, self.meta['max_side'], out=slot)
+        self._present[index] = True
+        return slot
+
+    def close(self, finished=True, frames_read=0):
+        """Flush; a finished pass marks the entry complete if every sampled frame made it in"""
+        if self._frames is None:
+            return
+        count = min(len(self._frames), -(-frames_read // self.frame_skip))
+        complete = finished and bool(self._present[:count].all())
+        self._frames.flush()
+        self._present.flush()
+        self._frames = self._present = None
+        if finished and not complete:
+            # Part of the video was read while the entry was evicted; it can't be trusted
+            _remove(self.path)
+            return
+        self.meta.update(complete=complete, writer=None, frames_read=frames_read, sampled=count)
+        with contextlib.suppress(OSError):
+            _write_meta(self.path, self.meta)
+
+    def abandon(self):
+        self._frames = self._present = None
+        _remove(self.path)
@@ -0,0 +1,346 @@
+"""
+Gate access decisions from an in-memory allow-list.
+
+Every worker process keeps the registered plates in memory, keyed by a
+normalised form that folds the letters OCR confuses with digits. A decision
+is a dict lookup, plus a one-deletion neighbourhood lookup for fuzzy
+matches (one wrong, missing or extra character), so no database query sits
+in the request path.
+
+The allow-list follows changes three ways: post_save/post_delete update the
+local copy immediately; a background thread picks up rows whose
+``updated_at`` moved (other processes, bulk imports) every
+``GATE_ALLOWLIST_REFRESH`` seconds; and a full reload every
+``GATE_ALLOWLIST_FULL_REFRESH`` seconds catches deletions made elsewhere.
+
+Decisions are logged to GateDecision by a background writer in batches;
+if the log falls behind, entries are dropped and counted rather than
+slowing the gate down.
+"""
+import logging
+import queue
+import re
+import threading
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import RegisteredLicensePlate, GateDecision
+
+logger = logging.getLogger(__name__)
+
+# Rows committed slightly after a sync started can carry an older updated_at
+SYNC_OVERLAP = timedelta(seconds=5)
+
+# Same letter -> digit folding as AdvancedLicensePlateDetector.clean_text
+OCR_CONFUSIONS = str.maketrans({'O': '0', 'I': '1', 'S': '5', 'Z': '2', 'G': '6', 'B': '8', 'Q': '0'})
+NON_PLATE_CHARS = re.compile(r'[^\u0E01-\u0E5BA-Z0-9]')
+
+
+def normalize_plate(text):
+    """Upper-case, drop spaces/punctuation and fold OCR-confusable letters"""
+    return NON_PLATE_CHARS.sub('', (text or '').upper()).translate(OCR_CONFUSIONS)
+
+
+def _deletions(text):
+    return {text[:i] + text[i + 1:] for i in range(len(text))}
+
+
+def _edit_distance(a, b, limit):
+    """Levenshtein distance, giving up (returning limit + 1) once it exceeds ``limit``"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class _Index:
+    """
+    Lookup tables built from {plate id: entry}. Single changes are applied
+    in place, but a list or set a reader may hold is replaced, never mutated.
+    """
+
+    def __init__(self, plates):
+        self.exact = {}
+        self.deletes = {}
+        for entry in plates.values():
+            key = entry['normalized']
+            self.exact.setdefault(key, []).append(entry)
+            for deleted in _deletions(key):
+                self.deletes.setdefault(deleted, set()).add(key)
+
+    def add(self, entry):
+        key = entry['normalized']
+        entries = self.exact.get(key)
+        self.exact[key] = (entries or []) + [entry]
+        if entries is None:
+            for deleted in _deletions(key):
+                self.deletes[deleted] = self.deletes.get(deleted, set()) | {key}
+
+    def discard(self, entry):
+        key = entry['normalized']
+        entries = [e for e in self.exact.get(key, []) if e['id'] != entry['id']]
+        if entries:
+            self.exact[key] = entries
+            return
+        for deleted in _deletions(key):
+            keys = self.deletes.get(deleted, set()) - {key}
+            if keys:
+                self.deletes[deleted] = keys
+            else:
+                self.deletes.pop(deleted, None)
+        self.exact.pop(key, None)
+
+
+class AllowList:
+    """In-memory normalised allow-list of RegisteredLicensePlate"""
+
+    def __init__(self, max_distance=None):
+        self.max_distance = settings.GATE_FUZZY_MAX_DISTANCE if max_distance is None else max_distance
+        self._lock = threading.Lock()
+        self._plates = {}
+        self._index = _Index({})
+        self._synced_at = None
+        self.loaded_at = None
+
+    # ---------- maintenance ----------
+
+    @staticmethod
+    def _entry(plate_id, plate_number, owner_name):
+        return {
+            'id': plate_id,
+            'plate_number': plate_number,
+            'owner_name': owner_name,
+            'normalized': normalize_plate(plate_number),
+        }
+
+    def _rebuild(self):
+        self._index = _Index(self._plates)
+
+    def _apply(self, entry):
+        """Replace the entry's previous version with it; False if nothing changed"""
+        previous = self._plates.get(entry['id'])
+        if previous == entry:
+            return False
+        if previous is not None:
+            self._index.discard(previous)
+        self._plates[entry['id']] = entry
+        self._index.add(entry)
+        return True
+
+    def load(self):
+        """Full reload from the database"""
+        started = timezone.now()
+        rows = RegisteredLicensePlate.objects.values_list('id', 'plate_number', 'owner_name')
+        plates = {row[0]: self._entry(*row) for row in rows.iterator(chunk_size=5000)}
+        with self._lock:
+            self._plates = plates
+            self._synced_at = started
+            self.loaded_at = started
+            self._rebuild()
+
+    def refresh(self):
+        """Apply rows changed since the last sync; returns how many"""
+        if self._synced_at is None:
+            self.load()
+            return len(self._plates)
+        started = timezone.now()
+        rows = RegisteredLicensePlate.objects.filter(
+            updated_at__gte=self._synced_at - SYNC_OVERLAP
+        ).values_list('id', 'plate_number', 'owner_name')
+        with self._lock:
+            changed = sum(self._apply(self._entry(*row)) for row in rows)
+            self._synced_at = started
+        return changed
+
+    def upsert(self, plate):
+        with self._lock:
+            self._apply(self._entry(plate.id, plate.plate_number, plate.owner_name))
+
+    def remove(self, plate_id):
+        with self._lock:
+            entry = self._plates.pop(plate_id, None)
+            if entry is not None:
+                self._index.discard(entry)
+
+    def __len__(self):
+        return len(self._plates)
+
+    # ---------- lookups ----------
+
+    def _fuzzy_keys(self, key, index):
+        # .get throughout: an update may drop a key between two lookups
+        candidates = set(index.deletes.get(key, ()))  # one character missing from the read
+        for deleted in _deletions(key):
+            if deleted in index.exact:
+                candidates.add(deleted)  # one extra character in the read
+            candidates |= index.deletes.get(deleted, set())  # one character misread
+        return {
+            candidate for candidate in candidates
+            if _edit_distance(key, candidate, self.max_distance) <= self.max_distance
+        }
+
+    def match(self, plate_text):
+        """(match_type, entry or None) for a plate string"""
+        key = normalize_plate(plate_text)
+        index = self._index
+        if not key:
+            return 'none', None
+        entries = index.exact.get(key)
+        if entries:
+            return 'exact', min(entries, key=lambda e: e['id'])
+        if self.max_distance <= 0 or len(key) < 4:
+            return 'none', None
+
+        keys = self._fuzzy_keys(key, index)
+        if not keys:
+            return 'none', None
+        if len(keys) > 1:
+            return 'ambiguous', None
+        entries = index.exact.get(keys.pop())
+        if not entries:
+            return 'none', None
+        return 'fuzzy', min(entries, key=lambda e: e['id'])
+
+
+class DecisionLogWriter:
+    """Background thread writing GateDecision rows with bulk_create"""
+
+    def __init__(self, batch_size, flush_interval, max_queue_size):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = threading.Thread(target=self._run, name='gate-decision-log', daemon=True)
+        self._thread.start()
+
+    def log(self, **fields):
+        try:
+            self._queue.put_nowait(GateDecision(**fields))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                close_old_connections()
+                GateDecision.objects.bulk_create(batch)
+            except Exception:
+                self.dropped += len(batch)
+                logger.exception('Error writing %d gate decisions', len(batch))
+
+
+class GateService:
+    """Allow-list, its refresher thread and the decision log, one per process"""
+
+    def __init__(self):
+        self.allow_list = AllowList()
+        self.allow_list.load()
+        self.log_writer = DecisionLogWriter(
+            batch_size=settings.GATE_LOG_BATCH_SIZE,
+            flush_interval=settings.GATE_LOG_FLUSH_INTERVAL,
+            max_queue_size=settings.GATE_LOG_QUEUE_SIZE
+        )
+        self._refresher = threading.Thread(target=self._refresh_loop, name='gate-allowlist', daemon=True)
+        self._refresher.start()
+
+    def _refresh_loop(self):
+        last_full = time.monotonic()
+        while True:
+            time.sleep(settings.GATE_ALLOWLIST_REFRESH)
+            try:
+                close_old_connections()
+                if time.monotonic() - last_full >= settings.GATE_ALLOWLIST_FULL_REFRESH:
+                    self.allow_list.load()
+                    last_full = time.monotonic()
+                else:
+                    self.allow_list.refresh()
+            except Exception:
+                logger.exception('Error refreshing gate allow-list')
+
+    def decide(self, plate_text, gate='', log=True):
+        """Decision dict for ``plate_text``; logged asynchronously unless ``log`` is False"""
+        started = time.perf_counter()
+        match_type, entry = self.allow_list.match(plate_text)
+        allowed = entry is not None and (match_type == 'exact' or settings.GATE_FUZZY_ALLOW)
+        if allowed:
+            decision = 'open'
+        elif match_type in ('fuzzy', 'ambiguous'):
+            # Close to a registered plate but not certain: leave it to the guard
+            decision = 'review'
+        else:
+            decision = 'deny'
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        if log:
+            self.log_writer.log(
+                plate_text=(plate_text or '')[:50],
+                normalized_plate=normalize_plate(plate_text)[:50],
+                allowed=allowed,
+                match_type=match_type,
+                registered_plate_id=entry['id'] if entry else None,
+                gate=gate[:50],
+                latency_ms=latency_ms
+            )
+
+        return {
+            'allowed': allowed,
+            'decision': decision,
+            'match_type': match_type,
+            'plate_number': entry['plate_number'] if entry else None,
+            'owner_name': entry['owner_name'] if entry else None,
+            'registered_plate_id': entry['id'] if entry else None,
+        }
+
+
+_service_instance = None
+_lock = threading.Lock()
+
+
+def get_gate_service():
+    """Get or create the process-wide gate service (loads the allow-list on first use)"""
+    global _service_instance
+    if _service_instance is None:
+        with _lock:
+            if _service_instance is None:
+                _service_instance = GateService()
+    return _service_instance
+
+
+async def aget_gate_service():
+    """get_gate_service for async views; only the first call, which loads the allow-list, leaves the event loop"""
+    if _service_instance is not None:
+        return _service_instance
+    return await sync_to_async(get_gate_service)()
+
+
+def plate_saved(plate):
+    """Apply a registration change to this process's allow-list, if it is loaded"""
+    if _service_instance is not None:
+        _service_instance.allow_list.upsert(plate)
+
+
+def plate_deleted(plate_id):
+    if _service_instance is not None:
+        _service_instance.allow_list.remove(plate_id)
@@ -0,0 +1,227 @@
+"""
+CPU budget for concurrent detection jobs.
+
+OpenCV, PyTorch (EasyOCR) and TensorFlow (Keras) each size their thread
+pools to every core of the host. Two videos processed at once - usually in
+two gunicorn workers - then run several times more threads than cores and
+finish later than one after the other would.
+
+Every running job registers a small file in ``CPU_GOVERNOR_DIR`` (host-local,
+stale entries of dead processes are pruned). Thread pool sizes are a
+per-process setting, so each process gets ``cores * its jobs / all jobs``
+threads, applied to OpenCV and torch and re-checked every
+``CPU_GOVERNOR_INTERVAL`` seconds as jobs start and finish. A job whose
+frames are tiled splits its share instead: ``tile_workers()`` tiles at once,
+each with ``share // workers`` library threads, so tiling never multiplies
+the thread count. TensorFlow's
+pools can only be sized before its runtime starts, so they are fixed at
+``CPU_GOVERNOR_TF_THREADS`` when the vehicle model loads.
+"""
+import os
+import threading
+import time
+import uuid
+
+import cv2
+from django.conf import settings
+
+_state_lock = threading.Lock()
+_local_jobs = 0
+_local_tiled_jobs = 0
+_process_threads = None
+_library_threads = None
+_tile_workers = 1
+
+
+def host_cores():
+    if settings.CPU_GOVERNOR_CORES:
+        return settings.CPU_GOVERNOR_CORES
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def host_jobs():
+    """Number of registered jobs on this host, removing entries of processes that died"""
+    directory = settings.CPU_GOVERNOR_DIR
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return 0
+    count = 0
+    for name in names:
+        if not name.endswith('.job'):
+            continue
+        try:
+            pid = int(name.split('-', 1)[0])
+        except ValueError:
+            # Not one of ours
+            continue
+        if _pid_alive(pid):
+            count += 1
+        else:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+    return count
+
+
+def set_library_threads(threads):
+    """Size OpenCV's and torch's intra-op thread pools for this process"""
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+
+
+def configure_tensorflow():
+    """Fix TensorFlow's pools before the runtime starts (they cannot be resized later)"""
+    if not settings.CPU_GOVERNOR_ENABLED:
+        return
+    try:
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(settings.CPU_GOVERNOR_TF_THREADS)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    except (ImportError, RuntimeError):
+        # Not installed, or already initialised by an earlier import
+        pass
+
+
+def process_threads():
+    """Threads this process may use right now, or None outside any job"""
+    return _process_threads
+
+
+def split_threads(share):
+    """(tile workers, library threads per worker) whose product stays within ``share``"""
+    workers = max(1, min(settings.DETECTION_TILE_WORKERS or share, share))
+    return workers, max(1, share // workers)
+
+
+def tile_workers():
+    """Tiles a detection may run at once: its job's split, or one at a time outside tiled jobs"""
+    return _tile_workers
+
+
+class CPUBudget:
+    """
+    One job's share of the host's cores, as a context manager around the job.
+
+    Call ``rebalance()`` at natural checkpoints (e.g. every sampled frame); it
+    only looks at the registry once per ``CPU_GOVERNOR_INTERVAL``.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.cores = host_cores()
+        self.threads = self.cores
+        self.concurrent_jobs = 1
+        self.peak_concurrent_jobs = 1
+        self.min_threads = self.cores
+        self.tiled = None
+        self.tile_workers = 1
+        self.library_threads = self.cores
+        self._path = None
+        self._checked_at = 0.0
+
+    def __enter__(self):
+        global _local_jobs
+        if settings.CPU_GOVERNOR_ENABLED:
+            os.makedirs(settings.CPU_GOVERNOR_DIR, exist_ok=True)
+            self._path = os.path.join(settings.CPU_GOVERNOR_DIR, f'{os.getpid()}-{uuid.uuid4().hex}.job')
+            with open(self._path, 'w') as f:
+                f.write(self.name)
+            with _state_lock:
+                _local_jobs += 1
+            self.rebalance(force=True)
+        return self
+
+    def __exit__(self, *exc_info):
+        global _local_jobs, _local_tiled_jobs, _process_threads, _library_threads, _tile_workers
+        if self._path is None:
+            return False
+        try:
+            os.remove(self._path)
+        except FileNotFoundError:
+            pass
+        self._path = None
+        with _state_lock:
+            _local_jobs -= 1
+            if self.tiled:
+                _local_tiled_jobs -= 1
+            if _local_jobs == 0:
+                # Back to library defaults for whatever this process does next
+                _process_threads = _library_threads = None
+                _tile_workers = 1
+                set_library_threads(self.cores)
+        return False
+
+    def use_tiles(self, tiled):
+        """
+        Record once per job whether its frames are tiled; later calls are ignored.
+
+        Library pools are process-wide, so while any job here tiles, the whole
+        process runs the split from ``split_threads``.
+        """
+        global _local_tiled_jobs
+        if self.tiled is not None:
+            return
+        self.tiled = bool(tiled)
+        if self._path is None or not self.tiled:
+            return
+        with _state_lock:
+            _local_tiled_jobs += 1
+        self.rebalance(force=True)
+
+    def rebalance(self, force=False):
+        """Re-read the registry and resize the thread pools if this process's share changed"""
+        global _process_threads, _library_threads, _tile_workers
+        if self._path is None:
+            return self.threads
+        now = time.monotonic()
+        if not force and now - self._checked_at < settings.CPU_GOVERNOR_INTERVAL:
+            return self.threads
+        self._checked_at = now
+
+        total = max(1, host_jobs())
+        with _state_lock:
+            local = max(1, _local_jobs)
+            threads = max(1, self.cores * local // max(total, local))
+            workers, library = split_threads(threads) if _local_tiled_jobs else (1, threads)
+            if library != _library_threads:
+                set_library_threads(library)
+            _process_threads, _library_threads, _tile_workers = threads, library, workers
+
+        self.threads = threads
+        self.concurrent_jobs = total
+        self.peak_concurrent_jobs = max(self.peak_concurrent_jobs, total)
+        self.min_threads = min(self.min_threads, threads)
+        self.tile_workers, self.library_threads = workers, library
+        return threads
+
+    def stats(self):
+        """Allocation summary for job stats"""
+        return {
+            'cpu_cores': self.cores,
+            'cpu_threads': self.threads,
+            'cpu_threads_min': self.min_threads,
+            'tile_workers': self.tile_workers,
+            'library_threads': self.library_threads,
+            'concurrent_jobs': self.concurrent_jobs,
+            'peak_concurrent_jobs': self.peak_concurrent_jobs,
+            'governor': bool(settings.CPU_GOVERNOR_ENABLED),
+        }
@@ -0,0 +1,160 @@
+"""
+HTTP serving for stored plate images.
+
+Adds what FileResponse alone doesn't give us: a real content type,
+ETag/Last-Modified validators with 304 responses, single byte-range
+requests, long-lived caching for images that never change, and an optional
+X-Accel-Redirect / X-Sendfile hand-off so the front server sends the bytes
+after Django has done the permission check.
+
+``aserve_image`` is the same for async views: the stat calls and file reads
+run in worker threads and, under ASGI, the body is an async iterator, so a
+slow client only holds a suspended coroutine rather than a thread.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'private, no-cache'
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOCK_SIZE = 64 * 1024
+
+
+def _parse_range(header, size):
+    """Return (start, end) inclusive for a single satisfiable range, None to ignore, or False if unsatisfiable"""
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def _iter_range(file, start, length):
+    try:
+        file.seek(start)
+        remaining = length
+        while remaining > 0:
+            data = file.read(min(BLOCK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+    finally:
+        file.close()
+
+
+async def _aiter_range(storage, name, start, length):
+    """Async counterpart of _iter_range; file I/O runs off the event loop"""
+    file = await sync_to_async(storage.open, thread_sensitive=False)(name, 'rb')
+    read = sync_to_async(file.read, thread_sensitive=False)
+    try:
+        await sync_to_async(file.seek, thread_sensitive=False)(start)
+        remaining = length
+        while remaining > 0:
+            data = await read(min(BLOCK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+    finally:
+        await sync_to_async(file.close, thread_sensitive=False)()
+
+
+def _stat(field_file):
+    """(size, modified timestamp) of a stored file"""
+    storage = field_file.storage
+    return storage.size(field_file.name), storage.get_modified_time(field_file.name).timestamp()
+
+
+def _sendfile_response(field_file):
+    backend = settings.IMAGE_SENDFILE_BACKEND
+    response = HttpResponse()
+    if backend == 'nginx':
+        response['X-Accel-Redirect'] = quote(settings.IMAGE_SENDFILE_URL_PREFIX + field_file.name)
+    else:
+        response['X-Sendfile'] = field_file.path
+    # Let the front server fill in the real content type and length
+    del response['Content-Type']
+    return response
+
+
+def _image_response(request, field_file, size, modified, immutable, as_attachment, filename, asynchronous):
+    storage = field_file.storage
+    etag = quote_etag(f'{size:x}-{int(modified * 1000):x}')
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(modified))
+    if not_modified is not None:
+        response = not_modified
+    elif settings.IMAGE_SENDFILE_BACKEND:
+        response = _sendfile_response(field_file)
+    else:
+        content_type = mimetypes.guess_type(field_file.name)[0] or 'application/octet-stream'
+        byte_range = None
+        if 'HTTP_RANGE' in request.META:
+            if_range = request.META.get('HTTP_IF_RANGE')
+            if not if_range or if_range == etag:
+                byte_range = _parse_range(request.META['HTTP_RANGE'], size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+        elif byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            if asynchronous:
+                content = _aiter_range(storage, field_file.name, start, length)
+            else:
+                content = _iter_range(storage.open(field_file.name, 'rb'), start, length)
+            response = StreamingHttpResponse(content, status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(length)
+        elif asynchronous:
+            response = StreamingHttpResponse(_aiter_range(storage, field_file.name, 0, size), content_type=content_type)
+            response['Content-Length'] = str(size)
+        else:
+            response = FileResponse(storage.open(field_file.name, 'rb'), content_type=content_type)
+            response['Content-Length'] = str(size)
+
+    if as_attachment and response.status_code in (200, 206):
+        response['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(filename or os.path.basename(field_file.name))}"
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(modified)
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+    return response
+
+
+def serve_image(request, field_file, immutable=False, as_attachment=False, filename=None):
+    """Serve a stored image with validators, caching, ranges and optional sendfile"""
+    size, modified = _stat(field_file)
+    return _image_response(request, field_file, size, modified, immutable, as_attachment, filename, asynchronous=False)
+
+
+async def aserve_image(request, field_file, immutable=False, as_attachment=False, filename=None):
+    """serve_image for async views"""
+    size, modified = await sync_to_async(_stat, thread_sensitive=False)(field_file)
+    # Under WSGI an async body would be buffered whole, so keep FileResponse there
+    asynchronous = isinstance(request, ASGIRequest)
+    return _image_response(request, field_file, size, modified, immutable, as_attachment, filename, asynchronous)
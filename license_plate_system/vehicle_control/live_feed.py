@@ -0,0 +1,260 @@
+"""
+Server-Sent Events fan-out of new detections.
+
+When a KnownLicensePlate/UnknownLicensePlate row commits, a small JSON event
+is published. On PostgreSQL it goes out with ``pg_notify`` so every web
+process (including ones that did not run the pipeline, e.g. when
+``ingest_stream`` runs separately) receives it on one LISTEN connection;
+otherwise it is delivered in-process.
+
+Each connected dashboard is a Subscriber with a bounded buffer. A client
+that falls behind loses its oldest events and is told to resync instead of
+growing memory or slowing the publisher. Under ASGI a waiting client is
+just a suspended coroutine, so hundreds of open dashboards cost almost
+nothing; under WSGI each one holds a worker thread.
+"""
+import asyncio
+import collections
+import json
+import logging
+import select
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+
+from .thumbnails import thumbnail_url
+
+NOTIFY_CHANNEL = 'vehicle_control_detections'
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    """One SSE client: bounded event buffer plus a wake-up for its loop or thread"""
+
+    def __init__(self, buffer_size, loop=None):
+        self.events = collections.deque(maxlen=buffer_size)
+        self.dropped = 0
+        self.loop = loop
+        if loop is not None:
+            self._async_wakeup = asyncio.Event()
+        else:
+            self._sync_wakeup = threading.Event()
+
+    def push(self, event):
+        """Called from any thread; never blocks"""
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+        self.events.append(event)
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._async_wakeup.set)
+        else:
+            self._sync_wakeup.set()
+
+    def drain(self):
+        events = []
+        while self.events:
+            events.append(self.events.popleft())
+        return events
+
+    async def wait_async(self, timeout):
+        if not self.events:
+            try:
+                await asyncio.wait_for(self._async_wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._async_wakeup.clear()
+        return self.drain()
+
+    def wait(self, timeout):
+        if not self.events:
+            self._sync_wakeup.wait(timeout)
+        self._sync_wakeup.clear()
+        return self.drain()
+
+
+class Broker:
+    """In-process fan-out to the current subscribers"""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def is_full(self):
+        return len(self._subscribers) >= settings.LIVE_FEED_MAX_CLIENTS
+
+    def subscribe(self, subscriber):
+        with self._lock:
+            if self.is_full():
+                return False
+            self._subscribers.add(subscriber)
+        return True
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.push(event)
+            except RuntimeError:
+                # The client's event loop has already closed
+                self.unsubscribe(subscriber)
+
+
+broker = Broker()
+
+
+def use_notify():
+    backend = settings.LIVE_FEED_BACKEND
+    if backend is None:
+        return connections['default'].vendor == 'postgresql'
+    return backend == 'postgres'
+
+
+# ---------- publishing ----------
+
+def detection_event(kind, detection):
+    """JSON-ready payload for a newly committed detection"""
+    event = {
+        'type': kind,
+        'id': detection.id,
+        'plate_number': detection.detected_plate_number,
+        'confidence': detection.confidence_score,
+        'detected_at': detection.detected_at,
+        'video_id': detection.video_detection_id,
+        'thumbnail_url': thumbnail_url(detection.detection_image),
+    }
+    if kind == 'known':
+        event['owner_name'] = detection.registered_plate.owner_name
+    else:
+        event['vehicle_type'] = detection.vehicle_type
+    return event
+
+
+def publish_detection(kind, detection):
+    """Fan a committed detection out to every connected dashboard; failures are logged, never raised"""
+    # Runs from on_commit inside the pipeline: a lost event must not fail the job
+    try:
+        payload = json.dumps(detection_event(kind, detection), cls=DjangoJSONEncoder)
+        if use_notify():
+            with connections['default'].cursor() as cursor:
+                cursor.execute('SELECT pg_notify(%s, %s)', [NOTIFY_CHANNEL, payload])
+        else:
+            broker.publish(json.loads(payload))
+    except Exception:
+        logger.exception('Publishing %s detection %s to the live feed failed', kind, detection.pk)
+
+
+# ---------- PostgreSQL LISTEN ----------
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def _listen_forever():
+    while True:
+        connection = connections.create_connection('default')
+        try:
+            connection.ensure_connection()
+            connection.set_autocommit(True)
+            with connection.cursor() as cursor:
+                cursor.execute(f'LISTEN {NOTIFY_CHANNEL}')
+            raw = connection.connection
+            while True:
+                if hasattr(raw, 'poll'):
+                    # psycopg2
+                    if select.select([raw], [], [], 5.0)[0]:
+                        raw.poll()
+                        while raw.notifies:
+                            broker.publish(json.loads(raw.notifies.pop(0).payload))
+                else:
+                    # psycopg 3
+                    for notify in raw.notifies(timeout=5.0):
+                        broker.publish(json.loads(notify.payload))
+        except Exception:
+            logger.exception('Live feed listener error, reconnecting')
+        finally:
+            connection.close()
+        threading.Event().wait(2.0)
+
+
+def ensure_listener():
+    """Start this process's LISTEN thread once, when the first client connects"""
+    global _listener
+    if not use_notify() or _listener is not None:
+        return
+    with _listener_lock:
+        if _listener is None:
+            _listener = threading.Thread(target=_listen_forever, name='live-feed-listener', daemon=True)
+            _listener.start()
+
+
+# ---------- SSE encoding ----------
+
+def format_event(event):
+    return f"event: detection\nid: {event['type']}-{event['id']}\ndata: {json.dumps(event)}\n\n"
+
+
+def format_resync(dropped):
+    return f'event: resync\ndata: {json.dumps({"dropped": dropped})}\n\n'
+
+
+def format_full():
+    """Sent instead of the stream when another client took the last slot meanwhile"""
+    return 'retry: 30000\nevent: full\ndata: {}\n\n'
+
+
+def _take_dropped(subscriber):
+    dropped, subscriber.dropped = subscriber.dropped, 0
+    return dropped
+
+
+async def stream_async(subscriber):
+    """SSE body for ASGI: suspended coroutine between events"""
+    heartbeat = settings.LIVE_FEED_HEARTBEAT
+    if not broker.subscribe(subscriber):
+        yield format_full()
+        return
+    try:
+        yield f'retry: {settings.LIVE_FEED_RETRY_MS}\n\n'
+        while True:
+            events = await subscriber.wait_async(heartbeat)
+            dropped = _take_dropped(subscriber)
+            if dropped:
+                yield format_resync(dropped)
+            if not events:
+                yield ': ping\n\n'
+            for event in events:
+                yield format_event(event)
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+def stream_sync(subscriber):
+    """SSE body for WSGI: holds the worker thread while the client is connected"""
+    heartbeat = settings.LIVE_FEED_HEARTBEAT
+    if not broker.subscribe(subscriber):
+        yield format_full()
+        return
+    try:
+        yield f'retry: {settings.LIVE_FEED_RETRY_MS}\n\n'
+        while True:
+            events = subscriber.wait(heartbeat)
+            dropped = _take_dropped(subscriber)
+            if dropped:
+                yield format_resync(dropped)
+            if not events:
+                yield ': ping\n\n'
+            for event in events:
+                yield format_event(event)
+    finally:
+        broker.unsubscribe(subscriber)
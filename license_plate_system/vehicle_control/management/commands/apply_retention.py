@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from vehicle_control.retention import RETENTION_MODELS, apply_retention, get_policy
+
+
+class Command(BaseCommand):
+    help = 'Delete (and optionally archive) detections older than the retention policy, with their images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=sorted(RETENTION_MODELS), action='append',
+                            help='Only this table (repeatable); default all')
+        parser.add_argument('--days', type=int, help='Override the policy age limit')
+        archive = parser.add_mutually_exclusive_group()
+        archive.add_argument('--archive', dest='archive', action='store_true', default=None,
+                             help='Write expired rows to a compressed NDJSON archive first')
+        archive.add_argument('--no-archive', dest='archive', action='store_false')
+        parser.add_argument('--batch-size', type=int, help='Rows per transaction')
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only count expired rows')
+
+    def handle(self, *args, **options):
+        for kind in options['kind'] or sorted(RETENTION_MODELS):
+            days = options['days'] if options['days'] is not None else get_policy(kind)['days']
+            if days is None:
+                self.stdout.write(f'{kind}: no retention policy, skipped')
+                continue
+
+            result = apply_retention(
+                kind,
+                days=days,
+                archive=options['archive'],
+                batch_size=options['batch_size'],
+                pause=options['pause'],
+                dry_run=options['dry_run'],
+                report=self.stdout.write if options['verbosity'] > 1 else None
+            )
+            if options['dry_run']:
+                self.stdout.write(f"{kind}: {result['deleted']} rows older than {days} days")
+                continue
+            line = f"{kind}: deleted {result['deleted']} rows and {result['images']} images"
+            if result['archive']:
+                line += f" (archived to {result['archive']})"
+            self.stdout.write(self.style.SUCCESS(line))
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import time
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+
+class Command(BaseCommand):
+    help = ('Hold many slow connections open against a running server (live feed by default) '
+            'and measure how fast other requests are still answered')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the running server')
+        parser.add_argument('--connections', type=int, default=200, help='Long-lived connections to hold open')
+        parser.add_argument('--hold-path', help='Path each held connection requests (default: the live feed)')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds to hold the connections')
+        parser.add_argument('--probe-interval', type=float, default=0.1)
+        parser.add_argument('--timeout', type=float, default=5.0, help='Per-request timeout in seconds')
+        parser.add_argument('--user', help='Username to authenticate as (default: first superuser)')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(username=options['user']) if options['user'] else User.objects.filter(is_superuser=True)
+        user = users.first()
+        if user is None:
+            raise CommandError('No user to authenticate the held connections with')
+
+        # A real session, so requests pass the same auth middleware as a browser's
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        cookie = f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+        url = urlsplit(options['url'])
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.cookie = cookie
+        self.timeout = options['timeout']
+        hold_path = options['hold_path'] or reverse('vehicle_control:live_feed')
+        probe_path = reverse('authentication:check_username')
+
+        try:
+            result = asyncio.run(self.run(hold_path, probe_path, options))
+        finally:
+            session.delete()
+
+        held, failed, latencies, probe_failures = result
+        self.stdout.write(f"Held connections: {held}/{options['connections']} ({failed} refused or timed out)")
+        if latencies:
+            latencies.sort()
+
+            def percentile(p):
+                return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+            self.stdout.write(
+                f"Probe requests: {len(latencies)} ok, {probe_failures} failed: "
+                f"p50={percentile(0.50):.1f}ms p95={percentile(0.95):.1f}ms "
+                f"p99={percentile(0.99):.1f}ms max={latencies[-1] * 1000:.1f}ms"
+            )
+        else:
+            self.stdout.write(f"Probe requests: none answered ({probe_failures} failed)")
+
+    def request_bytes(self, method, path, body=b''):
+        headers = [
+            f'{method} {path} HTTP/1.1',
+            f'Host: {self.host}:{self.port}',
+            f'Cookie: {self.cookie}',
+            'Connection: close',
+        ]
+        if body:
+            headers += ['Content-Type: application/json', f'Content-Length: {len(body)}']
+        return ('\r\n'.join(headers) + '\r\n\r\n').encode() + body
+
+    async def hold(self, path, stop):
+        """True once the server answered 200 and started streaming; keeps reading until ``stop``"""
+        writer = None
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+            writer.write(self.request_bytes('GET', path))
+            await writer.drain()
+            status_line = await asyncio.wait_for(reader.readline(), self.timeout)
+            if b' 200 ' not in status_line:
+                return False
+            while not stop.is_set():
+                try:
+                    if not await asyncio.wait_for(reader.read(65536), 0.5):
+                        break
+                except asyncio.TimeoutError:
+                    continue
+            return True
+        except (OSError, asyncio.TimeoutError):
+            return False
+        finally:
+            if writer is not None:
+                writer.close()
+
+    async def probe(self, path):
+        """Latency of one small request on a fresh connection, or None on failure"""
+        body = json.dumps({'username': 'benchmark-probe'}).encode()
+        started = time.perf_counter()
+        writer = None
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+            writer.write(self.request_bytes('POST', path, body))
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), self.timeout)
+            if b' 200 ' not in response.split(b'\r\n', 1)[0]:
+                return None
+            return time.perf_counter() - started
+        except (OSError, asyncio.TimeoutError):
+            return None
+        finally:
+            if writer is not None:
+                writer.close()
+
+    async def run(self, hold_path, probe_path, options):
+        stop = asyncio.Event()
+        holders = [asyncio.create_task(self.hold(hold_path, stop)) for _ in range(options['connections'])]
+
+        latencies = []
+        probe_failures = 0
+        deadline = time.monotonic() + options['duration']
+        while time.monotonic() < deadline:
+            latency = await self.probe(probe_path)
+            if latency is None:
+                probe_failures += 1
+            else:
+                latencies.append(latency)
+            await asyncio.sleep(options['probe_interval'])
+
+        stop.set()
+        results = await asyncio.gather(*holders)
+        held = sum(results)
+        return held, len(results) - held, latencies, probe_failures
@@ -0,0 +1,94 @@
+import json
+import random
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from vehicle_control.gate import get_gate_service
+from vehicle_control.models import RegisteredLicensePlate
+
+
+class Command(BaseCommand):
+    help = 'Measure gate decision latency (p50/p95/p99) under concurrent load'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=5000, help='Total decisions')
+        parser.add_argument('--http', action='store_true',
+                            help='Go through the full Django stack (middleware, auth, view) '
+                                 'instead of calling the decision service directly')
+        parser.add_argument('--user', help='Username for --http requests (default: first superuser)')
+        parser.add_argument('--token', help='Authenticate --http requests with this device token instead of a login')
+
+    def handle(self, *args, **options):
+        plates = list(RegisteredLicensePlate.objects.values_list('plate_number', flat=True)[:1000])
+        if not plates:
+            raise CommandError('Register some plates first')
+        # Mix exact hits, OCR-style misreads and unknown plates
+        samples = []
+        for plate in plates:
+            samples.append(plate)
+            samples.append(plate[:-1] + ('7' if plate[-1] != '7' else '1'))
+            samples.append(f'ZZ{random.randint(1000, 9999)}')
+
+        service = get_gate_service()
+        self.stdout.write(f'Allow-list: {len(service.allow_list)} plates')
+
+        user = None
+        if options['http'] and not options['token']:
+            users = User.objects.filter(username=options['user']) if options['user'] else User.objects.filter(is_superuser=True)
+            user = users.first()
+            if user is None:
+                raise CommandError('No user to authenticate --http requests with')
+
+        per_thread = max(1, options['requests'] // options['threads'])
+        latencies = []
+        lock = threading.Lock()
+
+        def worker():
+            client = None
+            headers = {}
+            if user is not None:
+                client = Client()
+                client.force_login(user)
+            elif options['http']:
+                client = Client()
+                headers['Authorization'] = f"Bearer {options['token']}"
+            url = reverse('vehicle_control:gate_decision')
+            local = []
+            for _ in range(per_thread):
+                plate = random.choice(samples)
+                started = time.perf_counter()
+                if client is None:
+                    service.decide(plate, 'benchmark', log=False)
+                else:
+                    client.post(url, json.dumps({'plate': plate, 'gate': 'benchmark'}),
+                                content_type='application/json', headers=headers)
+                local.append(time.perf_counter() - started)
+            with lock:
+                latencies.extend(local)
+
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            started = time.perf_counter()
+            threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+        latencies.sort()
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+        self.stdout.write(
+            f"{len(latencies)} decisions, {options['threads']} threads, {len(latencies) / elapsed:.0f}/s: "
+            f"p50={percentile(0.50):.2f}ms p95={percentile(0.95):.2f}ms "
+            f"p99={percentile(0.99):.2f}ms max={latencies[-1] * 1000:.2f}ms"
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from vehicle_control.uploads import expire_uploads
+
+
+class Command(BaseCommand):
+    help = 'Delete chunked uploads that were abandoned, with their partial files'
+
+    def handle(self, *args, **options):
+        rows, files = expire_uploads()
+        self.stdout.write(self.style.SUCCESS(f'Expired {rows} upload(s), removed {files} partial file(s)'))
@@ -0,0 +1,40 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vehicle_control.export import EXPORTS, FORMATS, ExportError, iter_export
+
+
+class Command(BaseCommand):
+    help = 'Stream registered plates or detections to CSV/NDJSON with constant memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--format', default='csv', choices=sorted(FORMATS))
+        parser.add_argument('--start', help='From this date/datetime (inclusive)')
+        parser.add_argument('--end', help='Up to this date (whole day) or datetime')
+        parser.add_argument('--video', type=int, help='Only detections from this video id')
+        parser.add_argument('--plate', help='Only plates matching this text')
+        parser.add_argument('--output', '-o', help='Write to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        try:
+            content = iter_export(
+                options['kind'],
+                options['format'],
+                start=options['start'],
+                end=options['end'],
+                video_id=options['video'],
+                plate=options['plate']
+            )
+        except ExportError as e:
+            raise CommandError(str(e))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as f:
+                for piece in content:
+                    f.write(piece)
+            self.stderr.write(self.style.SUCCESS(f"Exported {options['kind']} to {options['output']}"))
+        else:
+            for piece in content:
+                sys.stdout.write(piece)
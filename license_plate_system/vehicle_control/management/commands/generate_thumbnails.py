@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from vehicle_control.models import RegisteredLicensePlate, KnownLicensePlate, UnknownLicensePlate
+from vehicle_control.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Backfill thumbnails for registered plate and detection images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate thumbnails that already exist')
+
+    def handle(self, *args, **options):
+        sources = [
+            (RegisteredLicensePlate, 'plate_image'),
+            (KnownLicensePlate, 'detection_image'),
+            (UnknownLicensePlate, 'detection_image'),
+        ]
+
+        for model, field in sources:
+            created = failed = 0
+            names = (
+                model.objects.exclude(**{field: ''})
+                .values_list(field, flat=True)
+                .iterator(chunk_size=500)
+            )
+            for name in names:
+                try:
+                    generate_thumbnails(name, force=options['force'])
+                    created += 1
+                except (OSError, ValueError) as e:
+                    failed += 1
+                    self.stderr.write(f'  {name}: {e}')
+
+            self.stdout.write(f'{model._meta.verbose_name_plural}: {created} processed, {failed} failed')
+
+        self.stdout.write(self.style.SUCCESS('Thumbnail backfill complete'))
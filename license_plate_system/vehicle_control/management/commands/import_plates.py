@@ -0,0 +1,40 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from vehicle_control.bulk_import import BATCH_SIZE, BulkImportError, import_plates
+
+
+class Command(BaseCommand):
+    help = 'Bulk register license plates from a CSV file and a zip of plate images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='CSV with plate_number, owner_name, image and optional '
+                                             'username, vehicle_type, owner_contact, vehicle_brand, '
+                                             'vehicle_model, vehicle_color, notes columns')
+        parser.add_argument('--images', help='Zip archive holding the files named in the image column')
+        parser.add_argument('--user', help='Owner for rows without a username column value')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        default_user = None
+        if options['user']:
+            default_user = User.objects.filter(username=options['user']).first()
+            if default_user is None:
+                raise CommandError(f"Unknown user {options['user']}")
+
+        images = open(options['images'], 'rb') if options['images'] else None
+        try:
+            with open(options['csv_file'], 'rb') as csv_file:
+                report = import_plates(csv_file, images, default_user, batch_size=options['batch_size'])
+        except BulkImportError as e:
+            raise CommandError(str(e))
+        finally:
+            if images:
+                images.close()
+
+        for error in report['errors']:
+            self.stderr.write(f"  row {error['row']} {error['plate_number']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']} plates, {report['skipped']} duplicates skipped, "
+            f"{len(report['errors']) - report['skipped']} rows rejected"
+        ))
@@ -0,0 +1,66 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from vehicle_control import model_store
+
+EASYOCR_HOME = os.path.join('~', '.EasyOCR', 'model')
+
+
+class Command(BaseCommand):
+    help = 'Populate the local model store from files on disk, or verify it against its manifest'
+
+    def add_arguments(self, parser):
+        subcommands = parser.add_subparsers(dest='action', required=True)
+        populate = subcommands.add_parser('populate', help='Copy model files into MODEL_STORE_DIR and record checksums')
+        populate.add_argument('--source', action='append', default=[],
+                              help='Directory holding model files (repeatable; default: ~/.EasyOCR/model, '
+                                   'the project dir and the repository root)')
+        populate.add_argument('--download', action='store_true',
+                              help='Fetch the EasyOCR weights into ~/.EasyOCR/model first (needs internet; for development '
+                                   'machines, deploys populate from a vendored directory)')
+        subcommands.add_parser('verify', help='Check every model file against the manifest')
+
+    def handle(self, *args, **options):
+        if options['action'] == 'populate':
+            if options['download']:
+                self.download()
+            # keras_Model.h5 and labels.txt sit in the repository root, one level above the project
+            self.populate(options['source'] or [EASYOCR_HOME, settings.BASE_DIR, settings.BASE_DIR.parent])
+        self.verify()
+
+    def download(self):
+        self.stdout.write(f'Downloading EasyOCR weights into {EASYOCR_HOME}')
+        try:
+            model_store.download_easyocr(EASYOCR_HOME)
+        except model_store.ModelStoreError as e:
+            raise CommandError(str(e))
+
+    def populate(self, sources):
+        try:
+            missing = model_store.populate(sources, report=self.stdout.write)
+        except model_store.ModelStoreError as e:
+            raise CommandError(str(e))
+        for name in missing:
+            filename = os.path.basename(model_store.MODEL_FILES[name]['path'])
+            self.stdout.write(self.style.WARNING(f'{name}: {filename} not found in {", ".join(map(str, sources))}'))
+
+    def verify(self):
+        try:
+            manifest = model_store.load_manifest()
+        except model_store.ModelStoreError as e:
+            raise CommandError(str(e))
+        failed = False
+        for name, spec in model_store.MODEL_FILES.items():
+            if not spec['required'] and not model_store.model_path(name).is_file():
+                self.stdout.write(f'{name}: not installed (optional)')
+                continue
+            problem = model_store.check(name, manifest)
+            if problem:
+                failed = True
+                self.stdout.write(self.style.ERROR(f'{name}: {problem}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{name}: OK'))
+        if failed:
+            raise CommandError(f'Model store {model_store.store_dir()} failed verification')
@@ -0,0 +1,49 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from vehicle_control import scheduling
+
+
+class Command(BaseCommand):
+    help = ('Process queued videos by priority and remaining work; run one per concurrent job '
+            '(SCHEDULER_MAX_CONCURRENT_JOBS caps how many run per host)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty instead of waiting for new jobs')
+        parser.add_argument('--poll', type=float, default=None,
+                            help='Seconds to wait when there is nothing to run (default: SCHEDULER_POLL_INTERVAL)')
+
+    def handle(self, *args, **options):
+        poll = options['poll'] if options['poll'] is not None else settings.SCHEDULER_POLL_INTERVAL
+        stop = threading.Event()
+        # The running job stops at its next sampled frame and goes back to the queue
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+        def report(line):
+            self.stdout.write(f'[{timezone.now():%H:%M:%S}] {line}')
+
+        report(f'Worker {scheduling.worker_id()} waiting for queued videos')
+        while not stop.is_set():
+            # Every pass, so jobs of a worker that died anywhere go back once their lease runs out
+            requeued = scheduling.requeue_stale()
+            if requeued:
+                report(f'Requeued {requeued} job(s) left by stopped workers')
+
+            job = scheduling.claim_next()
+            if job is None:
+                if options['once'] and not scheduling.next_candidate():
+                    break
+                stop.wait(poll)
+                continue
+
+            report(f'Video #{job.id} (priority {job.priority}) from frame {job.resume_frame}')
+            result = scheduling.run_job(job, stop=stop, report=report)
+            report(f'Video #{job.id}: {result}')
+
+        self.stdout.write(self.style.SUCCESS('Worker stopped'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from vehicle_control.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Rebuild dashboard counters and daily rollups from the source tables'
+
+    def handle(self, *args, **options):
+        changes = reconcile()
+        for name, (old, new) in changes.items():
+            drift = new - old
+            note = f' (drift {drift:+d})' if drift else ''
+            self.stdout.write(f'{name}: {new}{note}')
+        self.stdout.write(self.style.SUCCESS('Counters reconciled'))
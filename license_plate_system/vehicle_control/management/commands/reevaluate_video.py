@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from vehicle_control.models import VideoDetection
+from vehicle_control.processing import reevaluate_video_detection
+
+
+class Command(BaseCommand):
+    help = ('Rebuild a processed video\'s detections from its stored raw OCR results (OCR_RESULT_STORE), '
+            'applying the current cleaning, validation and thresholds without running OCR again')
+
+    def add_arguments(self, parser):
+        parser.add_argument('video_id', type=int)
+        parser.add_argument('--confidence-threshold', type=float, default=None,
+                            help='OCR confidence a reading needs (default: the camera profile\'s or the detector\'s)')
+        parser.add_argument('--min-confidence', type=float, default=None,
+                            help='Confidence a detection needs to be recorded (default: the camera profile\'s)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='List the detections without replacing the stored ones')
+
+    def handle(self, *args, **options):
+        try:
+            video = VideoDetection.objects.get(pk=options['video_id'])
+        except VideoDetection.DoesNotExist:
+            raise CommandError(f'Video #{options["video_id"]} does not exist')
+
+        try:
+            result = reevaluate_video_detection(
+                video,
+                confidence_threshold=options['confidence_threshold'],
+                min_confidence=options['min_confidence'],
+                dry_run=options['dry_run'],
+            )
+        except (FileNotFoundError, ValueError) as e:
+            raise CommandError(f'Video #{video.id}: {e}')
+
+        for frame, text, confidence in result['frames']:
+            self.stdout.write(f'frame {frame}: {text} ({confidence:.2f})')
+        if options['dry_run']:
+            self.stdout.write(f'{len(result["frames"])} detection(s); nothing changed (dry run)')
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Video #{video.id}: replaced {result["replaced"]} detection(s) with {len(result["frames"])}'
+            ))
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:52
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+COUNTED_MODELS = {
+    'registered_plates': ('RegisteredLicensePlate', 'registered_date'),
+    'videos': ('VideoDetection', 'upload_timestamp'),
+    'known_detections': ('KnownLicensePlate', 'detected_at'),
+    'unknown_detections': ('UnknownLicensePlate', 'detected_at'),
+}
+
+
+def seed_counters(apps, schema_editor):
+    StatisticCounter = apps.get_model('vehicle_control', 'StatisticCounter')
+    DailyStatistic = apps.get_model('vehicle_control', 'DailyStatistic')
+
+    for name, (model_name, field) in COUNTED_MODELS.items():
+        model = apps.get_model('vehicle_control', model_name)
+        StatisticCounter.objects.create(name=name, value=model.objects.count())
+        rollup = (
+            model.objects.annotate(day=TruncDate(field))
+            .values('day')
+            .annotate(value=Count('pk'))
+            .order_by()
+        )
+        DailyStatistic.objects.bulk_create(
+            [DailyStatistic(name=name, day=row['day'], value=row['value']) for row in rollup]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicle_control', '0003_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatisticCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Statistic Counter',
+                'verbose_name_plural': 'Statistic Counters',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyStatistic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('day', models.DateField()),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Daily Statistic',
+                'verbose_name_plural': 'Daily Statistics',
+                'ordering': ['-day', 'name'],
+                'constraints': [models.UniqueConstraint(fields=('name', 'day'), name='unique_daily_statistic')],
+            },
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
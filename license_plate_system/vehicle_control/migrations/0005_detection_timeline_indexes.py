@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicle_control', '0004_statistic_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='knownlicenseplate',
+            index=models.Index(fields=['-detected_at', '-id'], name='known_detected_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='unknownlicenseplate',
+            index=models.Index(fields=['-detected_at', '-id'], name='unknown_detected_at_id_idx'),
+        ),
+    ]
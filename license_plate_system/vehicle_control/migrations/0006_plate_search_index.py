@@ -0,0 +1,186 @@
+from django.db import migrations
+
+# The index as it stood at this migration, spelled out so that later changes
+# to vehicle_control.search don't rewrite history.
+#
+# PostgreSQL: trigram GIN indexes on the UPPER() expression Django's
+# icontains lookup generates. SQLite: one FTS5 trigram table per model
+# (rowid = object id), kept in step with the base tables by triggers.
+POSTGRES_INSTALL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    (
+        'CREATE INDEX IF NOT EXISTS registered_plate_number_trgm ON vehicle_control_registeredlicenseplate'
+        ' USING gin (UPPER("plate_number") gin_trgm_ops)'
+    ),
+    (
+        'CREATE INDEX IF NOT EXISTS registered_owner_name_trgm ON vehicle_control_registeredlicenseplate'
+        ' USING gin (UPPER("owner_name") gin_trgm_ops)'
+    ),
+    (
+        'CREATE INDEX IF NOT EXISTS known_detected_plate_trgm ON vehicle_control_knownlicenseplate'
+        ' USING gin (UPPER("detected_plate_number") gin_trgm_ops)'
+    ),
+    (
+        'CREATE INDEX IF NOT EXISTS unknown_detected_plate_trgm ON vehicle_control_unknownlicenseplate'
+        ' USING gin (UPPER("detected_plate_number") gin_trgm_ops)'
+    ),
+]
+
+POSTGRES_UNINSTALL = [
+    'DROP INDEX IF EXISTS registered_plate_number_trgm',
+    'DROP INDEX IF EXISTS registered_owner_name_trgm',
+    'DROP INDEX IF EXISTS known_detected_plate_trgm',
+    'DROP INDEX IF EXISTS unknown_detected_plate_trgm',
+]
+
+SQLITE_INSTALL = [
+    (
+        'CREATE VIRTUAL TABLE IF NOT EXISTS vehicle_control_registered_search'
+        " USING fts5(body, tokenize='trigram')"
+    ),
+    'DELETE FROM vehicle_control_registered_search',
+    (
+        'INSERT INTO vehicle_control_registered_search(rowid, body)'
+        " SELECT t.id, t.plate_number || ' | ' || t.owner_name"
+        ' FROM vehicle_control_registeredlicenseplate t'
+    ),
+    "CREATE VIRTUAL TABLE IF NOT EXISTS vehicle_control_known_search USING fts5(body, tokenize='trigram')",
+    'DELETE FROM vehicle_control_known_search',
+    (
+        'INSERT INTO vehicle_control_known_search(rowid, body)'
+        " SELECT t.id, t.detected_plate_number || ' | ' ||"
+        " COALESCE((SELECT r.plate_number || ' | ' || r.owner_name"
+        " FROM vehicle_control_registeredlicenseplate r WHERE r.id = t.registered_plate_id), '')"
+        ' FROM vehicle_control_knownlicenseplate t'
+    ),
+    "CREATE VIRTUAL TABLE IF NOT EXISTS vehicle_control_unknown_search USING fts5(body, tokenize='trigram')",
+    'DELETE FROM vehicle_control_unknown_search',
+    (
+        'INSERT INTO vehicle_control_unknown_search(rowid, body) SELECT t.id, t.detected_plate_number'
+        ' FROM vehicle_control_unknownlicenseplate t'
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_registered_search_ai AFTER INSERT'
+        ' ON vehicle_control_registeredlicenseplate BEGIN '
+        'INSERT INTO vehicle_control_registered_search(rowid, body)'
+        " VALUES (NEW.id, NEW.plate_number || ' | ' || NEW.owner_name); END"
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_registered_search_ad AFTER DELETE'
+        ' ON vehicle_control_registeredlicenseplate BEGIN '
+        'DELETE FROM vehicle_control_registered_search WHERE rowid = OLD.id; END'
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_registered_search_au AFTER UPDATE'
+        ' ON vehicle_control_registeredlicenseplate BEGIN '
+        'DELETE FROM vehicle_control_registered_search WHERE rowid = OLD.id; '
+        'INSERT INTO vehicle_control_registered_search(rowid, body)'
+        " VALUES (NEW.id, NEW.plate_number || ' | ' || NEW.owner_name); END"
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_known_search_ai AFTER INSERT'
+        ' ON vehicle_control_knownlicenseplate BEGIN '
+        'INSERT INTO vehicle_control_known_search(rowid, body)'
+        " VALUES (NEW.id, NEW.detected_plate_number || ' | ' ||"
+        " COALESCE((SELECT r.plate_number || ' | ' || r.owner_name"
+        " FROM vehicle_control_registeredlicenseplate r WHERE r.id = NEW.registered_plate_id), '')); END"
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_known_search_ad AFTER DELETE'
+        ' ON vehicle_control_knownlicenseplate BEGIN '
+        'DELETE FROM vehicle_control_known_search WHERE rowid = OLD.id; END'
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_known_search_au AFTER UPDATE'
+        ' ON vehicle_control_knownlicenseplate BEGIN '
+        'DELETE FROM vehicle_control_known_search WHERE rowid = OLD.id; '
+        'INSERT INTO vehicle_control_known_search(rowid, body)'
+        " VALUES (NEW.id, NEW.detected_plate_number || ' | ' ||"
+        " COALESCE((SELECT r.plate_number || ' | ' || r.owner_name"
+        " FROM vehicle_control_registeredlicenseplate r WHERE r.id = NEW.registered_plate_id), '')); END"
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_unknown_search_ai AFTER INSERT'
+        ' ON vehicle_control_unknownlicenseplate BEGIN '
+        'INSERT INTO vehicle_control_unknown_search(rowid, body)'
+        ' VALUES (NEW.id, NEW.detected_plate_number); END'
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_unknown_search_ad AFTER DELETE'
+        ' ON vehicle_control_unknownlicenseplate BEGIN '
+        'DELETE FROM vehicle_control_unknown_search WHERE rowid = OLD.id; END'
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_unknown_search_au AFTER UPDATE'
+        ' ON vehicle_control_unknownlicenseplate BEGIN '
+        'DELETE FROM vehicle_control_unknown_search WHERE rowid = OLD.id; '
+        'INSERT INTO vehicle_control_unknown_search(rowid, body)'
+        ' VALUES (NEW.id, NEW.detected_plate_number); END'
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_known_search_registered_au'
+        ' AFTER UPDATE OF plate_number, owner_name ON vehicle_control_registeredlicenseplate BEGIN '
+        'DELETE FROM vehicle_control_known_search WHERE rowid IN (SELECT id'
+        ' FROM vehicle_control_knownlicenseplate WHERE registered_plate_id = NEW.id); '
+        'INSERT INTO vehicle_control_known_search(rowid, body)'
+        " SELECT k.id, k.detected_plate_number || ' | ' ||"
+        " COALESCE((SELECT r.plate_number || ' | ' || r.owner_name"
+        " FROM vehicle_control_registeredlicenseplate r WHERE r.id = k.registered_plate_id), '')"
+        ' FROM vehicle_control_knownlicenseplate k WHERE k.registered_plate_id = NEW.id; END'
+    ),
+]
+
+SQLITE_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS vehicle_control_registered_search_ai',
+    'DROP TRIGGER IF EXISTS vehicle_control_registered_search_ad',
+    'DROP TRIGGER IF EXISTS vehicle_control_registered_search_au',
+    'DROP TRIGGER IF EXISTS vehicle_control_known_search_ai',
+    'DROP TRIGGER IF EXISTS vehicle_control_known_search_ad',
+    'DROP TRIGGER IF EXISTS vehicle_control_known_search_au',
+    'DROP TRIGGER IF EXISTS vehicle_control_unknown_search_ai',
+    'DROP TRIGGER IF EXISTS vehicle_control_unknown_search_ad',
+    'DROP TRIGGER IF EXISTS vehicle_control_unknown_search_au',
+    'DROP TRIGGER IF EXISTS vehicle_control_known_search_registered_au',
+    'DROP TABLE IF EXISTS vehicle_control_registered_search',
+    'DROP TABLE IF EXISTS vehicle_control_known_search',
+    'DROP TABLE IF EXISTS vehicle_control_unknown_search',
+]
+
+
+def _execute(schema_editor, statements):
+    with schema_editor.connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def _sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        _execute(schema_editor, POSTGRES_INSTALL)
+    elif connection.vendor == 'sqlite' and _sqlite_has_fts5(connection):
+        _execute(schema_editor, SQLITE_INSTALL)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        _execute(schema_editor, POSTGRES_UNINSTALL)
+    elif connection.vendor == 'sqlite':
+        _execute(schema_editor, SQLITE_UNINSTALL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicle_control', '0005_detection_timeline_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
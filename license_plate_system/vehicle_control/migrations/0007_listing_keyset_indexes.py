@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicle_control', '0006_plate_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='registeredlicenseplate',
+            index=models.Index(fields=['-registered_date', '-id'], name='registered_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videodetection',
+            index=models.Index(fields=['-upload_timestamp', '-id'], name='video_uploaded_id_idx'),
+        ),
+    ]
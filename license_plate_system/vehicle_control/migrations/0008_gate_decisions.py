@@ -0,0 +1,182 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+# The SQLite search index of migration 0006, spelled out as it stood then
+SQLITE_INSTALL = [
+    (
+        'CREATE VIRTUAL TABLE IF NOT EXISTS vehicle_control_registered_search'
+        " USING fts5(body, tokenize='trigram')"
+    ),
+    'DELETE FROM vehicle_control_registered_search',
+    (
+        'INSERT INTO vehicle_control_registered_search(rowid, body)'
+        " SELECT t.id, t.plate_number || ' | ' || t.owner_name"
+        ' FROM vehicle_control_registeredlicenseplate t'
+    ),
+    "CREATE VIRTUAL TABLE IF NOT EXISTS vehicle_control_known_search USING fts5(body, tokenize='trigram')",
+    'DELETE FROM vehicle_control_known_search',
+    (
+        'INSERT INTO vehicle_control_known_search(rowid, body)'
+        " SELECT t.id, t.detected_plate_number || ' | ' ||"
+        " COALESCE((SELECT r.plate_number || ' | ' || r.owner_name"
+        " FROM vehicle_control_registeredlicenseplate r WHERE r.id = t.registered_plate_id), '')"
+        ' FROM vehicle_control_knownlicenseplate t'
+    ),
+    "CREATE VIRTUAL TABLE IF NOT EXISTS vehicle_control_unknown_search USING fts5(body, tokenize='trigram')",
+    'DELETE FROM vehicle_control_unknown_search',
+    (
+        'INSERT INTO vehicle_control_unknown_search(rowid, body) SELECT t.id, t.detected_plate_number'
+        ' FROM vehicle_control_unknownlicenseplate t'
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_registered_search_ai AFTER INSERT'
+        ' ON vehicle_control_registeredlicenseplate BEGIN '
+        'INSERT INTO vehicle_control_registered_search(rowid, body)'
+        " VALUES (NEW.id, NEW.plate_number || ' | ' || NEW.owner_name); END"
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_registered_search_ad AFTER DELETE'
+        ' ON vehicle_control_registeredlicenseplate BEGIN '
+        'DELETE FROM vehicle_control_registered_search WHERE rowid = OLD.id; END'
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_registered_search_au AFTER UPDATE'
+        ' ON vehicle_control_registeredlicenseplate BEGIN '
+        'DELETE FROM vehicle_control_registered_search WHERE rowid = OLD.id; '
+        'INSERT INTO vehicle_control_registered_search(rowid, body)'
+        " VALUES (NEW.id, NEW.plate_number || ' | ' || NEW.owner_name); END"
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_known_search_ai AFTER INSERT'
+        ' ON vehicle_control_knownlicenseplate BEGIN '
+        'INSERT INTO vehicle_control_known_search(rowid, body)'
+        " VALUES (NEW.id, NEW.detected_plate_number || ' | ' ||"
+        " COALESCE((SELECT r.plate_number || ' | ' || r.owner_name"
+        " FROM vehicle_control_registeredlicenseplate r WHERE r.id = NEW.registered_plate_id), '')); END"
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_known_search_ad AFTER DELETE'
+        ' ON vehicle_control_knownlicenseplate BEGIN '
+        'DELETE FROM vehicle_control_known_search WHERE rowid = OLD.id; END'
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_known_search_au AFTER UPDATE'
+        ' ON vehicle_control_knownlicenseplate BEGIN '
+        'DELETE FROM vehicle_control_known_search WHERE rowid = OLD.id; '
+        'INSERT INTO vehicle_control_known_search(rowid, body)'
+        " VALUES (NEW.id, NEW.detected_plate_number || ' | ' ||"
+        " COALESCE((SELECT r.plate_number || ' | ' || r.owner_name"
+        " FROM vehicle_control_registeredlicenseplate r WHERE r.id = NEW.registered_plate_id), '')); END"
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_unknown_search_ai AFTER INSERT'
+        ' ON vehicle_control_unknownlicenseplate BEGIN '
+        'INSERT INTO vehicle_control_unknown_search(rowid, body)'
+        ' VALUES (NEW.id, NEW.detected_plate_number); END'
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_unknown_search_ad AFTER DELETE'
+        ' ON vehicle_control_unknownlicenseplate BEGIN '
+        'DELETE FROM vehicle_control_unknown_search WHERE rowid = OLD.id; END'
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_unknown_search_au AFTER UPDATE'
+        ' ON vehicle_control_unknownlicenseplate BEGIN '
+        'DELETE FROM vehicle_control_unknown_search WHERE rowid = OLD.id; '
+        'INSERT INTO vehicle_control_unknown_search(rowid, body)'
+        ' VALUES (NEW.id, NEW.detected_plate_number); END'
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_known_search_registered_au'
+        ' AFTER UPDATE OF plate_number, owner_name ON vehicle_control_registeredlicenseplate BEGIN '
+        'DELETE FROM vehicle_control_known_search WHERE rowid IN (SELECT id'
+        ' FROM vehicle_control_knownlicenseplate WHERE registered_plate_id = NEW.id); '
+        'INSERT INTO vehicle_control_known_search(rowid, body)'
+        " SELECT k.id, k.detected_plate_number || ' | ' ||"
+        " COALESCE((SELECT r.plate_number || ' | ' || r.owner_name"
+        " FROM vehicle_control_registeredlicenseplate r WHERE r.id = k.registered_plate_id), '')"
+        ' FROM vehicle_control_knownlicenseplate k WHERE k.registered_plate_id = NEW.id; END'
+    ),
+]
+
+SQLITE_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS vehicle_control_registered_search_ai',
+    'DROP TRIGGER IF EXISTS vehicle_control_registered_search_ad',
+    'DROP TRIGGER IF EXISTS vehicle_control_registered_search_au',
+    'DROP TRIGGER IF EXISTS vehicle_control_known_search_ai',
+    'DROP TRIGGER IF EXISTS vehicle_control_known_search_ad',
+    'DROP TRIGGER IF EXISTS vehicle_control_known_search_au',
+    'DROP TRIGGER IF EXISTS vehicle_control_unknown_search_ai',
+    'DROP TRIGGER IF EXISTS vehicle_control_unknown_search_ad',
+    'DROP TRIGGER IF EXISTS vehicle_control_unknown_search_au',
+    'DROP TRIGGER IF EXISTS vehicle_control_known_search_registered_au',
+    'DROP TABLE IF EXISTS vehicle_control_registered_search',
+    'DROP TABLE IF EXISTS vehicle_control_known_search',
+    'DROP TABLE IF EXISTS vehicle_control_unknown_search',
+]
+
+
+def _execute(schema_editor, statements):
+    with schema_editor.connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def _sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def drop_sqlite_search_index(apps, schema_editor):
+    # SQLite rebuilds the plate table to add a column, which fails while the
+    # search triggers on other tables still reference it
+    if schema_editor.connection.vendor == 'sqlite':
+        _execute(schema_editor, SQLITE_UNINSTALL)
+
+
+def create_sqlite_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite' and _sqlite_has_fts5(connection):
+        _execute(schema_editor, SQLITE_INSTALL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicle_control', '0007_listing_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_sqlite_search_index, create_sqlite_search_index),
+        migrations.AddField(
+            model_name='registeredlicenseplate',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='GateDecision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('plate_text', models.CharField(blank=True, max_length=50)),
+                ('normalized_plate', models.CharField(blank=True, max_length=50)),
+                ('allowed', models.BooleanField(default=False)),
+                ('match_type', models.CharField(choices=[('exact', 'Exact'), ('fuzzy', 'Fuzzy'), ('ambiguous', 'Ambiguous'), ('none', 'No Match')], default='none', max_length=20)),
+                ('gate', models.CharField(blank=True, max_length=50)),
+                ('latency_ms', models.FloatField(default=0)),
+                ('decided_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('registered_plate', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='gate_decisions', to='vehicle_control.registeredlicenseplate')),
+            ],
+            options={
+                'verbose_name': 'Gate Decision',
+                'verbose_name_plural': 'Gate Decisions',
+                'ordering': ['-decided_at'],
+                'indexes': [models.Index(fields=['-decided_at', '-id'], name='gate_decided_at_id_idx')],
+            },
+        ),
+        migrations.RunPython(create_sqlite_search_index, drop_sqlite_search_index),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:18
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicle_control', '0008_gate_decisions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CameraProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('description', models.TextField(blank=True)),
+                ('roi_polygons', models.JSONField(blank=True, default=list, help_text='Regions of interest as [[[x, y], ...], ...] with x/y as fractions (0-1) of the frame width/height. Empty means the whole frame.')),
+                ('mask_outside_roi', models.BooleanField(default=True, help_text='Black out pixels inside the ROI bounding box but outside the polygons')),
+                ('frame_skip', models.PositiveIntegerField(default=30, help_text='Process every Nth frame')),
+                ('min_area', models.PositiveIntegerField(default=1000, help_text='Smallest plate contour area in pixels')),
+                ('aspect_ratio_min', models.FloatField(default=2.0)),
+                ('aspect_ratio_max', models.FloatField(default=8.0)),
+                ('ocr_confidence_threshold', models.FloatField(default=0.6, help_text='Minimum OCR confidence for a plate candidate')),
+                ('min_confidence', models.FloatField(default=0.6, help_text='Minimum confidence for recording a detection')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Camera Profile',
+                'verbose_name_plural': 'Camera Profiles',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='videodetection',
+            name='camera_profile',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='videos', to='vehicle_control.cameraprofile'),
+        ),
+    ]
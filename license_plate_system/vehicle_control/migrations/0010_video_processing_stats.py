@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicle_control', '0009_camera_profiles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videodetection',
+            name='processing_stats',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
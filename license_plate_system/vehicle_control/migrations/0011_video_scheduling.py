@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicle_control', '0010_video_processing_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videodetection',
+            name='preemptions',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='videodetection',
+            name='priority',
+            field=models.IntegerField(choices=[(0, 'Low'), (5, 'Normal'), (10, 'Urgent')], default=5),
+        ),
+        migrations.AddField(
+            model_name='videodetection',
+            name='queued_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='videodetection',
+            name='remaining_frames',
+            field=models.IntegerField(blank=True, help_text='Sampled frames left to process', null=True),
+        ),
+        migrations.AddField(
+            model_name='videodetection',
+            name='resume_frame',
+            field=models.IntegerField(default=0, help_text='First frame not yet processed (checkpoint)'),
+        ),
+        migrations.AddField(
+            model_name='videodetection',
+            name='total_frames',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='videodetection',
+            name='worker',
+            field=models.CharField(blank=True, help_text='host:pid of the worker running the job', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='videodetection',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('processing', 'Processing'), ('completed', 'Completed'), ('error', 'Error')], default='processing', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='videodetection',
+            index=models.Index(fields=['status', '-priority', 'remaining_frames'], name='video_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,144 @@
+from django.db import migrations
+
+# Known detections are indexed by plate numbers only now: the SQLite FTS
+# tables and triggers are recreated without the registered owner's name.
+SQLITE_INSTALL = [
+    (
+        'CREATE VIRTUAL TABLE IF NOT EXISTS vehicle_control_registered_search'
+        " USING fts5(body, tokenize='trigram')"
+    ),
+    'DELETE FROM vehicle_control_registered_search',
+    (
+        'INSERT INTO vehicle_control_registered_search(rowid, body)'
+        " SELECT t.id, t.plate_number || ' | ' || t.owner_name"
+        ' FROM vehicle_control_registeredlicenseplate t'
+    ),
+    "CREATE VIRTUAL TABLE IF NOT EXISTS vehicle_control_known_search USING fts5(body, tokenize='trigram')",
+    'DELETE FROM vehicle_control_known_search',
+    (
+        'INSERT INTO vehicle_control_known_search(rowid, body)'
+        " SELECT t.id, t.detected_plate_number || ' | ' || COALESCE((SELECT r.plate_number"
+        " FROM vehicle_control_registeredlicenseplate r WHERE r.id = t.registered_plate_id), '')"
+        ' FROM vehicle_control_knownlicenseplate t'
+    ),
+    "CREATE VIRTUAL TABLE IF NOT EXISTS vehicle_control_unknown_search USING fts5(body, tokenize='trigram')",
+    'DELETE FROM vehicle_control_unknown_search',
+    (
+        'INSERT INTO vehicle_control_unknown_search(rowid, body) SELECT t.id, t.detected_plate_number'
+        ' FROM vehicle_control_unknownlicenseplate t'
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_registered_search_ai AFTER INSERT'
+        ' ON vehicle_control_registeredlicenseplate BEGIN '
+        'INSERT INTO vehicle_control_registered_search(rowid, body)'
+        " VALUES (NEW.id, NEW.plate_number || ' | ' || NEW.owner_name); END"
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_registered_search_ad AFTER DELETE'
+        ' ON vehicle_control_registeredlicenseplate BEGIN '
+        'DELETE FROM vehicle_control_registered_search WHERE rowid = OLD.id; END'
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_registered_search_au AFTER UPDATE'
+        ' ON vehicle_control_registeredlicenseplate BEGIN '
+        'DELETE FROM vehicle_control_registered_search WHERE rowid = OLD.id; '
+        'INSERT INTO vehicle_control_registered_search(rowid, body)'
+        " VALUES (NEW.id, NEW.plate_number || ' | ' || NEW.owner_name); END"
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_known_search_ai AFTER INSERT'
+        ' ON vehicle_control_knownlicenseplate BEGIN '
+        'INSERT INTO vehicle_control_known_search(rowid, body)'
+        " VALUES (NEW.id, NEW.detected_plate_number || ' | ' || COALESCE((SELECT r.plate_number"
+        " FROM vehicle_control_registeredlicenseplate r WHERE r.id = NEW.registered_plate_id), '')); END"
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_known_search_ad AFTER DELETE'
+        ' ON vehicle_control_knownlicenseplate BEGIN '
+        'DELETE FROM vehicle_control_known_search WHERE rowid = OLD.id; END'
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_known_search_au AFTER UPDATE'
+        ' ON vehicle_control_knownlicenseplate BEGIN '
+        'DELETE FROM vehicle_control_known_search WHERE rowid = OLD.id; '
+        'INSERT INTO vehicle_control_known_search(rowid, body)'
+        " VALUES (NEW.id, NEW.detected_plate_number || ' | ' || COALESCE((SELECT r.plate_number"
+        " FROM vehicle_control_registeredlicenseplate r WHERE r.id = NEW.registered_plate_id), '')); END"
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_unknown_search_ai AFTER INSERT'
+        ' ON vehicle_control_unknownlicenseplate BEGIN '
+        'INSERT INTO vehicle_control_unknown_search(rowid, body)'
+        ' VALUES (NEW.id, NEW.detected_plate_number); END'
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_unknown_search_ad AFTER DELETE'
+        ' ON vehicle_control_unknownlicenseplate BEGIN '
+        'DELETE FROM vehicle_control_unknown_search WHERE rowid = OLD.id; END'
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_unknown_search_au AFTER UPDATE'
+        ' ON vehicle_control_unknownlicenseplate BEGIN '
+        'DELETE FROM vehicle_control_unknown_search WHERE rowid = OLD.id; '
+        'INSERT INTO vehicle_control_unknown_search(rowid, body)'
+        ' VALUES (NEW.id, NEW.detected_plate_number); END'
+    ),
+    (
+        'CREATE TRIGGER IF NOT EXISTS vehicle_control_known_search_registered_au'
+        ' AFTER UPDATE OF plate_number ON vehicle_control_registeredlicenseplate BEGIN '
+        'DELETE FROM vehicle_control_known_search WHERE rowid IN (SELECT id'
+        ' FROM vehicle_control_knownlicenseplate WHERE registered_plate_id = NEW.id); '
+        'INSERT INTO vehicle_control_known_search(rowid, body)'
+        " SELECT k.id, k.detected_plate_number || ' | ' || COALESCE((SELECT r.plate_number"
+        " FROM vehicle_control_registeredlicenseplate r WHERE r.id = k.registered_plate_id), '')"
+        ' FROM vehicle_control_knownlicenseplate k WHERE k.registered_plate_id = NEW.id; END'
+    ),
+]
+
+SQLITE_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS vehicle_control_registered_search_ai',
+    'DROP TRIGGER IF EXISTS vehicle_control_registered_search_ad',
+    'DROP TRIGGER IF EXISTS vehicle_control_registered_search_au',
+    'DROP TRIGGER IF EXISTS vehicle_control_known_search_ai',
+    'DROP TRIGGER IF EXISTS vehicle_control_known_search_ad',
+    'DROP TRIGGER IF EXISTS vehicle_control_known_search_au',
+    'DROP TRIGGER IF EXISTS vehicle_control_unknown_search_ai',
+    'DROP TRIGGER IF EXISTS vehicle_control_unknown_search_ad',
+    'DROP TRIGGER IF EXISTS vehicle_control_unknown_search_au',
+    'DROP TRIGGER IF EXISTS vehicle_control_known_search_registered_au',
+    'DROP TABLE IF EXISTS vehicle_control_registered_search',
+    'DROP TABLE IF EXISTS vehicle_control_known_search',
+    'DROP TABLE IF EXISTS vehicle_control_unknown_search',
+]
+
+
+def _execute(schema_editor, statements):
+    with schema_editor.connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def _sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def rebuild_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    _execute(schema_editor, SQLITE_UNINSTALL)
+    if _sqlite_has_fts5(connection):
+        _execute(schema_editor, SQLITE_INSTALL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicle_control', '0011_video_scheduling'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_search_index, migrations.RunPython.noop),
+    ]
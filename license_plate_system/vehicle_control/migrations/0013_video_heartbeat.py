@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicle_control', '0012_known_search_plate_numbers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videodetection',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text="Last checkpoint of the running job (its worker's lease)", null=True),
+        ),
+    ]
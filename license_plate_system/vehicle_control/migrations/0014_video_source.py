@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicle_control', '0013_video_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videodetection',
+            name='source',
+            field=models.CharField(choices=[('upload', 'Uploaded video'), ('stream', 'Live stream')], default='upload', max_length=10),
+        ),
+        # Existing ingest_stream sessions are the rows without a video file
+        migrations.RunSQL(
+            "UPDATE vehicle_control_videodetection SET source = 'stream' WHERE video_file = ''",
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,155 @@
+"""
+Local, checksum-verified store for the detector's model weights.
+
+Production runs without internet access, where EasyOCR's first-use download
+hangs or fails. All weights therefore live in ``MODEL_STORE_DIR``, copied
+there from local files by ``manage.py model_store populate``, which records
+each file's SHA-256 in ``manifest.json``. The detector verifies the files
+against the manifest before loading and builds the EasyOCR reader with
+downloads disabled; anything missing or altered fails with a
+``ModelStoreError`` saying which file and how to fix it.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+EASYOCR_LANGUAGES = ['th', 'en']
+EASYOCR_DIR = 'easyocr'
+MANIFEST = 'manifest.json'
+
+# name -> store path, whether the detector can run without it, and EasyOCR's
+# published MD5 (source files are checked against it before they are stored)
+MODEL_FILES = {
+    'ocr_detector': {'path': f'{EASYOCR_DIR}/craft_mlt_25k.pth', 'required': True,
+                     'md5': '2f8227d2def4037cdb3b34389dcf9ec1'},
+    'ocr_recognizer': {'path': f'{EASYOCR_DIR}/thai.pth', 'required': True,
+                       'md5': '40a06b563a2b3d7897e2d19df20dc709'},
+    'vehicle_model': {'path': 'keras_Model.h5', 'required': False},
+    'vehicle_labels': {'path': 'labels.txt', 'required': False},
+}
+
+
+class ModelStoreError(Exception):
+    """A model file is missing from the store or doesn't match its manifest"""
+
+
+def store_dir():
+    return Path(settings.MODEL_STORE_DIR)
+
+
+def model_path(name):
+    return store_dir() / MODEL_FILES[name]['path']
+
+
+def file_digest(path, algorithm='sha256'):
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest():
+    try:
+        with open(store_dir() / MANIFEST) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        raise ModelStoreError(f'{store_dir() / MANIFEST} is not valid JSON: {e}')
+
+
+def check(name, manifest=None):
+    """None if ``name`` is present and matches the manifest, else what is wrong with it"""
+    manifest = load_manifest() if manifest is None else manifest
+    path = model_path(name)
+    if not path.is_file():
+        return f'{path} is missing'
+    entry = manifest.get(name)
+    if entry is None:
+        return f'{path} is not in {MANIFEST}'
+    if path.stat().st_size != entry['size']:
+        return f'{path} is {path.stat().st_size} bytes, the manifest says {entry["size"]}'
+    if file_digest(path) != entry['sha256']:
+        return f'{path} does not match its SHA-256 in {MANIFEST}'
+    return None
+
+
+def require(*names):
+    """Paths of ``names`` after verifying them; ModelStoreError otherwise"""
+    manifest = load_manifest()
+    problems = [problem for problem in (check(name, manifest) for name in names) if problem]
+    if problems:
+        raise ModelStoreError(
+            'Model store is incomplete: ' + '; '.join(problems) +
+            f'. Populate it with `python manage.py model_store populate --source <dir with the weights>` '
+            f'(MODEL_STORE_DIR={store_dir()})'
+        )
+    return [model_path(name) for name in names]
+
+
+def available(*names):
+    """True if every file in ``names`` exists in the store (optional models)"""
+    return all(model_path(name).is_file() for name in names)
+
+
+def find_source(name, sources):
+    filename = os.path.basename(MODEL_FILES[name]['path'])
+    for source in sources:
+        candidate = Path(source).expanduser() / filename
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def download_easyocr(directory):
+    """Fetch EasyOCR's weights into ``directory``; needs internet, so only build machines call it"""
+    directory = Path(directory).expanduser()
+    directory.mkdir(parents=True, exist_ok=True)
+    try:
+        import easyocr
+        easyocr.Reader(EASYOCR_LANGUAGES, gpu=False, model_storage_directory=str(directory), verbose=False)
+    except Exception as e:
+        raise ModelStoreError(f'Downloading the EasyOCR weights into {directory} failed: {e}')
+
+
+def populate(sources, report=print):
+    """Copy model files found in ``sources`` into the store and rewrite the manifest; returns missing names"""
+    directory = store_dir()
+    (directory / EASYOCR_DIR).mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest()
+    missing = []
+
+    for name, spec in MODEL_FILES.items():
+        source = find_source(name, sources)
+        target = model_path(name)
+        if source is None:
+            if not target.is_file():
+                missing.append(name)
+            continue
+        if spec.get('md5') and file_digest(source, 'md5') != spec['md5']:
+            raise ModelStoreError(f'{source} does not match the published EasyOCR checksum; re-fetch it')
+
+        if source.resolve() != target.resolve():
+            # Copy next to the target first so a crash never leaves a half-written model
+            fd, tmp = tempfile.mkstemp(dir=target.parent, prefix='.tmp-')
+            os.close(fd)
+            try:
+                shutil.copyfile(source, tmp)
+                os.replace(tmp, target)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        manifest[name] = {'path': spec['path'], 'size': target.stat().st_size, 'sha256': file_digest(target)}
+        report(f'{name}: {target} ({manifest[name]["size"]} bytes)')
+
+    tmp = directory / f'.{MANIFEST}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, directory / MANIFEST)
+    return missing
@@ -1,6 +1,8 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
+import uuid
 
 class UserProfile(models.Model):
     """Extended user profile"""
@@ -33,39 +35,144 @@ class RegisteredLicensePlate(models.Model):
     vehicle_model = models.CharField(max_length=50, blank=True)
     vehicle_color = models.CharField(max_length=30, blank=True)
     registered_date = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     notes = models.TextField(blank=True)
     
     class Meta:
         ordering = ['-registered_date']
+        indexes = [
+            # Keyset pagination of the plate history listing
+            models.Index(fields=['-registered_date', '-id'], name='registered_date_id_idx'),
+        ]
         verbose_name = 'Registered License Plate'
         verbose_name_plural = 'Registered License Plates'
     
     def __str__(self):
         return f"{self.plate_number} - {self.owner_name}"
 
+class CameraProfile(models.Model):
+    """Where plates appear in a fixed camera's frame and how its footage is processed"""
+    name = models.CharField(max_length=100, unique=True)
+    description = models.TextField(blank=True)
+    roi_polygons = models.JSONField(
+        default=list, blank=True,
+        help_text='Regions of interest as [[[x, y], ...], ...] with x/y as fractions (0-1) of the frame '
+                  'width/height. Empty means the whole frame.'
+    )
+    mask_outside_roi = models.BooleanField(
+        default=True,
+        help_text='Black out pixels inside the ROI bounding box but outside the polygons'
+    )
+    frame_skip = models.PositiveIntegerField(default=30, help_text='Process every Nth frame')
+    min_area = models.PositiveIntegerField(default=1000, help_text='Smallest plate contour area in pixels')
+    aspect_ratio_min = models.FloatField(default=2.0)
+    aspect_ratio_max = models.FloatField(default=8.0)
+    ocr_confidence_threshold = models.FloatField(default=0.6, help_text='Minimum OCR confidence for a plate candidate')
+    min_confidence = models.FloatField(default=0.6, help_text='Minimum confidence for recording a detection')
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['name']
+        verbose_name = 'Camera Profile'
+        verbose_name_plural = 'Camera Profiles'
+    
+    def __str__(self):
+        return self.name
+    
+    def clean(self):
+        from .roi import validate_polygons
+        try:
+            validate_polygons(self.roi_polygons)
+        except ValueError as e:
+            raise ValidationError({'roi_polygons': str(e)})
+        if self.aspect_ratio_min > self.aspect_ratio_max:
+            raise ValidationError({'aspect_ratio_max': 'Must not be smaller than the minimum aspect ratio'})
+
 class VideoDetection(models.Model):
     """Video uploaded by admin for license plate detection"""
     STATUS_CHOICES = [
+        ('queued', 'Queued'),
         ('processing', 'Processing'),
         ('completed', 'Completed'),
         ('error', 'Error'),
     ]
+    SOURCE_CHOICES = [
+        ('upload', 'Uploaded video'),
+        ('stream', 'Live stream'),
+    ]
+    PRIORITY_LOW = 0
+    PRIORITY_NORMAL = 5
+    PRIORITY_URGENT = 10
+    PRIORITY_CHOICES = [
+        (PRIORITY_LOW, 'Low'),
+        (PRIORITY_NORMAL, 'Normal'),
+        (PRIORITY_URGENT, 'Urgent'),
+    ]
     
     uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE)
     video_file = models.FileField(upload_to='videos/')
+    # ingest_stream sessions group live detections and have no video file to (re)process
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, default='upload')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='processing')
     upload_timestamp = models.DateTimeField(default=timezone.now)
     processed_at = models.DateTimeField(null=True, blank=True)
     processing_notes = models.TextField(blank=True)
+    camera_profile = models.ForeignKey(CameraProfile, on_delete=models.SET_NULL, null=True, blank=True, related_name='videos')
+    processing_stats = models.JSONField(default=dict, blank=True)
+    
+    # Scheduling (see scheduling.py)
+    priority = models.IntegerField(choices=PRIORITY_CHOICES, default=PRIORITY_NORMAL)
+    total_frames = models.IntegerField(null=True, blank=True)
+    resume_frame = models.IntegerField(default=0, help_text='First frame not yet processed (checkpoint)')
+    remaining_frames = models.IntegerField(null=True, blank=True, help_text='Sampled frames left to process')
+    queued_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True, help_text='host:pid of the worker running the job')
+    heartbeat_at = models.DateTimeField(null=True, blank=True, help_text="Last checkpoint of the running job (its worker's lease)")
+    preemptions = models.PositiveIntegerField(default=0)
     
     class Meta:
         ordering = ['-upload_timestamp']
+        indexes = [
+            # Keyset pagination of the video list
+            models.Index(fields=['-upload_timestamp', '-id'], name='video_uploaded_id_idx'),
+            # Picking the next queued job
+            models.Index(fields=['status', '-priority', 'remaining_frames'], name='video_queue_idx'),
+        ]
         verbose_name = 'Video Detection'
         verbose_name_plural = 'Video Detections'
     
     def __str__(self):
         return f"Video {self.id} - {self.status}"
 
+class ChunkedUpload(models.Model):
+    """Resumable video upload assembled on disk one chunk at a time"""
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+        ('failed', 'Failed'),
+    ]
+    
+    upload_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chunked_uploads')
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    expected_checksum = models.CharField(max_length=64, blank=True)
+    checksum = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    video_detection = models.OneToOneField(VideoDetection, on_delete=models.SET_NULL, null=True, blank=True, related_name='chunked_upload')
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Chunked Upload'
+        verbose_name_plural = 'Chunked Uploads'
+    
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.total_size}) - {self.status}"
+
 class KnownLicensePlate(models.Model):
     """License plates found in video that exist in registered database"""
     video_detection = models.ForeignKey(VideoDetection, on_delete=models.CASCADE, related_name='known_plates')
@@ -79,6 +186,10 @@ class KnownLicensePlate(models.Model):
     
     class Meta:
         ordering = ['-detected_at']
+        indexes = [
+            # Keyset pagination of the detection timeline
+            models.Index(fields=['-detected_at', '-id'], name='known_detected_at_id_idx'),
+        ]
         verbose_name = 'Known License Plate Detection'
         verbose_name_plural = 'Known License Plate Detections'
     
@@ -98,8 +209,71 @@ class UnknownLicensePlate(models.Model):
     
     class Meta:
         ordering = ['-detected_at']
+        indexes = [
+            # Keyset pagination of the detection timeline
+            models.Index(fields=['-detected_at', '-id'], name='unknown_detected_at_id_idx'),
+        ]
         verbose_name = 'Unknown License Plate Detection'
         verbose_name_plural = 'Unknown License Plate Detections'
     
     def __str__(self):
         return f"{self.detected_plate_number} (Unknown) - {self.video_detection.id}"
+
+class StatisticCounter(models.Model):
+    """All-time row counts kept up to date on write, so dashboards never COUNT(*)"""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Statistic Counter'
+        verbose_name_plural = 'Statistic Counters'
+    
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+class DailyStatistic(models.Model):
+    """Per-day rollup of the same counters (local date of the row's timestamp)"""
+    name = models.CharField(max_length=50)
+    day = models.DateField()
+    value = models.BigIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-day', 'name']
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'day'], name='unique_daily_statistic'),
+        ]
+        verbose_name = 'Daily Statistic'
+        verbose_name_plural = 'Daily Statistics'
+    
+    def __str__(self):
+        return f"{self.name} on {self.day} = {self.value}"
+
+
+class GateDecision(models.Model):
+    """Access decision made by the gate API (written asynchronously in batches)"""
+    MATCH_TYPES = [
+        ('exact', 'Exact'),
+        ('fuzzy', 'Fuzzy'),
+        ('ambiguous', 'Ambiguous'),
+        ('none', 'No Match'),
+    ]
+    
+    plate_text = models.CharField(max_length=50, blank=True)
+    normalized_plate = models.CharField(max_length=50, blank=True)
+    allowed = models.BooleanField(default=False)
+    match_type = models.CharField(max_length=20, choices=MATCH_TYPES, default='none')
+    registered_plate = models.ForeignKey(RegisteredLicensePlate, on_delete=models.SET_NULL, null=True, blank=True, related_name='gate_decisions')
+    gate = models.CharField(max_length=50, blank=True)
+    latency_ms = models.FloatField(default=0)
+    decided_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-decided_at']
+        indexes = [
+            models.Index(fields=['-decided_at', '-id'], name='gate_decided_at_id_idx'),
+        ]
+        verbose_name = 'Gate Decision'
+        verbose_name_plural = 'Gate Decisions'
+    
+    def __str__(self):
+        return f"{self.plate_text} - {'allowed' if self.allowed else 'denied'}"
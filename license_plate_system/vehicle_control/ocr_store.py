@@ -0,0 +1,198 @@
+"""
+Raw OCR results per video, for re-evaluating without re-running OCR.
+
+With ``OCR_RESULT_STORE`` on, every EasyOCR result of a processed video is
+kept: frame, variant (full preprocessed frame, or the original / enhanced /
+Otsu version of a contour region), the contour region and text box in frame
+coordinates, the raw text and its confidence - whatever the thresholds.
+They are saved as columns in ``OCR_RESULT_DIR/video_<id>.npz``.
+
+``evaluate()`` replays the detector's decision rules on those rows: text
+cleaning, plate validation, the confidence threshold and picking each
+frame's best candidate. Changing the patterns, the corrections or the
+thresholds therefore only needs ``manage.py reevaluate_video``, which takes
+seconds. Changes to which regions are OCRed (ROI, contour area or aspect
+ratio) still need the video processed again.
+"""
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+
+FULL, ORIGINAL, ENHANCED, OTSU = range(4)
+VARIANTS = ['full', 'original', 'enhanced', 'otsu']
+NO_REGION = (-1, -1, -1, -1)
+FORMAT_VERSION = 1
+
+
+def store_path(video_id):
+    return os.path.join(settings.OCR_RESULT_DIR, f'video_{video_id}.npz')
+
+
+def _bbox_rect(bbox):
+    xs = [point[0] for point in bbox]
+    ys = [point[1] for point in bbox]
+    return min(xs), min(ys), max(xs) - min(xs), max(ys) - min(ys)
+
+
+class OCRLog:
+    """Collects raw readtext output for one video; ``for_frame`` gives the detector a per-frame view"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.frames = []
+        self.variants = []
+        self.regions = []
+        self.boxes = []
+        self.texts = []
+        self.confidences = []
+
+    @classmethod
+    def resume(cls, video_id, before_frame):
+        """A log holding the stored rows of frames before ``before_frame`` (a preempted job picking up again)"""
+        log = cls()
+        if not before_frame:
+            return log
+        try:
+            columns = load(video_id)
+        except FileNotFoundError:
+            return log
+        keep = columns['frame'] < before_frame
+        log.frames = columns['frame'][keep].tolist()
+        log.variants = columns['variant'][keep].tolist()
+        log.regions = [tuple(region) for region in columns['region'][keep].tolist()]
+        log.boxes = [tuple(box) for box in columns['box'][keep].tolist()]
+        log.texts = columns['text'][keep].tolist()
+        log.confidences = columns['confidence'][keep].tolist()
+        return log
+
+    def for_frame(self, frame_number, offset=(0, 0)):
+        return FrameOCRLog(self, frame_number, offset)
+
+    def add(self, frame_number, variant, region, results, to_frame):
+        with self._lock:
+            for bbox, text, confidence in results:
+                x, y, w, h = _bbox_rect(bbox)
+                fx, fy = to_frame(x, y)
+                fx2, fy2 = to_frame(x + w, y + h)
+                self.frames.append(frame_number)
+                self.variants.append(variant)
+                self.regions.append(region)
+                self.boxes.append((int(fx), int(fy), int(round(fx2 - fx)), int(round(fy2 - fy))))
+                self.texts.append(text)
+                self.confidences.append(float(confidence))
+
+    def __len__(self):
+        return len(self.frames)
+
+    def save(self, video_id, fps, **meta):
+        """Write the columns to ``store_path(video_id)`` (atomically); returns the path"""
+        path = store_path(video_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.tmp.npz'
+        np.savez_compressed(
+            tmp,
+            version=np.int16(FORMAT_VERSION),
+            fps=np.float64(fps),
+            frame=np.asarray(self.frames, dtype=np.int32),
+            variant=np.asarray(self.variants, dtype=np.uint8),
+            region=np.asarray(self.regions, dtype=np.int32).reshape(-1, 4),
+            box=np.asarray(self.boxes, dtype=np.int32).reshape(-1, 4),
+            text=np.asarray(self.texts, dtype=np.str_),
+            confidence=np.asarray(self.confidences, dtype=np.float32),
+            **{f'meta_{key}': np.asarray(value) for key, value in meta.items()},
+        )
+        os.replace(tmp, path)
+        return path
+
+
+class FrameOCRLog:
+    """The detector's handle for one frame: shifts coordinates from the image it was given to the frame"""
+
+    def __init__(self, log, frame_number, offset):
+        self.log = log
+        self.frame_number = frame_number
+        self.offset = offset
+
+    def shifted(self, dx, dy):
+        """The same frame seen through a crop starting at (dx, dy) of the current image (a tile)"""
+        return FrameOCRLog(self.log, self.frame_number, (self.offset[0] + dx, self.offset[1] + dy))
+
+    def full(self, results):
+        ox, oy = self.offset
+        self.log.add(self.frame_number, FULL, NO_REGION, results, lambda x, y: (x + ox, y + oy))
+
+    def region(self, variant, region, crop_origin, scale, results):
+        """Results of one region variant; ``crop_origin`` and ``scale`` map the resized crop to the image"""
+        ox, oy = self.offset
+        rx, ry, rw, rh = region
+        cx, cy = crop_origin
+        self.log.add(
+            self.frame_number, variant, (rx + ox, ry + oy, rw, rh), results,
+            lambda x, y: (cx + x / scale + ox, cy + y / scale + oy)
+        )
+
+
+def delete(video_id):
+    try:
+        os.remove(store_path(video_id))
+    except FileNotFoundError:
+        pass
+
+
+def load(video_id):
+    """Columns of a video's stored results as a dict of arrays; FileNotFoundError if there are none"""
+    path = store_path(video_id)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f'no stored OCR results at {path} (was OCR_RESULT_STORE on when it was processed?)')
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+
+
+def evaluate(columns, detector, confidence_threshold):
+    """
+    Replay detection on stored rows: ``{frame: (text, confidence, region)}`` for
+    the frames where the detector would have found a plate.
+
+    Mirrors detect_plate_candidates / extract_text_from_region /
+    detect_license_plate with the detector's current cleaning and validation.
+    """
+    frames = columns['frame']
+    variants = columns['variant']
+    regions = columns['region']
+    boxes = columns['box']
+    texts = columns['text']
+    confidences = columns['confidence']
+
+    best = {}
+    region_best = {}
+
+    def offer(frame, candidate):
+        current = best.get(frame)
+        # max() in detect_license_plate keeps the first of equally confident candidates
+        if current is None or candidate[1] > current[1]:
+            best[frame] = candidate
+
+    for i in range(len(frames)):
+        frame = int(frames[i])
+        text = str(texts[i])
+        confidence = float(confidences[i])
+        if variants[i] == FULL:
+            if confidence > confidence_threshold:
+                cleaned = detector.clean_text(text)
+                if detector.validate_license_plate(cleaned):
+                    offer(frame, (cleaned, confidence, tuple(int(v) for v in boxes[i])))
+            continue
+        # Region variants: the best valid reading over all variants of the region
+        key = (frame, tuple(int(v) for v in regions[i]))
+        _, best_confidence = region_best.get(key, ('', 0.0))
+        if confidence > best_confidence and len(text.strip()) >= 4:
+            cleaned = detector.clean_text(text)
+            if detector.validate_license_plate(cleaned):
+                region_best[key] = (cleaned, confidence)
+
+    for (frame, region), (text, confidence) in region_best.items():
+        if confidence > confidence_threshold:
+            offer(frame, (text, confidence, region))
+    return best
@@ -0,0 +1,200 @@
+"""
+Keyset (cursor) pagination helpers.
+
+Cursors are opaque URL-safe tokens holding the sort key of the last row on
+a page, so fetching any page is an indexed range scan of ``per_page`` rows
+instead of a COUNT plus an OFFSET over everything before it. Tokens come
+from the client, so a decoded key is checked against the types of the sort
+fields; anything else counts as no cursor and gives the first page.
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connections, models
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+
+def encode_cursor(values):
+    """Encode a tuple of sort-key values (datetimes, strings, ints) as a token"""
+    payload = [
+        {'dt': value.isoformat()} if isinstance(value, datetime) else value
+        for value in values
+    ]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _is_type(value, expected):
+    if expected is datetime:
+        return isinstance(value, datetime) and (not settings.USE_TZ or timezone.is_aware(value))
+    if expected is int:
+        return isinstance(value, int) and not isinstance(value, bool)
+    return isinstance(value, expected)
+
+
+def decode_cursor(token, types=None):
+    """
+    Inverse of encode_cursor; returns None for a missing or malformed token,
+    or, given ``types`` (one per sort field), for one whose values don't match them.
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list):
+            return None
+        values = tuple(
+            datetime.fromisoformat(value['dt']) if isinstance(value, dict) else value
+            for value in payload
+        )
+    except (ValueError, TypeError, KeyError):
+        return None
+    if types is not None and (
+        len(values) != len(types) or not all(_is_type(value, expected) for value, expected in zip(values, types))
+    ):
+        return None
+    return values
+
+
+def field_type(field):
+    """Python type a cursor value for ``field`` must have"""
+    if isinstance(field, models.DateTimeField):
+        return datetime
+    if isinstance(field, (models.IntegerField, models.AutoField)):
+        return int
+    if isinstance(field, (models.CharField, models.TextField)):
+        return str
+    return (str, int, float)
+
+
+def _keyset_q(ordering, values, forward):
+    """
+    Rows strictly after ``values`` in ``ordering`` (forward) or strictly before.
+
+    For ordering (a DESC, b DESC) this is: a < va OR (a = va AND b < vb).
+    """
+    query = Q()
+    equal = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        descending = field.startswith('-')
+        lookup = 'lt' if descending == forward else 'gt'
+        query |= Q(**equal, **{f'{name}__{lookup}': value})
+        equal[name] = value
+    return query
+
+
+class CursorPage:
+    """One page of a CursorPaginator; iterable like a Django Page"""
+
+    def __init__(self, object_list, next_cursor, previous_cursor, paginator):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.paginator = paginator
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Keyset paginator over a queryset.
+
+    ``ordering`` must end in a unique field (normally ``-id``) and should be
+    backed by an index; every page is then a range scan of ``per_page + 1``
+    rows no matter how deep it is. There are no page numbers, only
+    next/previous tokens.
+    """
+
+    def __init__(self, queryset, ordering, per_page, estimate_count=None):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        if estimate_count is None:
+            estimate_count = settings.PAGINATION_ESTIMATED_COUNTS
+        self.estimate_count = estimate_count
+
+    def _key(self, obj):
+        return tuple(getattr(obj, field.lstrip('-')) for field in self.ordering)
+
+    @cached_property
+    def key_types(self):
+        opts = self.queryset.model._meta
+        return tuple(field_type(opts.get_field(field.lstrip('-'))) for field in self.ordering)
+
+    @cached_property
+    def count(self):
+        """Total rows; estimated from planner statistics when allowed (PostgreSQL, unfiltered)"""
+        if self.estimate_count:
+            return estimated_count(self.queryset)
+        return self.queryset.count()
+
+    def page(self, after=None, before=None):
+        after_key = decode_cursor(after, self.key_types)
+        before_key = decode_cursor(before, self.key_types) if not after_key else None
+        cursor = after_key or before_key
+        forward = before_key is None
+
+        queryset = self.queryset
+        if cursor:
+            queryset = queryset.filter(_keyset_q(self.ordering, cursor, forward))
+
+        ordering = self.ordering if forward else tuple(
+            field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering
+        )
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        if forward:
+            next_cursor = encode_cursor(self._key(rows[-1])) if rows and has_more else None
+            previous_cursor = encode_cursor(self._key(rows[0])) if rows and cursor else None
+        else:
+            next_cursor = encode_cursor(self._key(rows[-1])) if rows else None
+            previous_cursor = encode_cursor(self._key(rows[0])) if rows and has_more else None
+
+        return CursorPage(rows, next_cursor, previous_cursor, self)
+
+
+def estimated_count(queryset, exact_below=10000):
+    """
+    Cheap row count for an unfiltered queryset.
+
+    On PostgreSQL this reads ``pg_class.reltuples`` (kept fresh by
+    autovacuum/ANALYZE); small or never-analysed tables, filtered querysets
+    and other databases fall back to an exact COUNT(*).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        if row and row[0] >= exact_below:
+            return row[0]
+    return queryset.count()
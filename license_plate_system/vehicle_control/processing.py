@@ -0,0 +1,396 @@
+"""
+Detection pipeline shared by uploaded videos and live streams.
+
+Runs the detector over frames and records every accepted plate as a
+KnownLicensePlate or UnknownLicensePlate row. A video's CameraProfile (if
+any) decides which frames are sampled, which part of each frame is looked
+at and the detection thresholds.
+"""
+import time
+
+import cv2
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .models import RegisteredLicensePlate, KnownLicensePlate, UnknownLicensePlate, VideoDetection
+from .detection import get_detector
+from . import frame_cache
+from .buffers import frame_buffers
+from .frame_cache import CachedFrames, FrameCacheWriter, analysis_size, to_analysis
+from .governor import CPUBudget
+from .retention import delete_images
+from . import ocr_store
+from .ocr_store import OCRLog
+from .roi import FrameROI
+from .tiling import should_tile_size
+
+MIN_CONFIDENCE = 0.6
+FRAME_SKIP = 30
+
+
+class DetectionProfile:
+    """Detection settings for one video: its CameraProfile's, or the pipeline defaults"""
+
+    def __init__(self, camera_profile=None, frame_skip=FRAME_SKIP):
+        self.camera_profile = camera_profile
+        self.detector_options = {}
+        self.polygons = []
+        self.mask = True
+        self.frame_skip = frame_skip
+        self.min_confidence = MIN_CONFIDENCE
+        if camera_profile is not None:
+            self.polygons = camera_profile.roi_polygons or []
+            self.mask = camera_profile.mask_outside_roi
+            self.frame_skip = camera_profile.frame_skip
+            self.min_confidence = camera_profile.min_confidence
+            self.detector_options = {
+                'min_area': camera_profile.min_area,
+                'aspect_ratio_range': (camera_profile.aspect_ratio_min, camera_profile.aspect_ratio_max),
+                'confidence_threshold': camera_profile.ocr_confidence_threshold,
+            }
+        self.frame_skip = max(1, self.frame_skip)
+        # Frames analysed below source resolution (the frame cache's proxies) are this much smaller
+        self.scale = 1.0
+        self._roi = None
+
+    def roi(self, frame):
+        """FrameROI for this frame's size, built once and reused while the size stays the same"""
+        if self._roi is None or self._roi.frame_shape != frame.shape[:2]:
+            self._roi = FrameROI(self.polygons, frame.shape, mask=self.mask)
+        return self._roi
+
+    def tiles(self, frame):
+        """Whether detection on this frame's ROI crop is tiled"""
+        roi = self.roi(frame)
+        return should_tile_size(roi.height, roi.width)
+
+    def detect(self, detector, frame, ocr_log=None, frame_number=None):
+        """
+        detect_license_plate on the ROI crop, with the region in full-frame
+        coordinates. Raw OCR results are added to ``ocr_log`` (an OCRLog) if given.
+        """
+        roi = self.roi(frame)
+        options = self.detector_options
+        if self.scale != 1.0:
+            # Size limits are meant for source pixels; shrink them with the frame
+            min_area = options.get('min_area')
+            min_width, min_height = detector.min_plate_size
+            options = {
+                **options,
+                'min_area': (detector.min_area if min_area is None else min_area) * self.scale ** 2,
+                'min_size': (min_width * self.scale, min_height * self.scale),
+            }
+        if ocr_log is not None:
+            options = {**options, 'ocr_log': ocr_log.for_frame(frame_number, (roi.x, roi.y))}
+        plate_text, confidence, region = detector.detect_license_plate(roi.crop(frame), **options)
+        return plate_text, confidence, roi.to_frame(region)
+
+    def accepts(self, plate_text, confidence):
+        return bool(plate_text) and confidence > self.min_confidence
+
+
+def record_detection(video_detection, detector, frame, frame_number, timestamp_seconds,
+                     plate_text, confidence, region):
+    """Match a detected plate against the registry, save its crop and create the detection row"""
+    # Normalize plate number for comparison
+    normalized_plate = plate_text.replace(' ', '').upper()
+
+    # Check if plate exists in registered database
+    registered_plate = RegisteredLicensePlate.objects.filter(
+        plate_number=normalized_plate
+    ).first()
+
+    # Save detection image
+    detection_image = None
+    if region:
+        x, y, w, h = region
+        padding = 10
+        x = max(0, x - padding)
+        y = max(0, y - padding)
+        w = min(frame.shape[1] - x, w + 2 * padding)
+        h = min(frame.shape[0] - y, h + 2 * padding)
+        crop = frame[y:y+h, x:x+w]
+
+        # Save image
+        filename = f"detection_{video_detection.id}_{frame_number}_{int(confidence*100)}.jpg"
+        success, buffer = cv2.imencode('.jpg', crop)
+        if success:
+            image_bytes = buffer.tobytes()
+            image_file = ContentFile(image_bytes, name=filename)
+
+            if registered_plate:
+                detection_image = default_storage.save(f'detections/known/{filename}', image_file)
+            else:
+                detection_image = default_storage.save(f'detections/unknown/{filename}', image_file)
+
+    if registered_plate:
+        # Known plate - exists in database
+        return KnownLicensePlate.objects.create(
+            video_detection=video_detection,
+            registered_plate=registered_plate,
+            detected_plate_number=plate_text,
+            detection_image=detection_image,
+            confidence_score=confidence,
+            frame_number=frame_number,
+            timestamp_seconds=timestamp_seconds
+        )
+
+    # Unknown plate - doesn't exist in database
+    vehicle_type = detector.predict_vehicle_type(frame)
+    return UnknownLicensePlate.objects.create(
+        video_detection=video_detection,
+        detected_plate_number=plate_text,
+        detection_image=detection_image,
+        confidence_score=confidence,
+        vehicle_type=vehicle_type,
+        frame_number=frame_number,
+        timestamp_seconds=timestamp_seconds
+    )
+
+
+class _DecodedFrames:
+    """Sampled frames decoded from the video file, stored in the frame cache on the way if ``writer`` is set"""
+
+    def __init__(self, video_path, frame_skip, analysis=False):
+        self.cap = cv2.VideoCapture(video_path)
+        self.frame_skip = frame_skip
+        self.analysis = analysis
+        self.writer = None
+        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) if self.cap.get(cv2.CAP_PROP_FPS) > 0 else 30
+        self.frame_shape = (int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)))
+        self.scale = 1.0
+        if analysis and self.frame_shape[1]:
+            self.scale = analysis_size(self.frame_shape[1], self.frame_shape[0])[0] / self.frame_shape[1]
+        self.frames_read = 0
+
+    def sampled(self, start=0):
+        if start:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        self.frames_read = start
+        frame = None
+        while self.cap.grab():
+            if self.frames_read % self.frame_skip == 0:
+                # Only sampled frames are decoded, always into the same array
+                ret, frame = self.cap.retrieve(frame)
+                if not ret:
+                    break
+                yield self.frames_read, self._analysed(frame)
+            self.frames_read += 1
+
+    def _analysed(self, frame):
+        if self.writer is not None:
+            proxy = self.writer.put(self.frames_read, frame)
+            if proxy is not None:
+                return proxy
+            self.writer = None
+        if not self.analysis:
+            return frame
+        width, height = analysis_size(frame.shape[1], frame.shape[0])
+        if (height, width) == frame.shape[:2]:
+            return frame
+        return to_analysis(frame, out=frame_buffers().get('analysis', (height, width) + frame.shape[2:]))
+
+    def close(self, finished=True):
+        self.cap.release()
+        if self.writer is not None:
+            self.writer.close(finished, self.frames_read)
+
+
+def _frame_source(video_detection, video_path, profile, start):
+    """Where this pass's sampled frames come from: the frame cache if it has the video, else the file"""
+    if not settings.FRAME_CACHE_ENABLED:
+        return _DecodedFrames(video_path, profile.frame_skip)
+    cached = frame_cache.open_cached(video_detection.id, video_path, profile.frame_skip)
+    if cached is not None:
+        return cached
+    source = _DecodedFrames(video_path, profile.frame_skip, analysis=True)
+    source.writer = FrameCacheWriter.create(
+        video_detection.id, video_path, profile.frame_skip, source.fps, source.total_frames,
+        source.frame_shape, start=start
+    )
+    return source
+
+
+def _job_stats(previous, frames_processed, elapsed, budget):
+    """Stats over every slice of a job so far: counts and times add up, CPU extremes are kept"""
+    stats = budget.stats()
+    if previous.get('slices'):
+        frames_processed += previous.get('frames_processed', 0)
+        elapsed += previous.get('elapsed_seconds', 0)
+        stats['cpu_threads_min'] = min(stats['cpu_threads_min'], previous.get('cpu_threads_min', stats['cpu_threads_min']))
+        stats['peak_concurrent_jobs'] = max(stats['peak_concurrent_jobs'], previous.get('peak_concurrent_jobs', 0))
+    return {
+        'frames_processed': frames_processed,
+        'elapsed_seconds': round(elapsed, 2),
+        'frames_per_second': round(frames_processed / elapsed, 2) if elapsed > 0 else None,
+        'slices': previous.get('slices', 0) + 1,
+        **stats,
+    }
+
+
+def process_video_detection(video_detection, video_path, checkpoint=None):
+    """
+    Process video and detect license plates.
+
+    Starts at ``video_detection.resume_frame``. ``checkpoint(next_frame, frames_left)``
+    is called after every sampled frame; when it returns True processing stops
+    there (the caller requeues the job) and False is returned. Returns True
+    once the whole video is done. With OCR_RESULT_STORE on, the raw OCR results
+    are saved as well (also when stopping, so a resumed job keeps them). With
+    FRAME_CACHE_ENABLED on, frames are analysed at FRAME_CACHE_MAX_SIDE and
+    read from (or written to) the frame cache.
+    """
+    # Use lazy-loaded detector to avoid startup delays
+    detector = get_detector()
+    profile = DetectionProfile(video_detection.camera_profile)
+    frame_count = video_detection.resume_frame or 0
+    frames_processed = 0
+    # A resumed job adds to the stats of its earlier slices
+    previous_stats = video_detection.processing_stats if frame_count else {}
+
+    source = _frame_source(video_detection, video_path, profile, frame_count)
+    profile.scale = source.scale
+    total_frames = source.total_frames
+    fps = source.fps
+
+    ocr_log = OCRLog.resume(video_detection.id, frame_count) if settings.OCR_RESULT_STORE else None
+    ocr_meta = {
+        'frame_skip': profile.frame_skip,
+        'analysis_max_side': settings.FRAME_CACHE_MAX_SIDE if settings.FRAME_CACHE_ENABLED else 0,
+    }
+
+    started = time.monotonic()
+    with CPUBudget(f'video-{video_detection.id}') as budget:
+        for frame_count, frame in source.sampled(frame_count):
+            # Other jobs may have started or finished since the last frame
+            budget.use_tiles(profile.tiles(frame))
+            budget.rebalance()
+
+            # Detect license plate
+            plate_text, confidence, region = profile.detect(detector, frame, ocr_log, frame_count)
+            frames_processed += 1
+
+            if profile.accepts(plate_text, confidence):
+                timestamp_seconds = frame_count / fps if fps > 0 else 0
+                record_detection(
+                    video_detection, detector, frame, frame_count,
+                    timestamp_seconds, plate_text, confidence, region
+                )
+
+            if checkpoint is not None:
+                frames_left = -(-max(0, total_frames - frame_count - 1) // profile.frame_skip)
+                if checkpoint(frame_count + 1, frames_left):
+                    source.close(finished=False)
+                    if ocr_log is not None:
+                        ocr_log.save(video_detection.id, fps, **ocr_meta)
+                    video_detection.processing_stats = _job_stats(
+                        previous_stats, frames_processed, time.monotonic() - started, budget
+                    )
+                    VideoDetection.objects.filter(pk=video_detection.pk).update(
+                        processing_stats=video_detection.processing_stats
+                    )
+                    return False
+
+    source.close()
+    frame_count = source.frames_read
+    elapsed = time.monotonic() - started
+    if ocr_log is not None:
+        ocr_log.save(video_detection.id, fps, **ocr_meta)
+
+    # Update video detection status
+    video_detection.status = 'completed'
+    video_detection.processed_at = timezone.now()
+    video_detection.resume_frame = frame_count
+    video_detection.remaining_frames = 0
+    video_detection.processing_stats = {
+        'frames_read': frame_count,
+        'frame_source': 'cache' if isinstance(source, CachedFrames) else 'video',
+        'preemptions': video_detection.preemptions,
+        **_job_stats(previous_stats, frames_processed, elapsed, budget),
+    }
+    video_detection.save()
+    return True
+
+
+def reevaluate_video_detection(video_detection, confidence_threshold=None, min_confidence=None,
+                               dry_run=False, video_path=None):
+    """
+    Rebuild a processed video's detections from its stored raw OCR results.
+
+    Cleaning, validation and both thresholds are applied again (the video's
+    DetectionProfile values unless overridden) and registry matching and
+    persistence run as in processing: the video's Known/Unknown rows are
+    replaced, re-reading only the accepted frames from the video for their
+    crops. Returns ``{'frames': [(frame, text, confidence), ...], 'replaced': n}``;
+    ``dry_run`` only evaluates. FileNotFoundError if the video has no stored
+    results or its file is gone.
+    """
+    if video_detection.source == 'stream':
+        raise ValueError(f'Video #{video_detection.id} is a live stream session; there are no stored frames to re-evaluate')
+    detector = get_detector()
+    profile = DetectionProfile(video_detection.camera_profile)
+    if confidence_threshold is None:
+        confidence_threshold = profile.detector_options.get('confidence_threshold', detector.confidence_threshold)
+    if min_confidence is not None:
+        profile.min_confidence = min_confidence
+
+    columns = ocr_store.load(video_detection.id)
+    fps = float(columns['fps'])
+    accepted = [
+        (frame, text, confidence, region)
+        for frame, (text, confidence, region) in sorted(ocr_store.evaluate(columns, detector, confidence_threshold).items())
+        if profile.accepts(text, confidence)
+    ]
+    result = {'frames': [(frame, text, confidence) for frame, text, confidence, _ in accepted], 'replaced': 0}
+    if dry_run:
+        return result
+
+    # Crops come from the frames OCR saw: the cached proxies if there are any, else decoded again
+    video_path = video_path or video_detection.video_file.path
+    max_side = int(columns.get('meta_analysis_max_side', 0))
+    cached = frame_cache.open_cached(video_detection.id, video_path,
+                                     int(columns.get('meta_frame_skip', profile.frame_skip)), max_side)
+    cap = None
+    if cached is None:
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise FileNotFoundError(f'Cannot open {video_path}; its accepted frames are needed for the detection crops')
+
+    def read_frame(frame_number):
+        if cached is not None:
+            return cached.frame(frame_number)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+        ret, frame = cap.read()
+        return to_analysis(frame, max_side) if ret else None
+
+    known = video_detection.known_plates.all()
+    unknown = video_detection.unknown_plates.all()
+    images = list(known.values_list('detection_image', flat=True)) + list(unknown.values_list('detection_image', flat=True))
+    try:
+        with transaction.atomic():
+            # delete() rather than raw SQL: a video has few rows and the counters follow via post_delete
+            result['replaced'] = known.delete()[0] + unknown.delete()[0]
+            for frame_number, text, confidence, region in accepted:
+                frame = read_frame(frame_number)
+                if frame is None:
+                    continue
+                record_detection(video_detection, detector, frame, frame_number,
+                                 frame_number / fps if fps > 0 else 0, text, confidence, region)
+
+            video_detection.processing_stats = {
+                **video_detection.processing_stats,
+                'reevaluated_at': timezone.now().isoformat(),
+                'ocr_confidence_threshold': confidence_threshold,
+                'min_confidence': profile.min_confidence,
+                'detections': len(accepted),
+            }
+            video_detection.save(update_fields=['processing_stats'])
+            transaction.on_commit(lambda: delete_images(images))
+    finally:
+        if cap is not None:
+            cap.release()
+    return result
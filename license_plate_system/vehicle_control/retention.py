@@ -0,0 +1,146 @@
+"""
+Retention for detection rows and their images.
+
+Expired rows are removed in small primary-key-ranged batches, each in its
+own short transaction, so the hot tables never sit behind one long lock.
+Each batch can first be appended to a gzip-compressed NDJSON archive, and
+the detection images and thumbnails of the deleted rows are removed once
+the batch has committed.
+
+Rows are deleted with plain SQL rather than ``QuerySet.delete()`` (which
+would load every row to fire post_delete), so the dashboard counters are
+adjusted here in one update per day instead.
+"""
+import gzip
+import os
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.utils import timezone
+
+from . import counters
+from .models import KnownLicensePlate, UnknownLicensePlate
+from .thumbnails import delete_thumbnails
+
+# policy name -> (model, timestamp field, image field)
+RETENTION_MODELS = {
+    'known': (KnownLicensePlate, 'detected_at', 'detection_image'),
+    'unknown': (UnknownLicensePlate, 'detected_at', 'detection_image'),
+}
+
+
+def get_policy(kind):
+    """``{'days', 'archive'}`` for ``kind`` from settings; ``days`` None keeps rows forever"""
+    policy = {'days': None, 'archive': False}
+    policy.update(settings.RETENTION_POLICIES.get(kind, {}))
+    return policy
+
+
+def archive_path(kind, started):
+    return os.path.join(settings.RETENTION_ARCHIVE_DIR, f'{kind}_{started:%Y%m%d_%H%M%S}.ndjson.gz')
+
+
+def _archive_line(encoder, row):
+    # Full-precision timestamps; DjangoJSONEncoder would cut them to milliseconds
+    row = {key: value.isoformat() if isinstance(value, datetime) else value for key, value in row.items()}
+    return encoder.encode(row) + '\n'
+
+
+def delete_images(names):
+    for name in names:
+        if not name:
+            continue
+        try:
+            default_storage.delete(name)
+            delete_thumbnails(name)
+        except OSError:
+            # Already gone or unreadable; nothing else references it
+            pass
+
+
+def apply_retention(kind, days=None, archive=None, batch_size=None, pause=0.0,
+                    dry_run=False, report=None):
+    """
+    Delete (and optionally archive) rows of ``kind`` older than the policy allows.
+
+    Arguments override the configured policy. Returns
+    ``{'deleted', 'images', 'archive'}``; with ``dry_run`` only counts.
+    """
+    model, date_field, image_field = RETENTION_MODELS[kind]
+    policy = get_policy(kind)
+    days = policy['days'] if days is None else days
+    archive = policy['archive'] if archive is None else archive
+    batch_size = batch_size or settings.RETENTION_BATCH_SIZE
+    result = {'deleted': 0, 'images': 0, 'archive': None}
+    if days is None:
+        return result
+
+    cutoff = timezone.now() - timedelta(days=days)
+    expired = model.objects.filter(**{f'{date_field}__lt': cutoff})
+    if dry_run:
+        result['deleted'] = expired.count()
+        return result
+
+    columns = [field.attname for field in model._meta.concrete_fields]
+    pk_name = model._meta.pk.attname
+    counter_name, _ = counters.counter_for_model(model)
+    connection = connections[expired.db]
+    quote = connection.ops.quote_name
+    delete_sql = (
+        f'DELETE FROM {quote(model._meta.db_table)} '
+        f'WHERE {quote(model._meta.pk.column)} BETWEEN %s AND %s '
+        f'AND {quote(model._meta.get_field(date_field).column)} < %s'
+    )
+
+    archive_file = None
+    if archive:
+        os.makedirs(settings.RETENTION_ARCHIVE_DIR, exist_ok=True)
+        result['archive'] = archive_path(kind, timezone.localtime())
+        archive_file = gzip.open(result['archive'], 'at', encoding='utf-8')
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+
+    last_pk = 0
+    try:
+        while True:
+            with transaction.atomic(using=expired.db):
+                rows = list(
+                    expired.filter(pk__gt=last_pk).order_by('pk')
+                    .select_for_update().values(*columns)[:batch_size]
+                )
+                if not rows:
+                    break
+                first_pk, last_pk = rows[0][pk_name], rows[-1][pk_name]
+
+                if archive_file:
+                    # Written before the delete commits: a crash leaves a duplicate, never a loss
+                    archive_file.writelines(_archive_line(encoder, row) for row in rows)
+                    archive_file.flush()
+
+                with connection.cursor() as cursor:
+                    cursor.execute(delete_sql, [first_pk, last_pk, connection.ops.adapt_datetimefield_value(cutoff)])
+
+                per_day = {}
+                for row in rows:
+                    day = timezone.localdate(row[date_field])
+                    count, when = per_day.get(day, (0, row[date_field]))
+                    per_day[day] = (count + 1, when)
+                for count, when in per_day.values():
+                    counters.increment(counter_name, -count, when)
+
+            images = [row[image_field] for row in rows]
+            delete_images(images)
+            result['deleted'] += len(rows)
+            result['images'] += sum(1 for name in images if name)
+            if report:
+                report(f"{kind}: deleted {result['deleted']} rows (up to id {last_pk})")
+            if pause:
+                time.sleep(pause)
+    finally:
+        if archive_file:
+            archive_file.close()
+
+    return result
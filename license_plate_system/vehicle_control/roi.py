@@ -0,0 +1,76 @@
+"""
+Region-of-interest cropping for fixed cameras.
+
+A CameraProfile stores its ROI polygons as fractions of the frame size, so
+one profile works for every resolution the camera records at. For a given
+frame size they are turned once into a bounding box - each frame is then
+cropped with a numpy slice, no copy - plus, where the polygons don't fill
+that box, a mask blacking out the rest. Detection runs on the crop and its
+regions are shifted back to full-frame coordinates. Masked crops are
+written into one array kept with the ROI, so no frame allocates.
+"""
+import cv2
+import numpy as np
+
+
+def validate_polygons(polygons):
+    """Raise ValueError unless ``polygons`` is a list of >= 3-point [x, y] lists within 0-1"""
+    if not isinstance(polygons, list):
+        raise ValueError('ROI polygons must be a list of polygons')
+    for polygon in polygons:
+        if not isinstance(polygon, list) or len(polygon) < 3:
+            raise ValueError('Each ROI polygon needs at least three [x, y] points')
+        for point in polygon:
+            if (not isinstance(point, (list, tuple)) or len(point) != 2
+                    or not all(isinstance(v, (int, float)) and 0 <= v <= 1 for v in point)):
+                raise ValueError(f'Invalid ROI point {point!r}: expected [x, y] fractions between 0 and 1')
+
+
+class FrameROI:
+    """Crop box and optional mask of some ROI polygons for one frame size"""
+
+    def __init__(self, polygons, frame_shape, mask=True):
+        height, width = frame_shape[:2]
+        self.frame_shape = tuple(frame_shape[:2])
+        self.mask = None
+        self._masked = None
+
+        if not polygons:
+            self.x, self.y, self.width, self.height = 0, 0, width, height
+            return
+
+        points = [
+            np.clip(np.rint(np.asarray(polygon, dtype=np.float64) * (width, height)), 0, (width - 1, height - 1)).astype(np.int32)
+            for polygon in polygons
+        ]
+        x, y, w, h = cv2.boundingRect(np.concatenate(points))
+        self.x, self.y, self.width, self.height = x, y, w, h
+
+        if mask:
+            roi_mask = np.zeros((h, w), dtype=np.uint8)
+            cv2.fillPoly(roi_mask, [polygon - (x, y) for polygon in points], 255)
+            # A rectangle fills its own box; skip the per-frame masking then
+            if not roi_mask.all():
+                self.mask = roi_mask
+
+    @property
+    def fraction(self):
+        """Share of the frame's pixels that are processed"""
+        height, width = self.frame_shape
+        return (self.width * self.height) / float(width * height)
+
+    def crop(self, frame):
+        roi = frame[self.y:self.y + self.height, self.x:self.x + self.width]
+        if self.mask is not None:
+            if self._masked is None or self._masked.shape != roi.shape:
+                # Pixels outside the mask are never written, so they stay black
+                self._masked = np.zeros_like(roi)
+            roi = cv2.bitwise_and(roi, roi, dst=self._masked, mask=self.mask)
+        return roi
+
+    def to_frame(self, region):
+        """Map an (x, y, w, h) region of the crop back onto the full frame"""
+        if region is None:
+            return None
+        x, y, w, h = region
+        return (x + self.x, y + self.y, w, h)
@@ -0,0 +1,272 @@
+"""
+Scheduling of queued video jobs.
+
+With ``VIDEO_PROCESSING_MODE = 'queue'`` uploads are queued instead of being
+processed inside the request, and ``process_video_queue`` workers pick them
+up in this order:
+
+- higher ``priority`` first. A queued job gains one level for every
+  ``SCHEDULER_AGING_SECONDS`` it has waited, so long recordings still get
+  their turn;
+- then the least remaining work (sampled frames left, from the frame count);
+- skipping uploaders who already have ``SCHEDULER_MAX_JOBS_PER_UPLOADER``
+  jobs running, and never running more than ``SCHEDULER_MAX_CONCURRENT_JOBS``
+  on one host.
+
+A running job checkpoints every ``SCHEDULER_CHECKPOINT_INTERVAL`` seconds,
+saving the frame to resume from. At a checkpoint it yields to a queued job
+of higher priority - or, once it has run for ``SCHEDULER_TIME_SLICE``
+seconds, to a shorter job of the same priority - and goes back to the
+queue to continue where it stopped.
+
+Each checkpoint also renews the job's lease (``heartbeat_at``). A job
+whose worker has not checkpointed for ``SCHEDULER_LEASE_SECONDS`` is
+requeued by any worker on any host, so a lost machine can't hold its jobs -
+or its uploaders' slots - forever.
+
+``inline`` mode runs a job in a thread of the web process that received it,
+under the same lease, so a job cut off by a restart goes back to the queue
+instead of staying 'processing'.
+"""
+import contextlib
+import logging
+import os
+import socket
+import time
+from datetime import timedelta
+
+import cv2
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .governor import _pid_alive
+from .models import VideoDetection
+from .processing import DetectionProfile, process_video_detection
+
+try:
+    import fcntl
+except ImportError:  # Windows: the per-host limit is then best effort
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CANDIDATE_LIMIT = 200
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def enqueue(video_detection, priority=None):
+    """Estimate the job's work from its frame count and put it in the queue"""
+    if video_detection.source == 'stream':
+        raise ValueError(f'Video #{video_detection.id} is a live stream session; it has no video file to process')
+    if priority is not None:
+        video_detection.priority = priority
+    if video_detection.total_frames is None:
+        cap = cv2.VideoCapture(video_detection.video_file.path)
+        video_detection.total_frames = max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+        cap.release()
+    frame_skip = DetectionProfile(video_detection.camera_profile).frame_skip
+    frames_left = max(0, video_detection.total_frames - video_detection.resume_frame)
+    video_detection.remaining_frames = -(-frames_left // frame_skip)
+    video_detection.status = 'queued'
+    video_detection.queued_at = timezone.now()
+    video_detection.worker = ''
+    video_detection.save()
+    return video_detection
+
+
+def effective_priority(job, now=None):
+    """Priority plus one level per SCHEDULER_AGING_SECONDS spent waiting"""
+    if job.status != 'queued' or not job.queued_at or not settings.SCHEDULER_AGING_SECONDS:
+        return job.priority
+    waited = ((now or timezone.now()) - job.queued_at).total_seconds()
+    return job.priority + int(waited // settings.SCHEDULER_AGING_SECONDS)
+
+
+def _sort_key(job, now):
+    remaining = job.remaining_frames if job.remaining_frames is not None else float('inf')
+    return (-effective_priority(job, now), remaining, job.queued_at or job.upload_timestamp, job.id)
+
+
+def _running_per_uploader(exclude=None):
+    running = VideoDetection.objects.filter(status='processing')
+    if exclude is not None:
+        running = running.exclude(pk=exclude.pk)
+    return dict(running.values_list('uploaded_by').annotate(n=Count('id')))
+
+
+def next_candidate(exclude_running=None):
+    """The queued job that should run next, or None; ``exclude_running`` frees that job's slot"""
+    now = timezone.now()
+    per_uploader = _running_per_uploader(exclude=exclude_running)
+    cap = settings.SCHEDULER_MAX_JOBS_PER_UPLOADER
+    # Stream sessions never hold a file to process, whatever their status says
+    waiting = VideoDetection.objects.filter(status='queued').exclude(source='stream')
+    queued = waiting.order_by(
+        F('priority').desc(), F('remaining_frames').asc(nulls_last=True), 'queued_at'
+    )
+    # The queue is short; aging is applied in Python over the head of it plus the oldest jobs
+    oldest = waiting.order_by('queued_at')
+    candidates = {job.id: job for job in queued[:CANDIDATE_LIMIT]}
+    candidates.update((job.id, job) for job in oldest[:CANDIDATE_LIMIT])
+    for job in sorted(candidates.values(), key=lambda job: _sort_key(job, now)):
+        if cap and per_uploader.get(job.uploaded_by_id, 0) >= cap:
+            continue
+        return job
+    return None
+
+
+@contextlib.contextmanager
+def _host_lock():
+    """Serialise job claims between the workers of this host"""
+    if fcntl is None:
+        yield
+        return
+    with open(settings.SCHEDULER_LOCK_FILE, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def host_running_jobs():
+    host = socket.gethostname()
+    return VideoDetection.objects.filter(status='processing', worker__startswith=f'{host}:').count()
+
+
+def claim_next():
+    """Atomically move the next eligible job to 'processing' for this worker, or return None"""
+    with _host_lock():
+        if host_running_jobs() >= settings.SCHEDULER_MAX_CONCURRENT_JOBS:
+            return None
+        for _ in range(3):
+            job = next_candidate()
+            if job is None:
+                return None
+            # Compare-and-set: another host may have claimed it meanwhile
+            claimed = VideoDetection.objects.filter(pk=job.pk, status='queued').update(
+                status='processing', worker=worker_id(), heartbeat_at=timezone.now()
+            )
+            if claimed:
+                job.refresh_from_db()
+                return job
+    return None
+
+
+def requeue_stale():
+    """
+    Put back jobs whose worker is gone; returns how many. Jobs of dead
+    processes on this host go back at once, any other job once its lease
+    has expired.
+    """
+    host = socket.gethostname()
+    requeued = 0
+    # Rows from before inline jobs held a lease have no worker; they are not the queue's to take back
+    running = VideoDetection.objects.filter(status='processing').exclude(worker='').exclude(source='stream')
+    for job in running.filter(worker__startswith=f'{host}:'):
+        try:
+            pid = int(job.worker.rsplit(':', 1)[1])
+        except ValueError:
+            continue
+        if pid != os.getpid() and not _pid_alive(pid):
+            requeued += VideoDetection.objects.filter(pk=job.pk, worker=job.worker).update(
+                status='queued', worker='', queued_at=timezone.now(), heartbeat_at=None
+            )
+    expired = timezone.now() - timedelta(seconds=settings.SCHEDULER_LEASE_SECONDS)
+    requeued += running.filter(Q(heartbeat_at__lt=expired) | Q(heartbeat_at__isnull=True)).update(
+        status='queued', worker='', queued_at=timezone.now(), heartbeat_at=None
+    )
+    return requeued
+
+
+def should_yield(job, slice_started):
+    """The queued job this one should give way to at a checkpoint, or None"""
+    candidate = next_candidate(exclude_running=job)
+    if candidate is None:
+        return None
+    if effective_priority(candidate) > job.priority:
+        return candidate
+    ran_for = time.monotonic() - slice_started
+    if (ran_for >= settings.SCHEDULER_TIME_SLICE and effective_priority(candidate) == job.priority
+            and candidate.remaining_frames is not None and job.remaining_frames is not None
+            and candidate.remaining_frames < job.remaining_frames):
+        return candidate
+    return None
+
+
+def run_job(job, stop=None, report=print, preemptible=True):
+    """Process a claimed job with checkpoints; returns 'completed', 'preempted', 'stopped', 'lost' or 'error'"""
+    slice_started = time.monotonic()
+    last_checkpoint = slice_started
+    outcome = {}
+    # Updates that only apply while this worker still holds the job
+    held = VideoDetection.objects.filter(pk=job.pk, status='processing', worker=worker_id())
+
+    def checkpoint(next_frame, frames_left):
+        nonlocal last_checkpoint
+        stopping = stop is not None and stop.is_set()
+        now = time.monotonic()
+        if not stopping and now - last_checkpoint < settings.SCHEDULER_CHECKPOINT_INTERVAL:
+            return False
+        last_checkpoint = now
+        job.resume_frame = next_frame
+        job.remaining_frames = frames_left
+        renewed = held.update(resume_frame=next_frame, remaining_frames=frames_left, heartbeat_at=timezone.now())
+        if not renewed:
+            # The lease expired and the job went back to the queue without us
+            outcome['result'] = 'lost'
+            report(f'Video #{job.id} lost its lease at frame {next_frame}')
+            return True
+        if stopping:
+            outcome['result'] = 'stopped'
+            return True
+        successor = should_yield(job, slice_started) if preemptible else None
+        if successor is not None:
+            outcome['result'] = 'preempted'
+            report(f'Video #{job.id} yields to #{successor.id} at frame {next_frame}')
+            return True
+        return False
+
+    try:
+        if job.source == 'stream':
+            raise ValueError(f'Video #{job.id} is a live stream session; it has no video file to process')
+        finished = process_video_detection(job, job.video_file.path, checkpoint=checkpoint)
+    except Exception as e:
+        job.status = 'error'
+        job.processing_notes = str(e)
+        job.worker = ''
+        job.save()
+        return 'error'
+    finally:
+        close_old_connections()
+
+    if finished:
+        VideoDetection.objects.filter(pk=job.pk).update(worker='', heartbeat_at=None)
+        return 'completed'
+    if outcome.get('result') == 'lost':
+        return 'lost'
+
+    held.update(
+        status='queued', worker='', queued_at=timezone.now(), heartbeat_at=None,
+        preemptions=F('preemptions') + (1 if outcome.get('result') == 'preempted' else 0)
+    )
+    return outcome.get('result', 'preempted')
+
+
+def run_inline(job, report=logger.info):
+    """
+    Process an upload in this web process under a lease, as a worker would.
+    Nothing else runs the queue in ``inline`` mode, so it never yields.
+    """
+    # Jobs of web processes that died on this host, or whose lease ran out
+    requeued = requeue_stale()
+    if requeued:
+        report(f'Requeued {requeued} job(s) left by stopped processes; run process_video_queue to finish them')
+    VideoDetection.objects.filter(pk=job.pk).update(worker=worker_id(), heartbeat_at=timezone.now())
+    job.worker = worker_id()
+    return run_job(job, report=report, preemptible=False)
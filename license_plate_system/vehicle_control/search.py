@@ -0,0 +1,221 @@
+"""
+Substring search over plate numbers and owner names.
+
+Backed by trigram GIN indexes on PostgreSQL and by FTS5 trigram tables on
+SQLite (both created in migration 0006), so '%term%' lookups stay index
+driven instead of scanning whole tables. The history page and the admin
+changelists both search through ``plate_search_q``.
+
+Searches only match what they did before the index existed: plate numbers,
+plus owner names for registered plates. The Known-plates admin also
+matches the registered owner's name, as one of its own ``search_fields``.
+"""
+from django.db import connection as default_connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import RegisteredLicensePlate, KnownLicensePlate, UnknownLicensePlate
+
+# Fields each model's search covers (what the icontains fallback queries)
+SEARCH_FIELDS = {
+    RegisteredLicensePlate: ['plate_number', 'owner_name'],
+    KnownLicensePlate: ['detected_plate_number', 'registered_plate__plate_number'],
+    UnknownLicensePlate: ['detected_plate_number'],
+}
+
+FTS_TABLES = {
+    RegisteredLicensePlate: 'vehicle_control_registered_search',
+    KnownLicensePlate: 'vehicle_control_known_search',
+    UnknownLicensePlate: 'vehicle_control_unknown_search',
+}
+
+# The trigram tokenizer can only answer terms of at least three characters
+MIN_FTS_TERM_LENGTH = 3
+
+# PostgreSQL: trigram GIN indexes on the UPPER() expression Django's
+# icontains lookup generates, so '%term%' searches use the index.
+POSTGRES_INDEXES = [
+    ('registered_plate_number_trgm', 'vehicle_control_registeredlicenseplate', 'plate_number'),
+    ('registered_owner_name_trgm', 'vehicle_control_registeredlicenseplate', 'owner_name'),
+    ('known_detected_plate_trgm', 'vehicle_control_knownlicenseplate', 'detected_plate_number'),
+    ('unknown_detected_plate_trgm', 'vehicle_control_unknownlicenseplate', 'detected_plate_number'),
+]
+
+# SQLite: one FTS5 trigram table per model (rowid = object id), kept in step
+# with the base tables by triggers so bulk inserts and deletes stay indexed.
+REGISTERED_BODY = "{row}.plate_number || ' | ' || {row}.owner_name"
+KNOWN_BODY = (
+    "{row}.detected_plate_number || ' | ' || COALESCE(("
+    "SELECT r.plate_number FROM vehicle_control_registeredlicenseplate r WHERE r.id = {row}.registered_plate_id), '')"
+)
+UNKNOWN_BODY = "{row}.detected_plate_number"
+
+SQLITE_SOURCES = [
+    ('vehicle_control_registered_search', 'vehicle_control_registeredlicenseplate', REGISTERED_BODY),
+    ('vehicle_control_known_search', 'vehicle_control_knownlicenseplate', KNOWN_BODY),
+    ('vehicle_control_unknown_search', 'vehicle_control_unknownlicenseplate', UNKNOWN_BODY),
+]
+KNOWN_REGISTERED_TRIGGER = 'vehicle_control_known_search_registered_au'
+
+_fts_available = {}
+
+
+def _sqlite_triggers():
+    triggers = {}
+    for search_table, table, body in SQLITE_SOURCES:
+        triggers[f'{search_table}_ai'] = (
+            f"CREATE TRIGGER IF NOT EXISTS {search_table}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {search_table}(rowid, body) VALUES (NEW.id, {body.format(row='NEW')}); END"
+        )
+        triggers[f'{search_table}_ad'] = (
+            f"CREATE TRIGGER IF NOT EXISTS {search_table}_ad AFTER DELETE ON {table} BEGIN "
+            f"DELETE FROM {search_table} WHERE rowid = OLD.id; END"
+        )
+        triggers[f'{search_table}_au'] = (
+            f"CREATE TRIGGER IF NOT EXISTS {search_table}_au AFTER UPDATE ON {table} BEGIN "
+            f"DELETE FROM {search_table} WHERE rowid = OLD.id; "
+            f"INSERT INTO {search_table}(rowid, body) VALUES (NEW.id, {body.format(row='NEW')}); END"
+        )
+
+    # Known detections embed the registered plate number
+    triggers[KNOWN_REGISTERED_TRIGGER] = (
+        f"CREATE TRIGGER IF NOT EXISTS {KNOWN_REGISTERED_TRIGGER} "
+        "AFTER UPDATE OF plate_number ON vehicle_control_registeredlicenseplate BEGIN "
+        "DELETE FROM vehicle_control_known_search WHERE rowid IN ("
+        "SELECT id FROM vehicle_control_knownlicenseplate WHERE registered_plate_id = NEW.id); "
+        f"INSERT INTO vehicle_control_known_search(rowid, body) SELECT k.id, {KNOWN_BODY.format(row='k')} "
+        "FROM vehicle_control_knownlicenseplate k WHERE k.registered_plate_id = NEW.id; END"
+    )
+    return triggers
+
+
+def _sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def install_search_index(connection=default_connection):
+    """
+    Create the search index for this database if it is missing.
+
+    Safe to call repeatedly. On SQLite, Django rebuilds tables for some
+    ALTERs and drops their triggers with them, so this also runs after every
+    migrate and re-fills the FTS tables whenever a trigger had gone missing.
+    """
+    _fts_available.clear()
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            for name, table, column in POSTGRES_INDEXES:
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin (UPPER("{column}") gin_trgm_ops)'
+                )
+        return
+
+    if connection.vendor != 'sqlite' or not _sqlite_has_fts5(connection):
+        return
+
+    triggers = _sqlite_triggers()
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        existing = {row[0] for row in cursor.fetchall()}
+        if all(name in existing for name in triggers):
+            return
+
+        for search_table, table, body in SQLITE_SOURCES:
+            cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {search_table} USING fts5(body, tokenize='trigram')")
+            cursor.execute(f'DELETE FROM {search_table}')
+            cursor.execute(
+                f"INSERT INTO {search_table}(rowid, body) SELECT t.id, {body.format(row='t')} FROM {table} t"
+            )
+        for statement in triggers.values():
+            cursor.execute(statement)
+
+
+def uninstall_search_index(connection=default_connection):
+    _fts_available.clear()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for name, table, column in POSTGRES_INDEXES:
+                cursor.execute(f'DROP INDEX IF EXISTS {name}')
+        elif connection.vendor == 'sqlite':
+            for name in _sqlite_triggers():
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            for search_table, table, body in SQLITE_SOURCES:
+                cursor.execute(f'DROP TABLE IF EXISTS {search_table}')
+
+
+def fts_available(connection=default_connection):
+    """True when the SQLite FTS5 search tables exist on this connection"""
+    if connection.vendor != 'sqlite':
+        return False
+    key = connection.settings_dict['NAME']
+    if key not in _fts_available:
+        tables = set(connection.introspection.table_names(include_views=False))
+        _fts_available[key] = all(table in tables for table in FTS_TABLES.values())
+    return _fts_available[key]
+
+
+def _icontains_q(fields, term):
+    query = Q()
+    for field in fields:
+        query |= Q(**{f'{field}__icontains': term})
+    return query
+
+
+def _indexed_icontains_q(model, fields, term, connection=default_connection):
+    """
+    icontains over ``fields``. On PostgreSQL an OR spanning a join can use
+    neither table's trigram index, so each joined field becomes its own
+    subquery and the matches are combined with UNION.
+    """
+    local = [field for field in fields if '__' not in field]
+    joined = [field for field in fields if '__' in field]
+    if connection.vendor != 'postgresql' or not joined:
+        return _icontains_q(fields, term)
+
+    parts = [model.objects.filter(_icontains_q([field], term)).order_by().values('pk') for field in joined]
+    if local:
+        parts.insert(0, model.objects.filter(_icontains_q(local, term)).order_by().values('pk'))
+    return Q(pk__in=parts[0].union(*parts[1:]))
+
+
+def plate_search_q(model, term, extra_fields=()):
+    """
+    Q object matching rows of ``model`` whose plate/owner text contains
+    ``term``; ``extra_fields`` are matched too, with a plain icontains.
+    """
+    term = term.strip()
+    extra_fields = [field for field in extra_fields if field not in SEARCH_FIELDS[model]]
+    if fts_available() and len(term) >= MIN_FTS_TERM_LENGTH:
+        table = FTS_TABLES[model]
+        phrase = '"' + term.replace('"', '""') + '"'
+        query = Q(pk__in=RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [phrase]))
+        if extra_fields:
+            query |= _icontains_q(extra_fields, term)
+        return query
+    # PostgreSQL serves these from the trigram indexes
+    return _indexed_icontains_q(model, SEARCH_FIELDS[model] + extra_fields, term)
+
+
+def search(queryset, term):
+    """Filter ``queryset`` to rows matching ``term``"""
+    return queryset.filter(plate_search_q(queryset.model, term))
+
+
+class PlateSearchAdminMixin:
+    """
+    ModelAdmin mixin routing changelist search through the search index.
+
+    Fields in SEARCH_FIELDS go through the index; any other ``search_fields``
+    are still matched with a plain icontains.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+
+        query = plate_search_q(queryset.model, search_term, self.get_search_fields(request))
+        return queryset.filter(query), False
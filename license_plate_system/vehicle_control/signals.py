@@ -0,0 +1,116 @@
+from django.db import connections, transaction
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from . import counters, gate, live_feed
+from .models import RegisteredLicensePlate, VideoDetection, KnownLicensePlate, UnknownLicensePlate
+from .search import install_search_index
+from .thumbnails import delete_thumbnails, generate_thumbnails
+
+
+@receiver(pre_save, sender=RegisteredLicensePlate)
+def remember_plate_image(sender, instance, raw=False, **kwargs):
+    """Note the stored image name, so post_save can tell whether the image changed"""
+    instance._previous_plate_image = None
+    if instance.pk and not raw:
+        instance._previous_plate_image = sender.objects.filter(pk=instance.pk).values_list(
+            'plate_image', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=RegisteredLicensePlate)
+def create_plate_thumbnails(sender, instance, raw=False, **kwargs):
+    """Pre-render thumbnails so listings never embed the full-size upload; only when the image changed"""
+    if raw:
+        return
+    previous = getattr(instance, '_previous_plate_image', None) or ''
+    current = instance.plate_image.name if instance.plate_image else ''
+    if previous == current:
+        return
+    if previous:
+        delete_thumbnails(previous)
+    if current:
+        try:
+            generate_thumbnails(current, force=True)
+        except (OSError, ValueError):
+            # Missing, corrupt or oversized image: thumbnail_url falls back to the original
+            pass
+
+
+@receiver(post_save, sender=KnownLicensePlate)
+@receiver(post_save, sender=UnknownLicensePlate)
+def create_detection_thumbnails(sender, instance, created, **kwargs):
+    if created and instance.detection_image:
+        try:
+            generate_thumbnails(instance.detection_image.name)
+        except (OSError, ValueError):
+            pass
+
+
+@receiver(post_save, sender=KnownLicensePlate)
+@receiver(post_save, sender=UnknownLicensePlate)
+def publish_live_detection(sender, instance, created, raw=False, **kwargs):
+    """Push new detections to open dashboards once the row is committed"""
+    if created and not raw:
+        kind = 'known' if sender is KnownLicensePlate else 'unknown'
+        transaction.on_commit(lambda: live_feed.publish_detection(kind, instance))
+
+
+@receiver(post_save, sender=RegisteredLicensePlate)
+@receiver(post_save, sender=VideoDetection)
+@receiver(post_save, sender=KnownLicensePlate)
+@receiver(post_save, sender=UnknownLicensePlate)
+def count_created(sender, instance, created, raw=False, **kwargs):
+    """Keep dashboard counters in step with inserts"""
+    if created and not raw:
+        name, field = counters.counter_for_model(sender)
+        counters.increment(name, 1, getattr(instance, field))
+
+
+@receiver(post_delete, sender=RegisteredLicensePlate)
+@receiver(post_delete, sender=VideoDetection)
+@receiver(post_delete, sender=KnownLicensePlate)
+@receiver(post_delete, sender=UnknownLicensePlate)
+def count_deleted(sender, instance, **kwargs):
+    name, field = counters.counter_for_model(sender)
+    counters.increment(name, -1, getattr(instance, field))
+
+
+@receiver(post_delete, sender=VideoDetection)
+def delete_ocr_results(sender, instance, **kwargs):
+    # Imported here: ocr_store needs numpy, which the web process shouldn't load at start-up
+    from . import ocr_store
+    video_id = instance.id
+    transaction.on_commit(lambda: ocr_store.delete(video_id))
+
+
+@receiver(post_delete, sender=VideoDetection)
+def delete_cached_frames(sender, instance, **kwargs):
+    # Imported here: frame_cache needs cv2 and numpy, which the web process shouldn't load at start-up
+    from . import frame_cache
+    video_id = instance.id
+    transaction.on_commit(lambda: frame_cache.delete_video(video_id))
+
+
+@receiver(post_save, sender=RegisteredLicensePlate)
+def update_gate_allow_list(sender, instance, raw=False, **kwargs):
+    """Keep this process's gate allow-list current without waiting for the refresher"""
+    if not raw:
+        transaction.on_commit(lambda: gate.plate_saved(instance))
+
+
+@receiver(post_delete, sender=RegisteredLicensePlate)
+def remove_from_gate_allow_list(sender, instance, **kwargs):
+    plate_id = instance.id
+    transaction.on_commit(lambda: gate.plate_deleted(plate_id))
+
+
+def ensure_search_index(sender, using, plan=None, **kwargs):
+    """Restore search triggers that a table rebuild during migrate may have dropped"""
+    if plan is not None and not plan:
+        return
+    connection = connections[using]
+    applied = MigrationRecorder(connection).applied_migrations()
+    if ('vehicle_control', '0006_plate_search_index') in applied:
+        install_search_index(connection)
@@ -0,0 +1,253 @@
+"""
+Live camera / RTSP stream ingestion.
+
+A capture thread reads frames as fast as the source delivers them into a
+small ring buffer; the detection loop always works on the freshest frames
+and stale ones are dropped instead of queueing up behind a slow OCR pass.
+Frame arrays the detection loop is done with (or that were dropped) are
+handed back to the capture thread and decoded into again.
+"""
+import collections
+import os
+import threading
+import time
+
+import cv2
+from django.db import close_old_connections
+
+from .detection import get_detector
+from .governor import CPUBudget
+from .processing import DetectionProfile, record_detection
+
+STREAM_FRAME_SKIP = 5
+
+
+class FrameRingBuffer:
+    """Fixed-size buffer of (frame_number, captured_at, frame); overwrites the oldest when full"""
+
+    def __init__(self, size):
+        self._frames = collections.deque(maxlen=size)
+        self._spares = collections.deque(maxlen=size + 2)
+        self._condition = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        with self._condition:
+            if len(self._frames) == self._frames.maxlen:
+                self.dropped += 1
+                self._spares.append(self._frames[0][2])
+            self._frames.append(item)
+            self._condition.notify()
+
+    def __len__(self):
+        with self._condition:
+            return len(self._frames)
+
+    def recycle(self, frame):
+        """Give back a frame array nothing references any more"""
+        with self._condition:
+            self._spares.append(frame)
+
+    def spare(self):
+        """A recycled frame array to decode into, or None"""
+        with self._condition:
+            return self._spares.pop() if self._spares else None
+
+    def get(self, timeout=None):
+        """
+        Pop the newest buffered frame, or None if nothing arrives within
+        ``timeout``. Older frames still waiting are stale by then: they are
+        dropped and their arrays recycled.
+        """
+        with self._condition:
+            if not self._frames:
+                self._condition.wait(timeout)
+            if not self._frames:
+                return None
+            item = self._frames.pop()
+            while self._frames:
+                self.dropped += 1
+                self._spares.append(self._frames.popleft()[2])
+            return item
+
+
+class LatencyStats:
+    """Capture-to-DB-row latency samples for periodic reporting"""
+
+    def __init__(self, max_samples=1000):
+        self.samples = collections.deque(maxlen=max_samples)
+        self.count = 0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def summary(self):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+
+        def percentile(p):
+            return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+        return {
+            'count': self.count,
+            'p50_ms': percentile(0.50) * 1000,
+            'p95_ms': percentile(0.95) * 1000,
+            'max_ms': ordered[-1] * 1000,
+        }
+
+
+def is_file_source(source):
+    """A local video file, which ends, as opposed to a camera or stream"""
+    return not str(source).isdigit() and os.path.isfile(source)
+
+
+def open_capture(source):
+    """Open a device index ("0") or any URL/path OpenCV understands"""
+    if str(source).isdigit():
+        return cv2.VideoCapture(int(source))
+    return cv2.VideoCapture(source)
+
+
+class StreamIngestor:
+    """Reads a stream into a ring buffer and records detections continuously"""
+
+    def __init__(self, source, video_detection, buffer_size=8, frame_skip=None, loop=False,
+                 reconnect_delay=2.0, max_reconnect_delay=30.0, dedupe_seconds=10.0,
+                 stats_interval=30.0, report=print):
+        self.source = source
+        self.video_detection = video_detection
+        self.buffer = FrameRingBuffer(buffer_size)
+        # The session's camera profile sets the ROI and thresholds; an explicit frame_skip wins
+        self.profile = DetectionProfile(video_detection.camera_profile, frame_skip=STREAM_FRAME_SKIP)
+        if frame_skip is not None:
+            self.profile.frame_skip = max(1, frame_skip)
+        self.frame_skip = self.profile.frame_skip
+        self.loop = loop
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.dedupe_seconds = dedupe_seconds
+        self.stats_interval = stats_interval
+        self.report = report
+
+        self.latency = LatencyStats()
+        self.reconnects = 0
+        self.frames_read = 0
+        self._last_seen = {}
+        self._stop = threading.Event()
+        self._source_ended = threading.Event()
+        self.budget = CPUBudget(f'stream-{video_detection.id}')
+
+    def stop(self):
+        self._stop.set()
+
+    # ---------- capture thread ----------
+
+    def _capture_loop(self):
+        delay = self.reconnect_delay
+        frame_number = 0
+
+        while not self._stop.is_set():
+            cap = open_capture(self.source)
+            if not cap.isOpened():
+                cap.release()
+                self.report(f'Cannot open {self.source}, retrying in {delay:.0f}s')
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+                continue
+
+            delay = self.reconnect_delay
+            # A file plays back at its own frame rate to behave like a camera
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            pace = 1.0 / fps if (self.loop or is_file_source(self.source)) and fps > 0 else 0
+
+            while not self._stop.is_set():
+                started = time.monotonic()
+                if not cap.grab():
+                    if self.loop and cap.set(cv2.CAP_PROP_POS_FRAMES, 0):
+                        continue
+                    break
+
+                self.frames_read += 1
+                if frame_number % self.frame_skip == 0:
+                    # Skipped frames are never decoded
+                    ret, frame = cap.retrieve(self.buffer.spare())
+                    if ret:
+                        self.buffer.put((frame_number, time.monotonic(), frame))
+                frame_number += 1
+
+                if pace:
+                    self._stop.wait(max(0.0, pace - (time.monotonic() - started)))
+
+            cap.release()
+            if not self.loop and is_file_source(self.source):
+                # A file has nothing more to give; only live sources reconnect
+                self.report(f'Reached the end of {self.source}')
+                self._source_ended.set()
+                return
+            if not self._stop.is_set():
+                self.reconnects += 1
+                self.report(f'Stream {self.source} ended, reconnecting (#{self.reconnects})')
+                self._stop.wait(delay)
+
+    # ---------- detection loop ----------
+
+    def _is_duplicate(self, plate_text, now):
+        last = self._last_seen.get(plate_text)
+        self._last_seen[plate_text] = now
+        return last is not None and now - last < self.dedupe_seconds
+
+    def _report_stats(self):
+        summary = self.latency.summary()
+        line = (f'frames read={self.frames_read} dropped={self.buffer.dropped} '
+                f'reconnects={self.reconnects} cpu threads={self.budget.threads}/{self.budget.cores} '
+                f'jobs={self.budget.concurrent_jobs}')
+        if summary:
+            line += (f" detections={summary['count']} latency p50={summary['p50_ms']:.0f}ms "
+                     f"p95={summary['p95_ms']:.0f}ms max={summary['max_ms']:.0f}ms")
+        self.report(line)
+
+    def run(self):
+        """Block until ``stop()`` is called (or KeyboardInterrupt), or a file source has been read to the end"""
+        detector = get_detector()
+        capture_thread = threading.Thread(target=self._capture_loop, name='stream-capture', daemon=True)
+        capture_thread.start()
+        started = time.monotonic()
+        last_report = started
+
+        with self.budget:
+            try:
+                while not self._stop.is_set():
+                    item = self.buffer.get(timeout=1.0)
+                    now = time.monotonic()
+                    if now - last_report >= self.stats_interval:
+                        self._report_stats()
+                        last_report = now
+                    if item is None:
+                        if self._source_ended.is_set() and not len(self.buffer):
+                            break
+                        continue
+
+                    frame_number, captured_at, frame = item
+                    try:
+                        self.budget.use_tiles(self.profile.tiles(frame))
+                        self.budget.rebalance()
+                        plate_text, confidence, region = self.profile.detect(detector, frame)
+                        if not self.profile.accepts(plate_text, confidence):
+                            continue
+                        if self._is_duplicate(plate_text, captured_at):
+                            continue
+
+                        close_old_connections()
+                        record_detection(
+                            self.video_detection, detector, frame, frame_number,
+                            captured_at - started, plate_text, confidence, region
+                        )
+                        self.latency.add(time.monotonic() - captured_at)
+                    finally:
+                        self.buffer.recycle(frame)
+            finally:
+                self._stop.set()
+                capture_thread.join(timeout=5)
+                self._report_stats()
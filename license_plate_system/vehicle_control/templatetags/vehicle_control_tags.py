@@ -1,26 +1,24 @@
 from django import template
-from ..models import (
-    RegisteredLicensePlate, VideoDetection,
-    KnownLicensePlate, UnknownLicensePlate
-)
+from ..counters import get_statistics
+from ..thumbnails import thumbnail_url as _thumbnail_url
 
 register = template.Library()
 
 @register.simple_tag
 def get_registered_plates_count():
-    return RegisteredLicensePlate.objects.count()
+    return get_statistics()['total_registered_plates']
 
 @register.simple_tag
 def get_videos_count():
-    return VideoDetection.objects.count()
+    return get_statistics()['total_videos']
 
 @register.simple_tag
 def get_known_detections_count():
-    return KnownLicensePlate.objects.count()
+    return get_statistics()['total_known_detections']
 
 @register.simple_tag
 def get_unknown_detections_count():
-    return UnknownLicensePlate.objects.count()
+    return get_statistics()['total_unknown_detections']
 
 @register.filter
 def mul(value, arg):
@@ -30,3 +28,7 @@ def mul(value, arg):
     except (ValueError, TypeError):
         return 0
 
+@register.filter
+def thumbnail_url(image, size='small'):
+    """URL of a cached thumbnail: {{ plate.plate_image|thumbnail_url:"medium" }}"""
+    return _thumbnail_url(image, size)
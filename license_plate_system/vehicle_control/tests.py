@@ -0,0 +1,498 @@
+import base64
+import gc
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import tracemalloc
+from statistics import median
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase
+
+
+class WebStartupImportTests(SimpleTestCase):
+    """Web processes must not pay for the vision stack until a request needs it"""
+
+    HEAVY_MODULES = ['cv2', 'numpy', 'PIL.Image']
+
+    def test_wsgi_startup_does_not_import_vision_libraries(self):
+        code = (
+            'import sys\n'
+            'import license_plate_system.wsgi\n'
+            'from django.urls import get_resolver, reverse\n'
+            'get_resolver().url_patterns\n'
+            "reverse('vehicle_control:detect_image')\n"
+            "reverse('vehicle_control:gate_decision')\n"
+            "reverse('vehicle_control:export_plates', args=['unknown'])\n"
+            f'print(",".join(name for name in {self.HEAVY_MODULES!r} if name in sys.modules))\n'
+        )
+        # A fresh interpreter: this test process has loaded them already
+        result = subprocess.run(
+            [sys.executable, '-c', code],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'license_plate_system.settings'},
+            capture_output=True,
+            text=True,
+            timeout=120,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), '', 'loaded at startup: ' + result.stdout.strip())
+
+
+class _StubReader:
+    """Stands in for EasyOCR: finds nothing, instantly"""
+
+    def readtext(self, image):
+        return []
+
+
+class DetectionLoopMemoryTests(SimpleTestCase):
+    """Over a long clip the per-frame loop reuses its arrays instead of allocating new ones"""
+
+    FRAMES = 100
+    SIZE = (960, 540)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        import cv2
+        import numpy as np
+
+        cls.directory = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.directory, 'clip.avi')
+        width, height = cls.SIZE
+        writer = cv2.VideoWriter(cls.path, cv2.VideoWriter_fourcc(*'MJPG'), 25, cls.SIZE)
+        rng = np.random.default_rng(0)
+        for i in range(cls.FRAMES):
+            frame = rng.integers(0, 60, (height, width, 3), dtype=np.uint8)
+            # A plate-shaped box drifting across the frame, so the crop path runs too
+            x = 40 + i * 6
+            cv2.rectangle(frame, (x, 300), (x + 180, 345), (255, 255, 255), -1)
+            cv2.putText(frame, 'AB 1234', (x + 10, 335), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 2)
+            writer.write(frame)
+        writer.release()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def _detector(self):
+        from .detection import AdvancedLicensePlateDetector
+
+        class StubDetector(AdvancedLicensePlateDetector):
+            def load_reader(self):
+                return _StubReader()
+
+            def load_vehicle_model(self):
+                return None
+
+        return StubDetector()
+
+    def _run(self):
+        """Traced memory after each frame, the extra peak while detecting it, and GC runs"""
+        from .processing import DetectionProfile, _DecodedFrames
+
+        detector = self._detector()
+        profile = DetectionProfile(frame_skip=1)
+        source = _DecodedFrames(self.path, 1)
+        collections = []
+        callback = lambda phase, info: phase == 'start' and collections.append(info['generation'])
+        # Start both runs from empty generations, so only their own allocations trigger collections
+        gc.collect()
+        gc.callbacks.append(callback)
+        tracemalloc.start()
+        try:
+            after, peaks = [], []
+            for _, frame in source.sampled():
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                profile.detect(detector, frame)
+                current, peak = tracemalloc.get_traced_memory()
+                after.append(current)
+                peaks.append(peak - before)
+        finally:
+            tracemalloc.stop()
+            gc.callbacks.remove(callback)
+            source.close()
+        self.assertEqual(len(after), self.FRAMES)
+        return after, peaks, len(collections)
+
+    def test_memory_stays_flat_over_a_long_clip(self):
+        after, _, _ = self._run()
+        # Past the first frames (buffers sized, caches warm) nothing accumulates
+        self.assertLess(after[-1] - after[10], 256 * 1024)
+
+    def test_buffers_cut_per_frame_allocations_and_gc(self):
+        from . import detection
+        from .buffers import BufferPool
+
+        _, pooled_peaks, pooled_collections = self._run()
+        # A fresh pool per call: every step allocates its arrays again, as before buffers existed
+        with mock.patch.object(detection, 'frame_buffers', lambda: BufferPool()):
+            _, fresh_peaks, fresh_collections = self._run()
+
+        frame_bytes = self.SIZE[0] * self.SIZE[1]
+        self.assertLess(median(pooled_peaks), median(fresh_peaks) / 2)
+        self.assertLess(median(pooled_peaks), frame_bytes)
+        self.assertLessEqual(pooled_collections, fresh_collections)
+
+    def test_eviction_releases_buffers(self):
+        from .buffers import frame_buffers
+        from .components import LazyComponent
+
+        self._run()
+        self.assertGreater(frame_buffers().nbytes, 0)
+        component = LazyComponent('stub', lambda: object())
+        component.get()
+        component.evict()
+        self.assertEqual(frame_buffers().nbytes, 0)
+
+
+class TiledBudgetTests(SimpleTestCase):
+    """Tiling splits a job's CPU share between tile workers and library threads, never multiplies it"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.library_threads = []
+        patcher = mock.patch('vehicle_control.governor.set_library_threads', self.library_threads.append)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _budget(self, name):
+        from .governor import CPUBudget
+        return CPUBudget(name)
+
+    def test_workers_times_library_threads_within_share(self):
+        from . import governor
+
+        for configured in (0, 1, 3, 5, 8, 16):
+            with self.subTest(DETECTION_TILE_WORKERS=configured), self.settings(
+                CPU_GOVERNOR_ENABLED=True, CPU_GOVERNOR_DIR=self.directory, CPU_GOVERNOR_CORES=8,
+                DETECTION_TILE_WORKERS=configured,
+            ):
+                with self._budget('tiled') as budget:
+                    budget.use_tiles(True)
+                    share = governor.process_threads()
+                    self.assertEqual(share, 8)
+                    self.assertGreaterEqual(governor.tile_workers(), 1)
+                    self.assertLessEqual(governor.tile_workers() * self.library_threads[-1], share)
+                self.assertEqual(governor.tile_workers(), 1)
+
+    def test_split_follows_the_share_as_jobs_start(self):
+        from . import governor
+
+        with self.settings(CPU_GOVERNOR_ENABLED=True, CPU_GOVERNOR_DIR=self.directory, CPU_GOVERNOR_CORES=8,
+                           DETECTION_TILE_WORKERS=0):
+            # Another process's job halves this one's share
+            open(os.path.join(self.directory, f'{os.getppid()}-other.job'), 'w').close()
+            with self._budget('tiled') as budget:
+                budget.use_tiles(True)
+                self.assertEqual(governor.process_threads(), 4)
+                self.assertLessEqual(governor.tile_workers() * self.library_threads[-1], 4)
+                # Decided once per job: a later frame cannot turn tiling off
+                budget.use_tiles(False)
+                self.assertTrue(budget.tiled)
+
+    def test_untiled_jobs_keep_single_tile_and_full_share(self):
+        from . import governor
+
+        with self.settings(CPU_GOVERNOR_ENABLED=True, CPU_GOVERNOR_DIR=self.directory, CPU_GOVERNOR_CORES=8):
+            with self._budget('plain') as budget:
+                budget.use_tiles(False)
+                self.assertEqual(governor.tile_workers(), 1)
+                self.assertEqual(self.library_threads[-1], 8)
+
+    def test_tiled_detection_uses_the_budget_split(self):
+        import numpy as np
+
+        from . import detection
+
+        detector = DetectionLoopMemoryTests._detector(self)
+        with mock.patch.object(detection, 'tile_workers', return_value=3), \
+                mock.patch.object(detection, 'map_tiles', return_value=[]) as map_tiles:
+            detector.detect_license_plates_tiled(np.zeros((2600, 2600, 3), dtype=np.uint8))
+        self.assertEqual(map_tiles.call_args.args[2], 3)
+
+
+class _CountingReader:
+    """Deterministic OCR stand-in that counts calls; the text depends only on the image"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def _read(self, image):
+        height, width = image.shape[:2]
+        confidence = 0.6 + (int(image.sum()) % 37) / 100
+        return [([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], 'AB 1234', confidence)]
+
+    def readtext(self, image):
+        self.calls += 1
+        return self._read(image)
+
+    def readtext_batched(self, images, batch_size=1):
+        self.calls += 1
+        return [self._read(image) for image in images]
+
+
+class BatchedDetectionTests(SimpleTestCase):
+    """The detection API's batches share OCR calls and give the same answers as one image at a time"""
+
+    def _detector(self):
+        from .detection import AdvancedLicensePlateDetector
+
+        reader = _CountingReader()
+
+        class StubDetector(AdvancedLicensePlateDetector):
+            def load_reader(self):
+                return reader
+
+            def load_vehicle_model(self):
+                return None
+
+        return StubDetector(), reader
+
+    def _images(self):
+        import cv2
+        import numpy as np
+
+        images = []
+        for i in range(6):
+            image = np.full((480, 640, 3), 30 + i, dtype=np.uint8)
+            cv2.rectangle(image, (60 + 20 * i, 200), (260 + 20 * i, 250), (255, 255, 255), -1)
+            cv2.rectangle(image, (350, 80 + 10 * i), (560, 130 + 10 * i), (200, 200, 200), -1)
+            images.append(image)
+        return images
+
+    def test_batch_matches_single_images_with_fewer_ocr_calls(self):
+        detector, reader = self._detector()
+        images = self._images()
+        single = [detector.detect_license_plate(image) for image in images]
+        single_calls = reader.calls
+        reader.calls = 0
+        batched = detector.detect_license_plates(images)
+        self.assertEqual(batched, single)
+        self.assertTrue(all(text for text, _, _ in batched))
+        self.assertLess(reader.calls, single_calls / 3)
+
+    def test_requests_that_would_time_out_are_refused_up_front(self):
+        from .batching import BatcherOverloaded, MicroBatcher
+
+        release = threading.Event()
+
+        def handler(items):
+            release.wait(1)
+            return items
+
+        batcher = MicroBatcher(handler, window=0, max_batch_size=1, max_queue_size=100, max_wait=0.5)
+        batcher._item_seconds.append(0.2)
+        futures = []
+        with self.assertRaises(BatcherOverloaded):
+            for i in range(100):
+                futures.append(batcher.submit(i))
+        # Two waiting behind the running one are within 0.5 s; the queue itself is far from full
+        self.assertLess(len(futures), 5)
+        release.set()
+        self.assertEqual([future.result(timeout=5) for future in futures], list(range(len(futures))))
+
+
+def _token(payload):
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+class CursorValidationTests(TestCase):
+    """Client-supplied cursors that don't decode to the sort key give the first page, not a 500"""
+
+    BAD_CURSORS = {
+        'bad base64': '!!!not-base64!!!',
+        'bad json': _token('{"dt": '),
+        'not a list': _token('{"dt": "2024-01-01T00:00:00+00:00"}'),
+        'too short': _token('[{"dt": "2024-01-01T00:00:00+00:00"}]'),
+        'wrong types': _token('["yesterday", "7"]'),
+        'bad datetime': _token('[{"dt": "not a date"}, 7]'),
+        'naive datetime': _token('[{"dt": "2024-01-01T00:00:00"}, 7]'),
+        'bool id': _token('[{"dt": "2024-01-01T00:00:00+00:00"}, true]'),
+        'nested': _token('[{"dt": "2024-01-01T00:00:00+00:00"}, [7]]'),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth.models import User
+
+        cls.staff = User.objects.create_user('staff', password='pw', is_staff=True)
+
+    def test_decode_cursor_checks_types(self):
+        from datetime import datetime, timezone as dt_timezone
+
+        from .pagination import decode_cursor, encode_cursor
+
+        key = (datetime(2024, 1, 1, tzinfo=dt_timezone.utc), 7)
+        self.assertEqual(decode_cursor(encode_cursor(key), (datetime, int)), key)
+        for name, token in self.BAD_CURSORS.items():
+            with self.subTest(name):
+                self.assertIsNone(decode_cursor(token, (datetime, int)))
+
+    def test_listings_ignore_bad_cursors(self):
+        from django.urls import reverse
+
+        self.client.force_login(self.staff)
+        pages = [
+            (reverse('vehicle_control:admin_video_list'), ['after', 'before']),
+            (reverse('vehicle_control:admin_plate_history'),
+             ['registered_after', 'registered_before', 'known_after', 'unknown_before']),
+        ]
+        for url, params in pages:
+            for param in params:
+                for name, token in self.BAD_CURSORS.items():
+                    with self.subTest(url=url, param=param, cursor=name):
+                        self.assertEqual(self.client.get(url, {param: token}).status_code, 200)
+
+    def test_timeline_ignores_bad_cursors(self):
+        from django.urls import reverse
+
+        from .timeline import get_timeline_page
+
+        timeline_cursors = {
+            **self.BAD_CURSORS,
+            'unknown kind': _token('[{"dt": "2024-01-01T00:00:00+00:00"}, "other", 7]'),
+            'kind not a string': _token('[{"dt": "2024-01-01T00:00:00+00:00"}, 3, 7]'),
+            'truncated': _token('[{"dt": "2024-01-01T00:00:00+00:00"}, "known"]'),
+        }
+        self.client.force_login(self.staff)
+        url = reverse('vehicle_control:admin_plate_history')
+        for name, token in timeline_cursors.items():
+            with self.subTest(cursor=name):
+                self.assertEqual(get_timeline_page(after=token), ([], None, None))
+                self.assertEqual(get_timeline_page(before=token), ([], None, None))
+                self.assertEqual(self.client.get(url, {'timeline_after': token}).status_code, 200)
+                self.assertEqual(self.client.get(url, {'timeline_before': token}).status_code, 200)
+
+
+class ThumbnailTests(TestCase):
+    """Thumbnails are made on save only; rendering never decodes an upload"""
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        override = self.settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+        cache.clear()
+        self.user = User.objects.create_user('owner', password='pw')
+
+    def _png(self, size=(100, 40)):
+        from io import BytesIO
+
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from PIL import Image
+
+        data = BytesIO()
+        Image.new('RGB', size, 'white').save(data, format='PNG')
+        return SimpleUploadedFile('plate.png', data.getvalue(), content_type='image/png')
+
+    def _plate(self):
+        from .models import RegisteredLicensePlate
+
+        return RegisteredLicensePlate.objects.create(
+            user=self.user, plate_number='AB1234', owner_name='Owner', plate_image=self._png()
+        )
+
+    def test_oversized_image_still_registers(self):
+        from django.core.files.storage import default_storage
+
+        from .models import RegisteredLicensePlate
+        from .thumbnails import thumbnail_name, thumbnail_url
+
+        # 4000 pixels against a limit of 1000: Pillow refuses it as a decompression bomb
+        with mock.patch('PIL.Image.MAX_IMAGE_PIXELS', 1000):
+            plate = self._plate()
+        self.assertTrue(RegisteredLicensePlate.objects.filter(pk=plate.pk).exists())
+        self.assertFalse(default_storage.exists(thumbnail_name(plate.plate_image.name, 'small')))
+        self.assertEqual(thumbnail_url(plate.plate_image), plate.plate_image.url)
+
+    def test_rendering_never_generates(self):
+        from django.core.files.storage import default_storage
+
+        from .thumbnails import delete_thumbnails, thumbnail_name, thumbnail_url
+
+        plate = self._plate()
+        thumbnail = thumbnail_name(plate.plate_image.name, 'small')
+        self.assertTrue(default_storage.exists(thumbnail))
+        self.assertEqual(thumbnail_url(plate.plate_image), default_storage.url(thumbnail))
+
+        delete_thumbnails(plate.plate_image.name)
+        with mock.patch('vehicle_control.thumbnails.generate_thumbnail') as generate:
+            self.assertEqual(thumbnail_url(plate.plate_image), plate.plate_image.url)
+        generate.assert_not_called()
+        self.assertFalse(default_storage.exists(thumbnail))
+
+
+class StreamSessionTests(TestCase):
+    """ingest_stream sessions have no video file and stay out of the queue"""
+
+    def setUp(self):
+        from django.contrib.auth.models import User
+
+        from .models import VideoDetection
+
+        user = User.objects.create_user('camera', password='pw')
+        self.session = VideoDetection.objects.create(uploaded_by=user, source='stream', status='queued')
+
+    def test_queue_skips_stream_sessions(self):
+        from .scheduling import enqueue, next_candidate, requeue_stale
+
+        self.assertIsNone(next_candidate())
+        self.session.status = 'processing'
+        self.session.worker = 'elsewhere:1'
+        self.session.save()
+        self.assertEqual(requeue_stale(), 0)
+        with self.assertRaisesMessage(ValueError, 'live stream session'):
+            enqueue(self.session)
+
+    def test_reevaluate_refuses_stream_sessions(self):
+        from .processing import reevaluate_video_detection
+
+        with self.assertRaisesMessage(ValueError, 'live stream session'):
+            reevaluate_video_detection(self.session)
+
+
+class AllowListUpdateTests(SimpleTestCase):
+    """Single-plate changes patch the index instead of rebuilding it"""
+
+    def _plate(self, plate_id, number):
+        return mock.Mock(id=plate_id, plate_number=number, owner_name=f'owner {plate_id}')
+
+    def test_incremental_updates_match_a_full_build(self):
+        from .gate import AllowList, _Index, normalize_plate
+
+        allow_list = AllowList(max_distance=1)
+        numbers = ['กข1234', 'กข1235', 'ABC123', 'ABC123', 'XY9999']
+        for plate_id, number in enumerate(numbers, start=1):
+            allow_list.upsert(self._plate(plate_id, number))
+        # A set a concurrent lookup may be holding
+        held = allow_list._index.deletes[normalize_plate('ABC123')[1:]]
+        held_copy = set(held)
+
+        with mock.patch.object(AllowList, '_rebuild') as rebuild:
+            allow_list.upsert(self._plate(3, 'ABD123'))
+            allow_list.upsert(self._plate(2, 'กข1235'))
+            allow_list.remove(5)
+            allow_list.remove(4)
+            allow_list.remove(42)
+        rebuild.assert_not_called()
+        self.assertEqual(held, held_copy)
+
+        expected = _Index(allow_list._plates)
+        self.assertEqual(allow_list._index.exact, expected.exact)
+        self.assertEqual(allow_list._index.deletes, expected.deletes)
+        self.assertEqual(allow_list.match('ABD123')[0], 'exact')
+        self.assertEqual(allow_list.match('ABC123')[0], 'fuzzy')
+        self.assertEqual(allow_list.match('XY9999')[0], 'none')
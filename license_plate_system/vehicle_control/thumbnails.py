@@ -0,0 +1,102 @@
+"""
+Fixed-size thumbnails for plate and detection images.
+
+Thumbnails live next to the original, e.g.
+``detections/known/detection_1_30_91.jpg`` ->
+``detections/known/thumbs/small/detection_1_30_91.jpg.jpg``; the original's
+extension stays in the name so ``a.png`` and ``a.jpg`` don't share one. They
+are generated only when the image is saved (post_save) or by
+``manage.py generate_thumbnails``, never while a page renders: a listing
+whose thumbnail is missing shows the original image instead. Known
+thumbnail URLs are cached, so rendering a listing doesn't touch storage
+once per image.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+THUMBNAIL_DIR = 'thumbs'
+THUMBNAIL_QUALITY = 80
+URL_CACHE_TIMEOUT = 24 * 3600
+
+
+def thumbnail_name(name, size):
+    """Storage name of the ``size`` thumbnail for original image ``name``"""
+    directory, filename = os.path.split(name)
+    return os.path.join(directory, THUMBNAIL_DIR, size, f'{filename}.jpg')
+
+
+def _url_cache_key(name, size):
+    return f'thumbnail_url:{size}:{name}'
+
+
+def generate_thumbnail(name, size, force=False):
+    """
+    Create (or refresh with ``force``) one thumbnail; returns its storage name.
+    Raises OSError for a missing or unreadable original, ValueError for one
+    with too many pixels to decode safely.
+    """
+    target = thumbnail_name(name, size)
+    if default_storage.exists(target):
+        if not force:
+            return target
+        default_storage.delete(target)
+
+    # Pillow is only loaded when a thumbnail is actually made
+    from PIL import Image, ImageOps
+
+    try:
+        with default_storage.open(name, 'rb') as f:
+            image = Image.open(f)
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail(settings.THUMBNAIL_SIZES[size], Image.LANCZOS)
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+
+            output = BytesIO()
+            image.save(output, format='JPEG', quality=THUMBNAIL_QUALITY, optimize=True)
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        # The warning too, in case warnings are turned into errors
+        raise ValueError(f'Image {name} has too many pixels')
+
+    target = default_storage.save(target, ContentFile(output.getvalue()))
+    cache.set(_url_cache_key(name, size), default_storage.url(target), URL_CACHE_TIMEOUT)
+    return target
+
+
+def generate_thumbnails(name, force=False):
+    """Create every configured thumbnail size for original image ``name``"""
+    return [generate_thumbnail(name, size, force=force) for size in settings.THUMBNAIL_SIZES]
+
+
+def delete_thumbnails(name):
+    """Remove the thumbnails of an original image"""
+    cache.delete_many([_url_cache_key(name, size) for size in settings.THUMBNAIL_SIZES])
+    for size in settings.THUMBNAIL_SIZES:
+        target = thumbnail_name(name, size)
+        if default_storage.exists(target):
+            default_storage.delete(target)
+
+
+def thumbnail_url(image, size='small'):
+    """
+    URL of the ``size`` thumbnail for an ImageField file.
+
+    Never generates one: if the thumbnail doesn't exist (not made yet, or
+    the original couldn't be read) this is the original image's URL.
+    """
+    if not image:
+        return ''
+    key = _url_cache_key(image.name, size)
+    url = cache.get(key)
+    if url is None:
+        target = thumbnail_name(image.name, size)
+        if not default_storage.exists(target):
+            return image.url
+        url = default_storage.url(target)
+        cache.set(key, url, URL_CACHE_TIMEOUT)
+    return url
@@ -0,0 +1,90 @@
+"""
+Overlapping tiles and box merging for high-resolution frames.
+
+Plates in 4K footage are too small to survive downscaling, and one OCR pass
+over 8 megapixels runs on a single core. Instead the frame is cut into
+overlapping tiles that the detector processes in a thread pool (OpenCV and
+the OCR model release the GIL for the heavy parts). As long as the overlap
+is larger than a plate, every plate lies whole inside at least one tile;
+the partial copies cut by a seam are then dropped by non-maximum
+suppression on intersection-over-the-smaller-box.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .governor import host_cores
+
+
+def _starts(length, tile_size, overlap):
+    if length <= tile_size:
+        return [0]
+    step = max(1, tile_size - overlap)
+    starts = list(range(0, length - tile_size, step))
+    starts.append(length - tile_size)
+    return starts
+
+
+def tile_grid(height, width, tile_size, overlap):
+    """(x, y, w, h) tiles covering the frame, neighbours overlapping by ``overlap`` pixels"""
+    return [
+        (x, y, min(tile_size, width), min(tile_size, height))
+        for y in _starts(height, tile_size, overlap)
+        for x in _starts(width, tile_size, overlap)
+    ]
+
+
+def _overlap_ratio(a, b):
+    """Intersection area over the smaller box's area"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = min(ax + aw, bx + bw) - max(ax, bx)
+    ih = min(ay + ah, by + bh) - max(ay, by)
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    return (iw * ih) / float(min(aw * ah, bw * bh) or 1)
+
+
+def merge_detections(detections, threshold):
+    """Non-maximum suppression over (text, confidence, region), most confident first"""
+    kept = []
+    for detection in sorted(detections, key=lambda d: d[1], reverse=True):
+        if all(_overlap_ratio(detection[2], other[2]) < threshold for other in kept):
+            kept.append(detection)
+    return kept
+
+
+def should_tile_size(height, width):
+    min_size = settings.DETECTION_TILE_MIN_SIZE
+    return min_size > 0 and max(height, width) >= min_size
+
+
+def should_tile(image):
+    return should_tile_size(*image.shape[:2])
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_tile_pool():
+    """Process-wide thread pool for tile detection"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=max(1, settings.DETECTION_TILE_WORKERS or host_cores()),
+                                           thread_name_prefix='detection-tile')
+    return _pool
+
+
+def map_tiles(fn, tiles, workers):
+    """Concatenated ``fn(tile)`` results, with at most ``workers`` tiles in flight"""
+    workers = max(1, min(workers, len(tiles)))
+    groups = [tiles[i::workers] for i in range(workers)]
+    results = []
+    for group_results in get_tile_pool().map(lambda group: [fn(tile) for tile in group], groups):
+        for found in group_results:
+            results.extend(found)
+    return results
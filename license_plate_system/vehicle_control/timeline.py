@@ -0,0 +1,103 @@
+"""
+Combined known/unknown detection timeline.
+
+The database merges both tables with UNION ALL over just the columns the
+page shows, ordered by (detected_at, kind, id) and paginated by keyset, so
+each page reads a constant number of index entries no matter how many
+detections exist.
+"""
+from datetime import datetime
+
+from django.db.models import CharField, F, Q, Value
+
+from .models import KnownLicensePlate, UnknownLicensePlate
+from .pagination import decode_cursor, encode_cursor
+
+TIMELINE_FIELDS = (
+    'id', 'detected_plate_number', 'detection_image', 'confidence_score',
+    'detected_at', 'video_detection_id',
+)
+
+# Sort order is (detected_at DESC, kind DESC, id DESC); 'unknown' > 'known'
+SOURCES = {
+    'known': KnownLicensePlate,
+    'unknown': UnknownLicensePlate,
+}
+
+
+def _decode_cursor(token):
+    """(detected_at, kind, id) from a token, or None if it isn't one"""
+    cursor = decode_cursor(token, (datetime, str, int))
+    if cursor is None or cursor[1] not in SOURCES:
+        return None
+    return cursor
+
+
+def _keyset_filter(kind, cursor, older):
+    """Rows of ``kind`` strictly after (older=True) or before the cursor in timeline order"""
+    detected_at, cursor_kind, cursor_id = cursor
+    if older:
+        if kind == cursor_kind:
+            return Q(detected_at__lt=detected_at) | Q(detected_at=detected_at, id__lt=cursor_id)
+        if kind < cursor_kind:
+            return Q(detected_at__lte=detected_at)
+        return Q(detected_at__lt=detected_at)
+
+    if kind == cursor_kind:
+        return Q(detected_at__gt=detected_at) | Q(detected_at=detected_at, id__gt=cursor_id)
+    if kind > cursor_kind:
+        return Q(detected_at__gte=detected_at)
+    return Q(detected_at__gt=detected_at)
+
+
+def _source_queryset(kind, search_filters, cursor, older):
+    model = SOURCES[kind]
+    queryset = model.objects.all()
+    if kind in search_filters:
+        queryset = queryset.filter(search_filters[kind])
+    if cursor:
+        queryset = queryset.filter(_keyset_filter(kind, cursor, older))
+
+    owner = F('registered_plate__owner_name') if kind == 'known' else Value(None, output_field=CharField())
+    return queryset.order_by().annotate(
+        kind=Value(kind, output_field=CharField()),
+        owner=owner,
+    ).values(*TIMELINE_FIELDS, 'kind', 'owner')
+
+
+def get_timeline_page(search_filters=None, after=None, before=None, per_page=50):
+    """
+    One page of the merged timeline.
+
+    ``search_filters`` maps 'known'/'unknown' to a Q applied to that table.
+    ``after`` continues to older rows, ``before`` goes back to newer ones;
+    an invalid cursor gives the first page. Returns (rows, next_cursor, previous_cursor).
+    """
+    search_filters = search_filters or {}
+    after_key = _decode_cursor(after)
+    before_key = _decode_cursor(before) if not after_key else None
+    cursor = after_key or before_key
+    older = before_key is None
+
+    first, second = (
+        _source_queryset(kind, search_filters, cursor, older) for kind in SOURCES
+    )
+    ordering = ('-detected_at', '-kind', '-id') if older else ('detected_at', 'kind', 'id')
+    rows = list(first.union(second, all=True).order_by(*ordering)[:per_page + 1])
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not older:
+        rows.reverse()
+
+    def key(row):
+        return (row['detected_at'], row['kind'], row['id'])
+
+    if older:
+        next_cursor = encode_cursor(key(rows[-1])) if rows and has_more else None
+        previous_cursor = encode_cursor(key(rows[0])) if rows and cursor else None
+    else:
+        next_cursor = encode_cursor(key(rows[-1])) if rows else None
+        previous_cursor = encode_cursor(key(rows[0])) if rows and has_more else None
+
+    return rows, next_cursor, previous_cursor
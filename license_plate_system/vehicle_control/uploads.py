@@ -0,0 +1,272 @@
+"""
+Resumable chunked uploads for large videos.
+
+Chunks are streamed from the request body straight into a partial file under
+``CHUNKED_UPLOAD_TEMP_DIR`` and hashed as they arrive, so worker memory stays
+flat no matter how big the video is. On completion the partial file is moved
+(not copied) into ``VideoDetection.video_file``.
+
+The running hash lives in the worker that received the chunks. When a chunk
+lands on another worker, or after a restart, nothing is re-read: completion
+hashes the finished file in one pass instead. Uploads left untouched for
+``CHUNKED_UPLOAD_EXPIRY_HOURS`` are swept, rows and partial files, whenever a
+new upload starts and by ``manage.py expire_uploads``.
+"""
+import contextlib
+import hashlib
+import os
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.http import UnreadablePostError
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from .models import ChunkedUpload, VideoDetection
+
+READ_BLOCK_SIZE = 64 * 1024
+
+# Running SHA-256 state per upload, keyed by upload_id -> (offset, hasher).
+# Only kept while every chunk so far reached this worker.
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent chunks of one upload are then only caught by the offset check
+    fcntl = None
+
+
+class ChunkedUploadError(Exception):
+    """Raised when a chunk or upload request cannot be accepted"""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def partial_path(upload):
+    """Location of the partially assembled file for an upload"""
+    return os.path.join(settings.CHUNKED_UPLOAD_TEMP_DIR, f'{upload.upload_id}.part')
+
+
+def create_upload(user, filename, total_size, expected_checksum=''):
+    """Register a new upload and create its empty partial file"""
+    filename = get_valid_filename(os.path.basename(filename or ''))
+    if not filename:
+        raise ChunkedUploadError('Filename is required')
+    if total_size <= 0:
+        raise ChunkedUploadError('File size must be greater than zero')
+    if total_size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+        raise ChunkedUploadError('File is larger than the maximum upload size', status=413)
+
+    upload = ChunkedUpload.objects.create(
+        uploaded_by=user,
+        filename=filename,
+        total_size=total_size,
+        expected_checksum=(expected_checksum or '').lower(),
+    )
+
+    os.makedirs(settings.CHUNKED_UPLOAD_TEMP_DIR, exist_ok=True)
+    open(partial_path(upload), 'wb').close()
+    expire_uploads()
+    return upload
+
+
+def _cached_hasher(upload):
+    """This worker's SHA-256 hasher positioned at ``upload.offset``, or None if it missed a chunk"""
+    if upload.offset == 0:
+        return hashlib.sha256()
+    with _hashers_lock:
+        cached = _hashers.get(str(upload.upload_id))
+    if cached and cached[0] == upload.offset:
+        return cached[1]
+    return None
+
+
+def _file_checksum(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(READ_BLOCK_SIZE), b''):
+            hasher.update(data)
+    return hasher.hexdigest()
+
+
+def _check_chunk(upload, offset, length):
+    if upload.status != 'uploading':
+        raise ChunkedUploadError('Upload is already finished', status=409, offset=upload.offset)
+    if offset != upload.offset:
+        raise ChunkedUploadError('Offset mismatch', status=409, offset=upload.offset)
+    if length <= 0:
+        raise ChunkedUploadError('Empty chunk', offset=upload.offset)
+    if length > settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE:
+        raise ChunkedUploadError('Chunk is too large', status=413, offset=upload.offset)
+    if offset + length > upload.total_size:
+        raise ChunkedUploadError('Chunk exceeds declared file size', offset=upload.offset)
+
+
+@contextlib.contextmanager
+def _reserve(upload):
+    """
+    The partial file, opened for writing and locked against other chunks of
+    the same upload. Partial files are local to this host, so a file lock
+    covers every worker that can write one; the database row stays unlocked
+    while the chunk is streamed from a possibly slow client.
+    """
+    with open(partial_path(upload), 'r+b') as f:
+        if fcntl is not None:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise ChunkedUploadError('Another chunk is being written', status=409, offset=upload.offset)
+        # Closing the file releases the lock
+        yield f
+
+
+def write_chunk(upload, stream, offset, length):
+    """
+    Append ``length`` bytes from ``stream`` at ``offset``.
+
+    If the client disconnects mid-chunk the bytes received so far are kept and
+    the offset is advanced accordingly, so the client can resume from
+    whatever the status endpoint reports. Errors writing the file propagate
+    and leave the offset where it was.
+    """
+    upload = ChunkedUpload.objects.get(pk=upload.pk)
+    _check_chunk(upload, offset, length)
+
+    with _reserve(upload) as f:
+        # Another chunk may have finished between the check and the lock
+        upload.refresh_from_db(fields=['status', 'offset'])
+        _check_chunk(upload, offset, length)
+
+        # A copy, so a chunk that fails never leaves a wrong digest cached
+        hasher = _cached_hasher(upload)
+        hasher = hasher.copy() if hasher is not None else None
+        written = 0
+        # Drop any bytes left over from a chunk that was never acknowledged
+        f.seek(offset)
+        f.truncate()
+        try:
+            while written < length:
+                data = stream.read(min(READ_BLOCK_SIZE, length - written))
+                if not data:
+                    break
+                f.write(data)
+                if hasher is not None:
+                    hasher.update(data)
+                written += len(data)
+        except UnreadablePostError:
+            # Client went away; keep what arrived
+            pass
+        f.flush()
+        os.fsync(f.fileno())
+
+        saved = ChunkedUpload.objects.filter(pk=upload.pk, status='uploading', offset=offset).update(
+            offset=offset + written, updated_at=timezone.now()
+        )
+        if not saved:
+            upload.refresh_from_db(fields=['status', 'offset'])
+            raise ChunkedUploadError('Upload changed while the chunk was written', status=409, offset=upload.offset)
+        upload.offset = offset + written
+        with _hashers_lock:
+            if hasher is not None:
+                _hashers[str(upload.upload_id)] = (upload.offset, hasher)
+            else:
+                _hashers.pop(str(upload.upload_id), None)
+
+    if written < length:
+        raise ChunkedUploadError('Incomplete chunk received', offset=upload.offset)
+    return upload
+
+
+def _check_complete(upload):
+    if upload.status != 'uploading':
+        raise ChunkedUploadError('Upload is already finished', status=409, offset=upload.offset)
+    if upload.offset != upload.total_size:
+        raise ChunkedUploadError('Upload is not complete', status=409, offset=upload.offset)
+
+
+def complete_upload(upload, camera_profile=None):
+    """Verify the assembled file and move it into a new VideoDetection"""
+    upload = ChunkedUpload.objects.get(pk=upload.pk)
+    _check_complete(upload)
+    # A complete file takes no more chunks, so it can be hashed before the row is locked
+    hasher = _cached_hasher(upload)
+    checksum = hasher.hexdigest() if hasher is not None else _file_checksum(partial_path(upload))
+    with _hashers_lock:
+        _hashers.pop(str(upload.upload_id), None)
+
+    if upload.expected_checksum and upload.expected_checksum != checksum:
+        # Outside the transaction below, so raising doesn't roll the failure back
+        failed = ChunkedUpload.objects.filter(pk=upload.pk, status='uploading').update(
+            status='failed', checksum=checksum, updated_at=timezone.now()
+        )
+        if failed:
+            os.remove(partial_path(upload))
+        raise ChunkedUploadError('Checksum mismatch', offset=upload.offset)
+
+    with transaction.atomic():
+        upload = ChunkedUpload.objects.select_for_update().get(pk=upload.pk)
+        _check_complete(upload)
+
+        # Rename into media storage instead of copying the bytes again
+        name = default_storage.get_available_name(f'videos/{upload.filename}')
+        destination = default_storage.path(name)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(partial_path(upload), destination)
+
+        video_detection = VideoDetection(uploaded_by=upload.uploaded_by, status='processing', camera_profile=camera_profile)
+        video_detection.video_file.name = name
+        video_detection.save()
+
+        upload.status = 'complete'
+        upload.checksum = checksum
+        upload.video_detection = video_detection
+        upload.save(update_fields=['status', 'checksum', 'video_detection', 'updated_at'])
+
+    return video_detection
+
+
+def expire_uploads(now=None):
+    """
+    Delete uploads untouched for ``CHUNKED_UPLOAD_EXPIRY_HOURS`` that never
+    completed, with their partial files, and partial files no upload owns.
+    Returns (rows deleted, files removed).
+    """
+    cutoff = (now or timezone.now()) - timedelta(hours=settings.CHUNKED_UPLOAD_EXPIRY_HOURS)
+    stale = ChunkedUpload.objects.filter(status__in=['uploading', 'failed'], updated_at__lt=cutoff)
+    files = 0
+    for upload in stale.only('pk', 'upload_id'):
+        with _hashers_lock:
+            _hashers.pop(str(upload.upload_id), None)
+        try:
+            os.remove(partial_path(upload))
+            files += 1
+        except FileNotFoundError:
+            pass
+    rows, _ = stale.delete()
+
+    # Left behind by a crash between writing the file and the row, or by deleted rows
+    directory = settings.CHUNKED_UPLOAD_TEMP_DIR
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        names = []
+    active = {str(upload_id) for upload_id in
+              ChunkedUpload.objects.filter(status='uploading').values_list('upload_id', flat=True)}
+    for name in names:
+        path = os.path.join(directory, name)
+        if not name.endswith('.part') or name[:-len('.part')] in active:
+            continue
+        try:
+            if os.path.getmtime(path) < cutoff.timestamp():
+                os.remove(path)
+                files += 1
+        except FileNotFoundError:
+            pass
+    return rows, files
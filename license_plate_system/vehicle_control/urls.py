@@ -11,9 +11,21 @@ urlpatterns = [
     
     # Admin routes
     path('admin/upload-video/', views.admin_upload_video, name='admin_upload_video'),
+    path('admin/uploads/', views.chunked_upload_init, name='chunked_upload_init'),
+    path('admin/uploads/<uuid:upload_id>/', views.chunked_upload_chunk, name='chunked_upload_chunk'),
+    path('admin/uploads/<uuid:upload_id>/complete/', views.chunked_upload_complete, name='chunked_upload_complete'),
+    path('admin/plates/import/', views.admin_import_plates, name='admin_import_plates'),
     path('admin/video-list/', views.admin_video_list, name='admin_video_list'),
     path('admin/video-detail/<int:video_id>/', views.admin_video_detail, name='admin_video_detail'),
+    path('admin/video-status/<int:video_id>/', views.video_status, name='video_status'),
+    path('admin/detector-status/', views.detector_status, name='detector_status'),
     path('admin/plate-history/', views.admin_plate_history, name='admin_plate_history'),
+    path('admin/live-feed/', views.live_feed, name='live_feed'),
+    path('admin/export/<str:kind>/', views.export_plates, name='export_plates'),
+    
+    # Detection API
+    path('api/detect/', views.detect_image, name='detect_image'),
+    path('api/gate/decision/', views.gate_decision, name='gate_decision'),
     
     # Image download/view
     path('admin/download-image/<str:image_type>/<int:image_id>/', views.download_plate_image, name='download_plate_image'),
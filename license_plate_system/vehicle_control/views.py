@@ -1,25 +1,41 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from django.urls import reverse
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.models import User
 from django.contrib.admin.views.decorators import staff_member_required
-from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse, HttpResponse, FileResponse
+from django.views.decorators.http import require_POST
+from django.http import JsonResponse, HttpResponse, FileResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from django.contrib import messages
-from django.core.paginator import Paginator
+from django.db import connection
 from django.db.models import Q, Count
 from django.utils import timezone
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
+from asgiref.sync import sync_to_async
+import asyncio
 import json
 import os
-import cv2
-import numpy as np
+import threading
 from datetime import datetime, timedelta
 
 from .models import (
     RegisteredLicensePlate, VideoDetection, 
-    KnownLicensePlate, UnknownLicensePlate
+    KnownLicensePlate, UnknownLicensePlate, ChunkedUpload, CameraProfile
 )
-from .detection import AdvancedLicensePlateDetector, get_detector
+from .batching import BatcherOverloaded, get_detection_batcher
+from .bulk_import import BulkImportError, import_plates
+from .device_auth import staff_or_device_required
+from .gate import aget_gate_service
+from .live_feed import Subscriber, broker, ensure_listener, stream_async, stream_sync
+from .export import FORMATS as EXPORT_FORMATS, ExportError, aiter_export, iter_export
+from .image_serving import aserve_image
+from .pagination import CursorPaginator
+from .search import plate_search_q, search as plate_search
+from .timeline import SOURCES, get_timeline_page
+from .uploads import ChunkedUploadError, create_upload, write_chunk, complete_upload
+from .vision import decode_image, detector_stats, enqueue_video, run_inline_video
 
 # ==================== USER VIEWS ====================
 
@@ -119,135 +135,208 @@ def admin_upload_video(request):
         video_detection = VideoDetection.objects.create(
             uploaded_by=request.user,
             video_file=video_file,
-            status='processing'
+            status='processing',
+            camera_profile=_get_camera_profile(request.POST.get('camera_profile')),
+            priority=_get_priority(request.POST.get('priority'))
         )
         
-        # Process video in background
-        try:
-            video_path = video_detection.video_file.path
-            process_video_detection(video_detection, video_path)
-            
+        _start_processing(video_detection, request)
+        if video_detection.status == 'queued':
+            messages.success(request, f'Video uploaded and queued for processing! Detection ID: {video_detection.id}')
+        elif video_detection.status == 'error':
+            messages.error(request, f'Error processing video: {video_detection.processing_notes}')
+        else:
             messages.success(request, f'Video uploaded and processing started! Detection ID: {video_detection.id}')
-        except Exception as e:
-            video_detection.status = 'error'
-            video_detection.processing_notes = str(e)
-            video_detection.save()
-            messages.error(request, f'Error processing video: {str(e)}')
         
         return redirect('vehicle_control:admin_video_list')
     
     recent_videos = VideoDetection.objects.all().order_by('-upload_timestamp')[:10]
     return render(request, 'vehicle_control/admin_upload_video.html', {
-        'recent_videos': recent_videos
+        'recent_videos': recent_videos,
+        'camera_profiles': CameraProfile.objects.all(),
+        'priority_choices': VideoDetection.PRIORITY_CHOICES,
+        'default_priority': VideoDetection.PRIORITY_NORMAL,
+        'queue_mode': settings.VIDEO_PROCESSING_MODE == 'queue'
     })
 
-def process_video_detection(video_detection, video_path):
-    """Process video and detect license plates"""
-    from .models import RegisteredLicensePlate, KnownLicensePlate, UnknownLicensePlate
-    from django.core.files.storage import default_storage
-    from django.core.files.base import ContentFile
-    
-    # Use lazy-loaded detector to avoid startup delays
-    detector = get_detector()
-    cap = cv2.VideoCapture(video_path)
-    frame_count = 0
-    frame_skip = 30  # Process every 30th frame
-    
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    fps = cap.get(cv2.CAP_PROP_FPS) if cap.get(cv2.CAP_PROP_FPS) > 0 else 30
-    
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        if frame_count % frame_skip == 0:
-            # Detect license plate
-            plate_text, confidence, region = detector.detect_license_plate(frame)
-            
-            if plate_text and confidence > 0.6:
-                # Normalize plate number for comparison
-                normalized_plate = plate_text.replace(' ', '').upper()
-                
-                # Check if plate exists in registered database
-                registered_plate = RegisteredLicensePlate.objects.filter(
-                    plate_number=normalized_plate
-                ).first()
-                
-                # Save detection image
-                detection_image = None
-                if region:
-                    x, y, w, h = region
-                    padding = 10
-                    x = max(0, x - padding)
-                    y = max(0, y - padding)
-                    w = min(frame.shape[1] - x, w + 2 * padding)
-                    h = min(frame.shape[0] - y, h + 2 * padding)
-                    crop = frame[y:y+h, x:x+w]
-                    
-                    # Save image
-                    filename = f"detection_{video_detection.id}_{frame_count}_{int(confidence*100)}.jpg"
-                    success, buffer = cv2.imencode('.jpg', crop)
-                    if success:
-                        image_bytes = buffer.tobytes()
-                        image_file = ContentFile(image_bytes, name=filename)
-                        
-                        if registered_plate:
-                            detection_image = default_storage.save(f'detections/known/{filename}', image_file)
-                        else:
-                            detection_image = default_storage.save(f'detections/unknown/{filename}', image_file)
-                
-                timestamp_seconds = frame_count / fps if fps > 0 else 0
-                
-                if registered_plate:
-                    # Known plate - exists in database
-                    KnownLicensePlate.objects.create(
-                        video_detection=video_detection,
-                        registered_plate=registered_plate,
-                        detected_plate_number=plate_text,
-                        detection_image=detection_image,
-                        confidence_score=confidence,
-                        frame_number=frame_count,
-                        timestamp_seconds=timestamp_seconds
-                    )
-                else:
-                    # Unknown plate - doesn't exist in database
-                    vehicle_type = detector.predict_vehicle_type(frame)
-                    UnknownLicensePlate.objects.create(
-                        video_detection=video_detection,
-                        detected_plate_number=plate_text,
-                        detection_image=detection_image,
-                        confidence_score=confidence,
-                        vehicle_type=vehicle_type,
-                        frame_number=frame_count,
-                        timestamp_seconds=timestamp_seconds
-                    )
-        
-        frame_count += 1
-    
-    cap.release()
+def _process_inline(video_detection):
+    try:
+        run_inline_video(video_detection)
+    finally:
+        connection.close()
+
+def _start_processing(video_detection, request):
+    """
+    Queue the video for the workers, or process it in a background thread in
+    'inline' mode. Under ASGI it is always queued: detection would compete
+    with the event loop for the web process's CPU.
+    """
+    if settings.VIDEO_PROCESSING_MODE != 'queue' and not isinstance(request, ASGIRequest):
+        threading.Thread(
+            target=_process_inline, args=(video_detection,),
+            name=f'video-{video_detection.id}', daemon=True
+        ).start()
+        return
+    try:
+        enqueue_video(video_detection)
+    except Exception as e:
+        video_detection.status = 'error'
+        video_detection.processing_notes = str(e)
+        video_detection.save()
+
+def _get_priority(value):
+    """Submitted priority if it is one of the choices, else normal"""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return VideoDetection.PRIORITY_NORMAL
+    if value in dict(VideoDetection.PRIORITY_CHOICES):
+        return value
+    return VideoDetection.PRIORITY_NORMAL
+
+def _get_camera_profile(profile_id):
+    """CameraProfile for a submitted id, or None for "no profile" / unknown ids"""
+    if not profile_id:
+        return None
+    try:
+        return CameraProfile.objects.filter(id=int(profile_id)).first()
+    except (TypeError, ValueError):
+        return None
+
+# ==================== CHUNKED UPLOAD API ====================
+
+def _chunked_upload_status(upload):
+    return {
+        'upload_id': str(upload.upload_id),
+        'filename': upload.filename,
+        'total_size': upload.total_size,
+        'offset': upload.offset,
+        'status': upload.status,
+        'chunk_size': settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE,
+    }
+
+def _chunked_upload_error(error):
+    payload = {'error': str(error)}
+    if error.offset is not None:
+        payload['offset'] = error.offset
+    return JsonResponse(payload, status=error.status)
+
+@staff_member_required
+@require_POST
+def chunked_upload_init(request):
+    """Start a resumable upload: {"filename", "size", "sha256" (optional)}"""
+    try:
+        payload = json.loads(request.body)
+        total_size = int(payload.get('size', 0))
+    except (ValueError, TypeError):
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    
+    try:
+        upload = create_upload(
+            request.user,
+            payload.get('filename', ''),
+            total_size,
+            payload.get('sha256', '')
+        )
+    except ChunkedUploadError as e:
+        return _chunked_upload_error(e)
     
-    # Update video detection status
-    video_detection.status = 'completed'
-    video_detection.processed_at = timezone.now()
-    video_detection.save()
+    return JsonResponse(_chunked_upload_status(upload), status=201)
+
+def _write_chunk(upload, request, offset, length):
+    # A pool thread rather than Django's one thread for sync code, so a slow
+    # upload doesn't hold up the sync views; its connection is not reused
+    try:
+        return write_chunk(upload, request, offset, length)
+    finally:
+        connection.close()
+
+@staff_member_required
+async def chunked_upload_chunk(request, upload_id):
+    """GET reports the resume offset, PUT ?offset=N appends the request body"""
+    user = await request.auser()
+    upload = await aget_object_or_404(ChunkedUpload, upload_id=upload_id, uploaded_by=user)
+    
+    if request.method == 'GET':
+        return JsonResponse(_chunked_upload_status(upload))
+    
+    if request.method != 'PUT':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    try:
+        offset = int(request.GET.get('offset', ''))
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return JsonResponse({'error': 'offset and Content-Length are required'}, status=400)
+    
+    try:
+        # Read the body as a stream; request.body would buffer it in memory
+        upload = await sync_to_async(_write_chunk, thread_sensitive=False)(upload, request, offset, length)
+    except ChunkedUploadError as e:
+        return _chunked_upload_error(e)
+    
+    return JsonResponse(_chunked_upload_status(upload))
+
+@staff_member_required
+@require_POST
+def chunked_upload_complete(request, upload_id):
+    """Finish an upload, attach it to a VideoDetection and process or queue it"""
+    upload = get_object_or_404(ChunkedUpload, upload_id=upload_id, uploaded_by=request.user)
+    try:
+        payload = json.loads(request.body) if request.body else {}
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    
+    try:
+        video_detection = complete_upload(upload, camera_profile=_get_camera_profile(payload.get('camera_profile')))
+    except ChunkedUploadError as e:
+        return _chunked_upload_error(e)
+    
+    video_detection.priority = _get_priority(payload.get('priority'))
+    _start_processing(video_detection, request)
+    
+    return JsonResponse({
+        'video_id': video_detection.id,
+        'status': video_detection.status,
+        'sha256': video_detection.chunked_upload.checksum,
+        'redirect_url': reverse('vehicle_control:admin_video_detail', args=[video_detection.id]),
+    })
+
+@staff_member_required
+@require_POST
+def admin_import_plates(request):
+    """Bulk register plates from a CSV (``csv_file``) and a zip of images (``images``)"""
+    csv_file = request.FILES.get('csv_file')
+    if not csv_file:
+        return JsonResponse({'error': 'Please upload a CSV file'}, status=400)
+    
+    default_user = request.user
+    username = request.POST.get('username', '').strip()
+    if username:
+        default_user = User.objects.filter(username=username).first()
+        if default_user is None:
+            return JsonResponse({'error': f'Unknown user {username}'}, status=400)
+    
+    try:
+        report = import_plates(csv_file, request.FILES.get('images'), default_user)
+    except BulkImportError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse(report)
 
 @staff_member_required
 def admin_video_list(request):
     """Admin can view list of uploaded videos"""
-    videos = VideoDetection.objects.all().order_by('-upload_timestamp')
-    
-    # Statistics
-    stats = {
-        'total_videos': videos.count(),
-        'processing': videos.filter(status='processing').count(),
-        'completed': videos.filter(status='completed').count(),
-        'error': videos.filter(status='error').count(),
-    }
+    # Statistics - one conditional aggregate instead of a COUNT per status
+    stats = VideoDetection.objects.aggregate(
+        total_videos=Count('id'),
+        processing=Count('id', filter=Q(status='processing')),
+        completed=Count('id', filter=Q(status='completed')),
+        error=Count('id', filter=Q(status='error')),
+    )
     
-    paginator = Paginator(videos, 20)
-    page = request.GET.get('page', 1)
-    page_obj = paginator.get_page(page)
+    paginator = CursorPaginator(VideoDetection.objects.select_related('uploaded_by'), ('-upload_timestamp', '-id'), 20)
+    page_obj = paginator.page(after=request.GET.get('after'), before=request.GET.get('before'))
     
     return render(request, 'vehicle_control/admin_video_list.html', {
         'videos': page_obj,
@@ -268,36 +357,55 @@ def admin_video_detail(request, video_id):
         'unknown_plates': unknown_plates
     })
 
+@staff_member_required
+def detector_status(request):
+    """Load time, resident size and evictions of this worker's detector components"""
+    return JsonResponse({
+        'pid': os.getpid(),
+        'idle_timeout': settings.DETECTOR_IDLE_TIMEOUT,
+        'components': detector_stats(),
+    })
+
+@staff_member_required
+async def video_status(request, video_id):
+    """Processing status and detection counts, for pages polling a video"""
+    video = await aget_object_or_404(VideoDetection, id=video_id)
+    return JsonResponse({
+        'video_id': video.id,
+        'status': video.status,
+        'processed_at': video.processed_at,
+        'processing_notes': video.processing_notes,
+        'processing_stats': video.processing_stats,
+        'priority': video.priority,
+        'resume_frame': video.resume_frame,
+        'total_frames': video.total_frames,
+        'preemptions': video.preemptions,
+        'known_count': await KnownLicensePlate.objects.filter(video_detection_id=video.id).acount(),
+        'unknown_count': await UnknownLicensePlate.objects.filter(video_detection_id=video.id).acount(),
+    })
+
 @staff_member_required
 def admin_plate_history(request):
     """Admin can view history of all license plates"""
     # Get all registered plates
-    registered_plates = RegisteredLicensePlate.objects.all().order_by('-registered_date')
+    registered_plates = RegisteredLicensePlate.objects.all()
     
     # Get all known detections
     known_detections = KnownLicensePlate.objects.select_related(
         'registered_plate', 'video_detection'
-    ).order_by('-detected_at')
+    )
     
     # Get all unknown detections
     unknown_detections = UnknownLicensePlate.objects.select_related(
         'video_detection'
-    ).order_by('-detected_at')
+    )
     
     # Search functionality
     search = request.GET.get('search', '')
     if search:
-        registered_plates = registered_plates.filter(
-            Q(plate_number__icontains=search) |
-            Q(owner_name__icontains=search)
-        )
-        known_detections = known_detections.filter(
-            Q(detected_plate_number__icontains=search) |
-            Q(registered_plate__plate_number__icontains=search)
-        )
-        unknown_detections = unknown_detections.filter(
-            detected_plate_number__icontains=search
-        )
+        registered_plates = plate_search(registered_plates, search)
+        known_detections = plate_search(known_detections, search)
+        unknown_detections = plate_search(unknown_detections, search)
     
     # Filter by type
     plate_type = request.GET.get('type', 'all')
@@ -311,121 +419,244 @@ def admin_plate_history(request):
         registered_plates = registered_plates.none()
         known_detections = known_detections.none()
     
-    # Pagination for registered plates
-    registered_paginator = Paginator(registered_plates, 20)
-    registered_page = request.GET.get('registered_page', 1)
-    registered_page_obj = registered_paginator.get_page(registered_page)
-    
-    # Pagination for known detections
-    known_paginator = Paginator(known_detections, 20)
-    known_page = request.GET.get('known_page', 1)
-    known_page_obj = known_paginator.get_page(known_page)
-    
-    # Pagination for unknown detections
-    unknown_paginator = Paginator(unknown_detections, 20)
-    unknown_page = request.GET.get('unknown_page', 1)
-    unknown_page_obj = unknown_paginator.get_page(unknown_page)
-    
-    # Combined timeline - all detections sorted by time
-    # Get all detections (before filtering) for timeline
-    all_known = KnownLicensePlate.objects.select_related(
-        'registered_plate', 'video_detection'
-    ).order_by('-detected_at')
-    
-    all_unknown = UnknownLicensePlate.objects.select_related(
-        'video_detection'
-    ).order_by('-detected_at')
-    
-    # Apply search to timeline if provided
+    # Keyset pagination for registered plates
+    registered_paginator = CursorPaginator(registered_plates, ('-registered_date', '-id'), 20)
+    registered_page_obj = registered_paginator.page(
+        after=request.GET.get('registered_after'),
+        before=request.GET.get('registered_before')
+    )
+    
+    # Keyset pagination for known detections
+    known_paginator = CursorPaginator(known_detections, ('-detected_at', '-id'), 20)
+    known_page_obj = known_paginator.page(
+        after=request.GET.get('known_after'),
+        before=request.GET.get('known_before')
+    )
+    
+    # Keyset pagination for unknown detections
+    unknown_paginator = CursorPaginator(unknown_detections, ('-detected_at', '-id'), 20)
+    unknown_page_obj = unknown_paginator.page(
+        after=request.GET.get('unknown_after'),
+        before=request.GET.get('unknown_before')
+    )
+    
+    # Combined timeline - merged and paginated by the database (see timeline.py)
+    timeline_search = {}
     if search:
-        all_known = all_known.filter(
-            Q(detected_plate_number__icontains=search) |
-            Q(registered_plate__plate_number__icontains=search)
-        )
-        all_unknown = all_unknown.filter(
-            detected_plate_number__icontains=search
-        )
+        timeline_search = {
+            kind: plate_search_q(model, search) for kind, model in SOURCES.items()
+        }
     
-    # Combine known and unknown detections with type indicator
-    timeline_items = []
-    for known in all_known:
-        timeline_items.append({
-            'type': 'known',
-            'object': known,
-            'timestamp': known.detected_at,
-            'plate_number': known.detected_plate_number,
-            'image': known.detection_image,
-            'owner': known.registered_plate.owner_name if known.registered_plate else 'Unknown',
-            'confidence': known.confidence_score,
-            'video': known.video_detection,
-        })
+    timeline_rows, timeline_next, timeline_previous = get_timeline_page(
+        timeline_search,
+        after=request.GET.get('timeline_after'),
+        before=request.GET.get('timeline_before'),
+        per_page=50
+    )
     
-    for unknown in all_unknown:
+    timeline_items = []
+    for row in timeline_rows:
+        image_field = SOURCES[row['kind']]._meta.get_field('detection_image')
         timeline_items.append({
-            'type': 'unknown',
-            'object': unknown,
-            'timestamp': unknown.detected_at,
-            'plate_number': unknown.detected_plate_number,
-            'image': unknown.detection_image,
-            'owner': None,
-            'confidence': unknown.confidence_score,
-            'video': unknown.video_detection,
+            'type': row['kind'],
+            'id': row['id'],
+            'timestamp': row['detected_at'],
+            'plate_number': row['detected_plate_number'],
+            'image': image_field.attr_class(None, image_field, row['detection_image']),
+            'owner': row['owner'],
+            'confidence': row['confidence_score'],
+            'video_id': row['video_detection_id'],
         })
     
-    # Sort by timestamp (newest first)
-    timeline_items.sort(key=lambda x: x['timestamp'], reverse=True)
-    
-    # Pagination for timeline
-    timeline_paginator = Paginator(timeline_items, 50)
-    timeline_page = request.GET.get('timeline_page', 1)
-    timeline_page_obj = timeline_paginator.get_page(timeline_page)
-    
     return render(request, 'vehicle_control/admin_plate_history.html', {
         'registered_plates': registered_page_obj,
         'known_detections': known_page_obj,
         'unknown_detections': unknown_page_obj,
-        'timeline_items': timeline_page_obj,
+        'timeline_items': timeline_items,
+        'timeline_next': timeline_next,
+        'timeline_previous': timeline_previous,
         'search': search,
         'plate_type': plate_type
     })
 
-@staff_member_required
-def download_plate_image(request, image_type, image_id):
-    """Admin can download license plate images"""
+async def _get_plate_image(image_type, image_id):
+    """Return (image file, download name, immutable) for a plate image; (None, None, False) for an unknown type"""
     if image_type == 'registered':
-        plate = get_object_or_404(RegisteredLicensePlate, id=image_id)
-        if plate.plate_image:
-            return FileResponse(plate.plate_image.open(), as_attachment=True, filename=f"plate_{plate.plate_number}.jpg")
+        plate = await aget_object_or_404(RegisteredLicensePlate, id=image_id)
+        # Registered images can be replaced under the same URL, so revalidate
+        return plate.plate_image, f"plate_{plate.plate_number}", False
     
     elif image_type == 'known':
-        detection = get_object_or_404(KnownLicensePlate, id=image_id)
-        if detection.detection_image:
-            return FileResponse(detection.detection_image.open(), as_attachment=True, filename=f"known_{detection.detected_plate_number}.jpg")
+        detection = await aget_object_or_404(KnownLicensePlate, id=image_id)
+        return detection.detection_image, f"known_{detection.detected_plate_number}", True
     
     elif image_type == 'unknown':
-        detection = get_object_or_404(UnknownLicensePlate, id=image_id)
-        if detection.detection_image:
-            return FileResponse(detection.detection_image.open(), as_attachment=True, filename=f"unknown_{detection.detected_plate_number}.jpg")
+        detection = await aget_object_or_404(UnknownLicensePlate, id=image_id)
+        return detection.detection_image, f"unknown_{detection.detected_plate_number}", True
+    
+    return None, None, False
+
+async def _image_exists(image):
+    return await sync_to_async(image.storage.exists, thread_sensitive=False)(image.name)
+
+def _detection_overloaded(message):
+    response = JsonResponse({'error': message}, status=503)
+    response['Retry-After'] = '1'
+    return response
+
+@require_POST
+@staff_or_device_required
+async def detect_image(request):
+    """Detect the plate in one still image (multipart ``image`` or a raw image body)"""
+    upload = request.FILES.get('image')
+    if upload is not None:
+        if upload.size > settings.DETECTION_MAX_IMAGE_SIZE:
+            return JsonResponse({'error': 'Image is too large'}, status=413)
+        data = upload.read()
+    else:
+        data = request.body
+    
+    image = await sync_to_async(decode_image, thread_sensitive=False)(data)
+    if image is None:
+        return JsonResponse({'error': 'Please upload a JPEG or PNG image'}, status=400)
+    
+    try:
+        future = get_detection_batcher().submit(image)
+    except BatcherOverloaded:
+        return _detection_overloaded('Detection queue is full, retry shortly')
+    
+    # Waiting requests are coroutines, so any number of them can share one batch
+    try:
+        result = await asyncio.wait_for(asyncio.wrap_future(future), settings.DETECTION_TIMEOUT)
+    except asyncio.TimeoutError:
+        return _detection_overloaded('Detection timed out, retry shortly')
+    
+    plate_text = result['plate_text']
+    registered_plate = None
+    if plate_text:
+        registered_plate = await RegisteredLicensePlate.objects.filter(
+            plate_number=plate_text.replace(' ', '').upper()
+        ).afirst()
+    
+    return JsonResponse({
+        'plate_number': plate_text,
+        'confidence': float(result['confidence']),
+        'box': [int(v) for v in result['region']] if result['region'] else None,
+        'status': 'registered' if registered_plate else ('unknown' if plate_text else 'not_found'),
+        'registered_plate': {
+            'id': registered_plate.id,
+            'plate_number': registered_plate.plate_number,
+            'owner_name': registered_plate.owner_name,
+            'vehicle_type': registered_plate.vehicle_type,
+        } if registered_plate else None,
+        'vehicle_type': result['vehicle_type'],
+    })
+
+@require_POST
+@staff_or_device_required
+async def gate_decision(request):
+    """Should the gate open? JSON ``{"plate", "gate"}`` or a multipart ``image`` (+ ``gate``)"""
+    upload = request.FILES.get('image')
+    detection = None
+    if upload is not None:
+        if upload.size > settings.DETECTION_MAX_IMAGE_SIZE:
+            return JsonResponse({'error': 'Image is too large'}, status=413)
+        image = await sync_to_async(decode_image, thread_sensitive=False)(upload.read())
+        if image is None:
+            return JsonResponse({'error': 'Please upload a JPEG or PNG image'}, status=400)
+        try:
+            future = get_detection_batcher().submit(image)
+        except BatcherOverloaded:
+            return _detection_overloaded('Detection queue is full, retry shortly')
+        try:
+            detection = await asyncio.wait_for(asyncio.wrap_future(future), settings.DETECTION_TIMEOUT)
+        except asyncio.TimeoutError:
+            return _detection_overloaded('Detection timed out, retry shortly')
+        plate_text = detection['plate_text']
+        gate = request.POST.get('gate', '')
+    else:
+        try:
+            payload = json.loads(request.body)
+            plate_text = str(payload.get('plate', ''))
+            gate = str(payload.get('gate', ''))
+        except (ValueError, AttributeError):
+            return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+        if not plate_text.strip():
+            return JsonResponse({'error': 'Please send a plate number'}, status=400)
+    
+    service = await aget_gate_service()
+    decision = service.decide(plate_text, gate)
+    decision['plate_text'] = plate_text
+    if detection is not None:
+        decision['confidence'] = float(detection['confidence'])
+    return JsonResponse(decision)
+
+@staff_member_required
+async def live_feed(request):
+    """Server-Sent Events stream of new known/unknown detections"""
+    # Under ASGI a client is a suspended coroutine; under WSGI it holds a worker thread
+    is_asgi = isinstance(request, ASGIRequest)
+    if broker.is_full():
+        response = JsonResponse({'error': 'Too many live feed clients'}, status=503)
+        response['Retry-After'] = '30'
+        return response
+    ensure_listener()
+    
+    # The stream subscribes when it starts, so a response that is never sent leaves nothing behind
+    subscriber = Subscriber(
+        settings.LIVE_FEED_CLIENT_BUFFER,
+        loop=asyncio.get_running_loop() if is_asgi else None
+    )
+    stream = stream_async(subscriber) if is_asgi else stream_sync(subscriber)
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@staff_member_required
+def export_plates(request, kind):
+    """Stream plates or detections as CSV/NDJSON: ?format=&start=&end=&video=&plate="""
+    fmt = request.GET.get('format', 'csv')
+    try:
+        content = iter_export(
+            kind,
+            fmt,
+            start=request.GET.get('start'),
+            end=request.GET.get('end'),
+            video_id=request.GET.get('video'),
+            plate=request.GET.get('plate')
+        )
+    except ExportError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    if isinstance(request, ASGIRequest):
+        # A sync generator would be collected into a list before the first byte went out
+        content = aiter_export(content)
+    
+    content_type, extension = EXPORT_FORMATS[fmt]
+    response = StreamingHttpResponse(content, content_type=f'{content_type}; charset=utf-8')
+    filename = f"{kind}_{timezone.localtime():%Y%m%d_%H%M%S}.{extension}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Tell nginx not to buffer the whole body before sending it on
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@staff_member_required
+async def download_plate_image(request, image_type, image_id):
+    """Admin can download license plate images"""
+    image, name, immutable = await _get_plate_image(image_type, image_id)
+    if image and await _image_exists(image):
+        extension = os.path.splitext(image.name)[1] or '.jpg'
+        return await aserve_image(request, image, immutable=immutable, as_attachment=True, filename=f"{name}{extension}")
     
     messages.error(request, 'Image not found')
     return redirect('vehicle_control:admin_plate_history')
 
 @staff_member_required
-def view_plate_image(request, image_type, image_id):
+async def view_plate_image(request, image_type, image_id):
     """Admin can view license plate images"""
-    if image_type == 'registered':
-        plate = get_object_or_404(RegisteredLicensePlate, id=image_id)
-        if plate.plate_image:
-            return FileResponse(plate.plate_image.open(), content_type='image/jpeg')
-    
-    elif image_type == 'known':
-        detection = get_object_or_404(KnownLicensePlate, id=image_id)
-        if detection.detection_image:
-            return FileResponse(detection.detection_image.open(), content_type='image/jpeg')
-    
-    elif image_type == 'unknown':
-        detection = get_object_or_404(UnknownLicensePlate, id=image_id)
-        if detection.detection_image:
-            return FileResponse(detection.detection_image.open(), content_type='image/jpeg')
+    image, name, immutable = await _get_plate_image(image_type, image_id)
+    if image and await _image_exists(image):
+        return await aserve_image(request, image, immutable=immutable)
     
     return HttpResponse('Image not found', status=404)
@@ -0,0 +1,52 @@
+"""
+Lazy entry points into the detection pipeline.
+
+Every web worker and every ``manage.py`` call (``migrate`` included - its
+system checks load the URLconf and so the views) imports the views, but only
+a few requests ever run detection. OpenCV and numpy alone add around 90 ms
+to a cold import, more with the OCR and ML stacks behind them. Web-facing
+modules therefore call the pipeline through these wrappers, which import the
+OpenCV-based modules (detection, processing, scheduling) on first use.
+Modules that are only loaded to do detection import them directly.
+"""
+import sys
+
+
+def get_detector():
+    from .detection import get_detector
+    return get_detector()
+
+
+def detector_stats():
+    """Per-component load metrics of this process's detector; {} if detection was never imported"""
+    detection = sys.modules.get(f'{__package__}.detection')
+    if detection is None:
+        return {}
+    return detection.detector_stats()
+
+
+def decode_image(data):
+    """Decode uploaded image bytes to a BGR array, or None if unreadable"""
+    if not data:
+        return None
+    import cv2
+    import numpy as np
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def process_video(video_detection, video_path, checkpoint=None):
+    """See processing.process_video_detection"""
+    from .processing import process_video_detection
+    return process_video_detection(video_detection, video_path, checkpoint=checkpoint)
+
+
+def run_inline_video(video_detection):
+    """See scheduling.run_inline"""
+    from .scheduling import run_inline
+    return run_inline(video_detection)
+
+
+def enqueue_video(video_detection, priority=None):
+    """See scheduling.enqueue"""
+    from .scheduling import enqueue
+    return enqueue(video_detection, priority)